@@ -1,15 +1,40 @@
-from typing import Dict, List, Any, Tuple, Optional
+import re
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple, Optional, Callable, Awaitable
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from config import settings
 from tools.web_search import WebSearchTool
+from api.metrics import MetricsCallbackHandler, node_duration
+
+# Records the latency and token usage of the agent's LLM and tool calls
+metrics_handler = MetricsCallbackHandler()
 
 # Initialize tools
-web_search_tool = WebSearchTool()
+web_search_tool = WebSearchTool(callbacks=[metrics_handler])
+
+# Words and punctuation, the units token estimates are based on
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Boundaries between the "# step" sections of the research summary
+SECTION_PATTERN = re.compile(r"\n\n(?=# )")
+
+# Upper bound on the levels of partial summaries, in case the model's summaries don't shrink
+MAX_SUMMARY_LEVELS = 4
 
 class ResearcherState(dict):
-    """State for the researcher agent graph"""
+    """
+    State for the researcher agent graph
+    
+    LangGraph creates a channel for each annotated key and passes nodes the
+    state rebuilt from the channels, so every node returns all three keys.
+    """
+    messages: List[Dict[str, str]]
+    next_steps: List[str]
+    research_summary: str
+    
     @property
     def messages(self) -> List[Dict[str, str]]:
         return self.get("messages", [])
@@ -31,18 +56,19 @@ def create_system_message() -> SystemMessage:
     After gathering information, synthesize it into a coherent summary.
     """)
 
+@lru_cache(maxsize=None)
 def create_researcher_agent() -> ChatOpenAI:
-    """Create a researcher agent using OpenAI"""
+    """Create a researcher agent using OpenAI (shared across calls so HTTP connections are reused)"""
     return ChatOpenAI(
         model="gpt-4",
         temperature=settings.agent.temperature,
-        api_key=settings.api.openai_api_key
+        api_key=settings.api.openai_api_key,
+        base_url=settings.api.openai_base_url or None,
+        callbacks=[metrics_handler]
     )
 
-def research_task(state: ResearcherState) -> Dict:
-    """Handle research task by determining next steps"""
-    agent = create_researcher_agent()
-    
+def create_context_messages(state: ResearcherState) -> List[BaseMessage]:
+    """Create the system message followed by the conversation so far"""
     messages = [create_system_message()]
     messages.extend([
         HumanMessage(content=msg["content"]) if msg["role"] == "user" else
@@ -50,79 +76,190 @@ def research_task(state: ResearcherState) -> Dict:
         SystemMessage(content=msg["content"])
         for msg in state.messages
     ])
-    
-    # Ask agent to determine research steps
-    response = agent.invoke(messages + [HumanMessage(content="What are the key aspects I should research about this topic? List 3-5 specific areas to focus on.")])
-    
-    # Parse response to get research steps
-    next_steps = response.content.split("\n")
+    return messages
+
+def create_steps_messages(state: ResearcherState) -> List[BaseMessage]:
+    """Create the messages asking the agent for research steps"""
+    return create_context_messages(state) + [HumanMessage(content="What are the key aspects I should research about this topic? List 3-5 specific areas to focus on.")]
+
+def create_step_messages(state: ResearcherState, search_results: List[str]) -> List[List[BaseMessage]]:
+    """Create the messages asking the agent to synthesize the search results of each step"""
+    messages = create_context_messages(state)
+    return [
+        messages + [
+            HumanMessage(content=f"Research subtopic: {step}\n\nSearch results: {search_result}\n\nSynthesize this information into a concise paragraph.")
+        ]
+        for step, search_result in zip(state.next_steps, search_results)
+    ]
+
+def create_summary_messages(research: str) -> List[BaseMessage]:
+    """Create the messages asking the agent for a final summary"""
+    return [
+        create_system_message(),
+        HumanMessage(content=f"Based on all the research below, create a comprehensive summary:\n\n{research}")
+    ]
+
+def create_partial_summary_messages(research: str) -> List[BaseMessage]:
+    """Create the messages asking the agent to condense part of the research for a later summary"""
+    return [
+        create_system_message(),
+        HumanMessage(content=f"Condense the research below into a shorter set of notes. Keep every key fact, figure and source, and keep the headings:\n\n{research}")
+    ]
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text without a tokenizer (within about 10% for English prose)"""
+    return sum(1 + max(0, len(piece) - 4) // 6 for piece in TOKEN_PATTERN.findall(text))
+
+def group_sections(sections: List[str], budget: int) -> List[str]:
+    """Join consecutive sections into chunks of at most `budget` estimated tokens"""
+    chunks: List[List[str]] = []
+    chunk_tokens = 0
+    for section in sections:
+        tokens = estimate_tokens(section)
+        if not chunks or chunk_tokens + tokens > budget:
+            chunks.append([])
+            chunk_tokens = 0
+        chunks[-1].append(section)
+        chunk_tokens += tokens
+    return ["\n\n".join(chunk) for chunk in chunks]
+
+def needs_reduction(sections: List[str], level: int) -> bool:
+    """Whether the research is too large to summarize in one call"""
+    if len(sections) < 2 or level >= MAX_SUMMARY_LEVELS:
+        return False
+    return sum(estimate_tokens(section) for section in sections) > settings.agent.summary_token_threshold
+
+def research_steps_update(state: ResearcherState, content: str) -> Dict:
+    """Parse the agent's response into research steps"""
+    next_steps = content.split("\n")
     next_steps = [step.strip() for step in next_steps if step.strip()]
     
     return {"messages": state.messages, "next_steps": next_steps, "research_summary": ""}
 
+def research_findings_update(state: ResearcherState, responses: List[BaseMessage]) -> Dict:
+    """Combine the synthesized findings in step order"""
+    findings = [f"# {step}\n\n{response.content}" for step, response in zip(state.next_steps, responses)]
+    all_findings = "\n\n".join(findings)
+    
+    return {"messages": state.messages, "next_steps": state.next_steps, "research_summary": all_findings}
+
+def summary_update(state: ResearcherState, content: str) -> Dict:
+    """Add the summary to the messages for the user"""
+    updated_messages = state.messages + [{"role": "assistant", "content": content}]
+    
+    return {"messages": updated_messages, "next_steps": [], "research_summary": state.research_summary}
+
+def research_task(state: ResearcherState) -> Dict:
+    """Handle research task by determining next steps"""
+    response = create_researcher_agent().invoke(create_steps_messages(state))
+    return research_steps_update(state, response.content)
+
+async def aresearch_task(state: ResearcherState) -> Dict:
+    """Handle research task by determining next steps (async)"""
+    response = await create_researcher_agent().ainvoke(create_steps_messages(state))
+    return research_steps_update(state, response.content)
+
 def execute_research(state: ResearcherState) -> Dict:
     """Execute research on each of the identified steps"""
-    agent = create_researcher_agent()
-    
-    # Base messages for context
-    messages = [create_system_message()]
-    messages.extend([
-        HumanMessage(content=msg["content"]) if msg["role"] == "user" else
-        AIMessage(content=msg["content"]) if msg["role"] == "assistant" else
-        SystemMessage(content=msg["content"])
-        for msg in state.messages
-    ])
+    max_concurrency = settings.agent.max_concurrency
     
-    # Research each step
-    findings = []
-    for step in state.next_steps:
-        # Search for information
-        search_result = web_search_tool.run(step)
-        
-        # Ask agent to synthesize search results
-        step_messages = messages + [
-            HumanMessage(content=f"Research subtopic: {step}\n\nSearch results: {search_result}\n\nSynthesize this information into a concise paragraph.")
-        ]
-        
-        response = agent.invoke(step_messages)
-        findings.append(f"# {step}\n\n{response.content}")
+    # Search for information on all steps concurrently
+    search_results = web_search_tool.batch(state.next_steps, config={"max_concurrency": max_concurrency})
     
-    # Combine all findings
-    all_findings = "\n\n".join(findings)
+    # Ask agent to synthesize search results for all steps in one batch call
+    responses = create_researcher_agent().batch(
+        create_step_messages(state, search_results),
+        config={"max_concurrency": max_concurrency}
+    )
     
-    return {"messages": state.messages, "next_steps": state.next_steps, "research_summary": all_findings}
+    return research_findings_update(state, responses)
 
-def summarize_research(state: ResearcherState) -> Dict:
-    """Create a final summary of all research"""
-    agent = create_researcher_agent()
+async def aexecute_research(state: ResearcherState) -> Dict:
+    """Execute research on each of the identified steps (async)"""
+    max_concurrency = settings.agent.max_concurrency
     
-    # Ask the agent to create a final summary
-    messages = [
-        create_system_message(),
-        HumanMessage(content=f"Based on all the research below, create a comprehensive summary:\n\n{state.research_summary}")
-    ]
+    # Search for information on all steps concurrently
+    search_results = await web_search_tool.abatch(state.next_steps, config={"max_concurrency": max_concurrency})
     
-    response = agent.invoke(messages)
+    # Ask agent to synthesize search results for all steps in one batch call
+    responses = await create_researcher_agent().abatch(
+        create_step_messages(state, search_results),
+        config={"max_concurrency": max_concurrency}
+    )
     
-    # Add summary to messages for the user
-    updated_messages = state.messages + [{"role": "assistant", "content": response.content}]
+    return research_findings_update(state, responses)
+
+def reduce_research(research: str) -> str:
+    """
+    Condense research too large for one summary call.
     
-    return {"messages": updated_messages, "next_steps": [], "research_summary": state.research_summary}
+    The research is split into chunks of at most `summary_chunk_tokens`, each
+    chunk is summarized in parallel, and the partial summaries are condensed
+    again until they fit under `summary_token_threshold`.
+    """
+    sections = SECTION_PATTERN.split(research)
+    level = 0
+    while needs_reduction(sections, level):
+        responses = create_researcher_agent().batch(
+            [create_partial_summary_messages(chunk) for chunk in group_sections(sections, settings.agent.summary_chunk_tokens)],
+            config={"max_concurrency": settings.agent.max_concurrency}
+        )
+        sections = [response.content for response in responses]
+        level += 1
+    return "\n\n".join(sections)
+
+async def areduce_research(research: str) -> str:
+    """Condense research too large for one summary call (async)"""
+    sections = SECTION_PATTERN.split(research)
+    level = 0
+    while needs_reduction(sections, level):
+        responses = await create_researcher_agent().abatch(
+            [create_partial_summary_messages(chunk) for chunk in group_sections(sections, settings.agent.summary_chunk_tokens)],
+            config={"max_concurrency": settings.agent.max_concurrency}
+        )
+        sections = [response.content for response in responses]
+        level += 1
+    return "\n\n".join(sections)
+
+def summarize_research(state: ResearcherState) -> Dict:
+    """Create a final summary of all research"""
+    research = reduce_research(state.research_summary)
+    response = create_researcher_agent().invoke(create_summary_messages(research))
+    return summary_update(state, response.content)
+
+async def asummarize_research(state: ResearcherState) -> Dict:
+    """Create a final summary of all research (async)"""
+    research = await areduce_research(state.research_summary)
+    response = await create_researcher_agent().ainvoke(create_summary_messages(research))
+    return summary_update(state, response.content)
 
 def should_continue_research(state: ResearcherState) -> str:
     """Decide whether to continue with more research or finalize"""
-    if not state.research_summary:
+    # Conditions get the channel values as a plain dict
+    if not state.get("research_summary"):
         return "execute_research"
     return "summarize"
 
+def timed_node(name: str, func: Callable[[ResearcherState], Dict], afunc: Callable[[ResearcherState], Awaitable[Dict]]) -> RunnableLambda:
+    """Wrap a node's sync and async implementations, recording their latency in the node metrics"""
+    def run(state: ResearcherState) -> Dict:
+        with node_duration.time(graph="researcher", node=name):
+            return func(state)
+    
+    async def arun(state: ResearcherState) -> Dict:
+        with node_duration.time(graph="researcher", node=name):
+            return await afunc(state)
+    
+    return RunnableLambda(run, afunc=arun, name=name)
+
 def create_researcher_graph() -> StateGraph:
     """Create the researcher agent workflow graph"""
     workflow = StateGraph(ResearcherState)
     
     # Add nodes to the graph
-    workflow.add_node("research", research_task)
-    workflow.add_node("execute_research", execute_research)
-    workflow.add_node("summarize", summarize_research)
+    workflow.add_node("research", timed_node("research", research_task, aresearch_task))
+    workflow.add_node("execute_research", timed_node("execute_research", execute_research, aexecute_research))
+    workflow.add_node("summarize", timed_node("summarize", summarize_research, asummarize_research))
     
     # Define edges
     workflow.add_edge("research", "execute_research")
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# The exposition format is implemented once, by the neural_agents service
+from neural_agents.utils.metrics import TOKEN_BUCKETS, MetricsRegistry
+
+# This app's metrics, kept apart from the ones the neural_agents service registers
+metrics = MetricsRegistry()
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    return metrics.render()
+
+node_duration = metrics.histogram("agent_node_duration_seconds", "Time spent running graph nodes", ("graph", "node"))
+llm_duration = metrics.histogram("llm_request_duration_seconds", "Time spent in LLM calls", ("model",))
+llm_requests = metrics.counter("llm_requests_total", "LLM calls by outcome", ("model", "status"))
+llm_tokens = metrics.histogram("llm_tokens", "Tokens per LLM call", ("model", "type"), buckets=TOKEN_BUCKETS)
+llm_tokens_total = metrics.counter("llm_tokens_total", "Tokens used by LLM calls", ("model", "type"))
+tool_duration = metrics.histogram("tool_call_duration_seconds", "Time spent in tool calls", ("tool",))
+tool_calls = metrics.counter("tool_calls_total", "Tool calls by outcome", ("tool", "status"))
+requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being served", ("path",))
+request_duration = metrics.histogram("http_request_duration_seconds", "Time to respond to HTTP requests", ("method", "path", "status"))
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Callback handler recording the latency, outcome and token usage of LLM and tool calls"""
+
+    # Recording is cheap, so run in the caller's thread instead of the executor
+    run_inline = True
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        # Per run id: (start time, model or tool name)
+        self._runs: Dict[UUID, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str) -> None:
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), name)
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        return (time.perf_counter() - run[0], run[1]) if run else None
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, self.model or (kwargs.get("invocation_params") or {}).get("model", "unknown"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if run is None:
+            return
+
+        duration, model = run
+        llm_duration.observe(duration, model=model)
+        llm_requests.inc(model=model, status="ok")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for token_type in ("prompt", "completion"):
+            if f"{token_type}_tokens" in usage:
+                llm_tokens.observe(usage[f"{token_type}_tokens"], model=model, type=token_type)
+                llm_tokens_total.inc(usage[f"{token_type}_tokens"], model=model, type=token_type)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if run is not None:
+            llm_duration.observe(run[0], model=run[1])
+            llm_requests.inc(model=run[1], status="error")
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized.get("name", "unknown"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if run is not None:
+            tool_duration.observe(run[0], tool=run[1])
+            tool_calls.inc(tool=run[1], status="ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if run is not None:
+            tool_duration.observe(run[0], tool=run[1])
+            tool_calls.inc(tool=run[1], status="error")
@@ -1,10 +1,15 @@
+import asyncio
+import time
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Body
+from fastapi import FastAPI, Depends, HTTPException, Body, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from pydantic import BaseModel
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from config import get_settings, settings
 from agents.researcher import researcher_graph, ResearcherState
+from api.metrics import render_metrics, request_duration, requests_in_flight
+from neural_agents.utils.metrics import CONTENT_TYPE
 
 app = FastAPI(title="Neural Agent System", description="A system of neural agents built with LangGraph")
 
@@ -17,6 +22,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class MetricsMiddleware:
+    """ASGI middleware counting in-flight requests and timing responses"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Label requests with their route's path template to keep the label set small
+        path = next((route.path for route in app.routes if route.matches(scope)[0] == Match.FULL), "unmatched")
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        requests_in_flight.inc(path=path)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec(path=path)
+            request_duration.observe(time.perf_counter() - start, method=scope["method"], path=path, status=status)
+
+app.add_middleware(MetricsMiddleware)
+
 class ResearchRequest(BaseModel):
     """Model for research requests"""
     query: str
@@ -35,29 +71,54 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Node, LLM, tool and request metrics in the Prometheus text format"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+# Research runs in progress, keyed by (normalized query, context, agent settings)
+in_flight_research: Dict[Tuple[str, str, str], "asyncio.Future[ResearchResponse]"] = {}
+
+async def run_research(request: ResearchRequest) -> ResearchResponse:
+    """Run the researcher agent on a request"""
+    # Initialize state
+    messages = [{"role": "user", "content": request.query}]
+    
+    if request.context:
+        messages.insert(0, {"role": "system", "content": request.context})
+    
+    initial_state = ResearcherState(messages=messages)
+    
+    # Run the agent
+    final_state = await researcher_graph.ainvoke(initial_state)
+    
+    # Extract results
+    assistant_messages = [msg["content"] for msg in final_state["messages"] if msg["role"] == "assistant"]
+    result = assistant_messages[-1] if assistant_messages else "No results found."
+    
+    return ResearchResponse(
+        result=result,
+        detailed_findings=final_state["research_summary"]
+    )
+
 @app.post("/research", response_model=ResearchResponse)
 async def research(request: ResearchRequest = Body(...)):
-    """Conduct research on a topic using the researcher agent"""
+    """
+    Conduct research on a topic using the researcher agent
+    
+    Identical requests (same query up to case and whitespace, same context)
+    that arrive while one is running share its run instead of starting another.
+    """
+    key = (" ".join(request.query.split()).casefold(), (request.context or "").strip(), repr(sorted(settings.agent.dict().items())))
+    task = in_flight_research.get(key)
+    if task is None:
+        task = asyncio.ensure_future(run_research(request))
+        in_flight_research[key] = task
+        task.add_done_callback(lambda _: in_flight_research.pop(key, None))
+    
     try:
-        # Initialize state
-        messages = [{"role": "user", "content": request.query}]
-        
-        if request.context:
-            messages.insert(0, {"role": "system", "content": request.context})
-        
-        initial_state = ResearcherState(messages=messages)
-        
-        # Run the agent
-        final_state = researcher_graph.invoke(initial_state)
-        
-        # Extract results
-        assistant_messages = [msg["content"] for msg in final_state["messages"] if msg["role"] == "assistant"]
-        result = assistant_messages[-1] if assistant_messages else "No results found."
-        
-        return ResearchResponse(
-            result=result,
-            detailed_findings=final_state["research_summary"]
-        )
+        # Shielded, so a client disconnecting doesn't cancel the run for the others
+        return await asyncio.shield(task)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing research: {str(e)}")
 
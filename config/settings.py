@@ -10,9 +10,13 @@ class AgentConfig(BaseModel):
     debug_mode: bool = os.getenv("DEBUG_MODE", "False").lower() == "true"
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     temperature: float = float(os.getenv("TEMPERATURE", "0.7"))
+    max_concurrency: int = int(os.getenv("MAX_CONCURRENCY", "5"))
+    summary_token_threshold: int = int(os.getenv("SUMMARY_TOKEN_THRESHOLD", "6000"))
+    summary_chunk_tokens: int = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
 
 class APIConfig(BaseModel):
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
 
 class ServiceConfig(BaseModel):
     port: int = int(os.getenv("PORT", "8000"))
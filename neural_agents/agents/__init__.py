@@ -1,9 +1,14 @@
-from .agent_factory import create_agent
+from .agent_factory import create_agent, create_llm_agent, graph_registry, warm_up_agents
+from .llm_registry import llm_registry
 from .researcher import create_researcher_agent
 from .executor import create_executor_agent
 
 __all__ = [
     "create_agent",
+    "create_llm_agent",
+    "llm_registry",
+    "graph_registry",
+    "warm_up_agents",
     "create_researcher_agent", 
     "create_executor_agent"
 ]
\ No newline at end of file
@@ -4,13 +4,35 @@ from langchain.schema import BaseMessage, SystemMessage, HumanMessage
 from langgraph.graph import StateGraph
 
 from ..config import settings
-from .researcher import create_researcher_agent
-from .executor import create_executor_agent
+from ..utils.llm_cache import get_llm_response_cache
+from ..utils.logger import get_logger
+from .graph_registry import GraphRegistry
+from .llm_registry import llm_registry
+
+logger = get_logger(__name__)
+
+def _build_researcher_agent() -> StateGraph:
+    """Build the researcher agent workflow"""
+    from .researcher import create_researcher_agent
+    return create_researcher_agent()
+
+def _build_executor_agent() -> StateGraph:
+    """Build the executor agent workflow"""
+    from .executor import create_executor_agent
+    return create_executor_agent()
+
+# Global registry of compiled agent graphs
+graph_registry = GraphRegistry()
+graph_registry.register("researcher", _build_researcher_agent)
+graph_registry.register("executor", _build_executor_agent)
 
 def create_agent(agent_type: str, **kwargs) -> Union[ChatOpenAI, StateGraph]:
     """
     Factory function to create different types of agents.
     
+    Graph agents are compiled once and looked up in the graph registry; passing
+    constructor arguments builds a fresh, unregistered graph instead.
+    
     Args:
         agent_type: Type of agent to create ('researcher', 'executor', 'llm')
         **kwargs: Additional arguments to pass to the agent constructor
@@ -19,27 +41,72 @@ def create_agent(agent_type: str, **kwargs) -> Union[ChatOpenAI, StateGraph]:
         The created agent
     """
     if agent_type == "researcher":
+        if not kwargs:
+            return graph_registry.get(agent_type)
+        from .researcher import create_researcher_agent
         return create_researcher_agent(**kwargs)
     elif agent_type == "executor":
+        if not kwargs:
+            return graph_registry.get(agent_type)
+        from .executor import create_executor_agent
         return create_executor_agent(**kwargs)
     elif agent_type == "llm":
         return create_llm_agent(**kwargs)
     else:
         raise ValueError(f"Unknown agent type: {agent_type}")
-        
+
+def warm_up_agents() -> Dict[str, Any]:
+    """
+    Compile the registered graphs and create the default LLM client and tools.
+    
+    Run at startup so the first request after a deploy doesn't pay for graph
+    compilation or client setup.
+    
+    Returns:
+        The graph versions and any agent types that failed to compile or create
+    """
+    # Compiling the graphs imports the agent modules, which create their tools
+    failed = graph_registry.warm_up()
+    
+    # Create the default LLM client and its connection pools
+    try:
+        create_llm_agent()
+    except Exception as e:
+        # E.g. no API key configured; requests needing the LLM fail on their own
+        logger.error(f"Error creating the default LLM client: {str(e)}")
+        failed.append("llm")
+    
+    # Build the tool schemas once
+    from .researcher import web_search_tool
+    from .executor import file_read_tool, file_write_tool
+    for tool in (web_search_tool, file_read_tool, file_write_tool):
+        tool.get_schema()
+    
+    return {"versions": graph_registry.versions(), "failed": failed}
+
 def create_llm_agent(
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     api_key: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    cache: Optional[bool] = None,
     **kwargs
 ) -> ChatOpenAI:
     """
-    Create a basic LLM agent using OpenAI.
+    Get a basic LLM agent using OpenAI.
+    
+    Agents are shared process-wide through the LLM client registry, so repeated
+    calls with the same configuration reuse the same pooled HTTP connections.
+    
+    When the LLM response cache is enabled, temperature-0 agents are cached by
+    default; pass `cache=False` to opt a node out or `cache=True` to opt it in.
     
     Args:
         model: The model to use (defaults to config setting)
         temperature: The temperature to use (defaults to config setting)
         api_key: The API key to use (defaults to config setting)
+        max_tokens: The maximum number of tokens to generate (defaults to config setting)
+        cache: Whether to use the LLM response cache (defaults to caching temperature-0 agents)
         **kwargs: Additional arguments to pass to the ChatOpenAI constructor
         
     Returns:
@@ -49,10 +116,20 @@ def create_llm_agent(
     model = model or settings.llm.model
     temperature = temperature if temperature is not None else settings.llm.temperature
     api_key = api_key or settings.llm.api_key
+    max_tokens = max_tokens if max_tokens is not None else settings.llm.max_tokens
+    
+    # Point the client at an OpenAI-compatible server other than OpenAI's, if configured
+    if settings.llm.base_url:
+        kwargs.setdefault("base_url", settings.llm.base_url)
+    
+    # Only ask for caching when a cache is installed, LangChain errors otherwise
+    use_cache = get_llm_response_cache() is not None and (cache if cache is not None else temperature == 0)
     
-    return ChatOpenAI(
+    return llm_registry.get(
         model=model,
         temperature=temperature,
+        max_tokens=max_tokens,
         api_key=api_key,
+        cache=use_cache,
         **kwargs
-    )
\ No newline at end of file
+    )
@@ -1,12 +1,22 @@
-from typing import Dict, List, Any, Optional, Union, Callable
+import asyncio
+import contextvars
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Optional, Union, Callable, Tuple
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage, AIMessage
 from langgraph.graph import StateGraph, END
 
 from ..config import settings
-from ..schemas.agent_state import AgentState
+from ..schemas.agent_state import AgentState, error_update, next_node_update, node_output_update
+from ..schemas.message import MessageRecord
 from ..tools.file_operations import FileReadTool, FileWriteTool
+from ..utils.checkpoint import PROGRESS, asave_checkpoint, save_checkpoint
+from ..utils.events import emit_event
 from ..utils.logger import get_logger
+from .agent_factory import create_llm_agent
+from .node import agenerate_streamed, create_node
 
 logger = get_logger(__name__)
 
@@ -17,34 +27,68 @@ file_write_tool = FileWriteTool()
 class ExecutorState(AgentState):
     """State for the executor agent workflow"""
     tasks: List[Dict[str, Any]] = []
-    current_task_index: int = 0
     completed_tasks: List[Dict[str, Any]] = []
     
-    def add_task(self, task_description: str, task_type: str = "general") -> None:
-        """Add a task to the execution queue"""
+    def add_task(self, task_description: str, task_type: str = "general", depends_on: Optional[List[int]] = None) -> None:
+        """Add a task to the task graph, depending on earlier tasks by index"""
         task = {
+            "id": len(self.tasks),
             "description": task_description,
             "type": task_type,
+            "depends_on": [dependency for dependency in depends_on or [] if 0 <= dependency < len(self.tasks)],
             "status": "pending",
-            "result": None
+            "result": None,
+            "error": None,
+            "started_at": None,
+            "finished_at": None,
+            "duration": None
         }
         self.tasks.append(task)
         self.update_timestamp()
+    
+    def get_ready_tasks(self) -> List[Dict[str, Any]]:
+        """
+        Get the pending tasks whose dependencies have all completed.
         
-    def mark_current_task_complete(self, result: Any) -> None:
-        """Mark the current task as complete"""
-        if self.current_task_index < len(self.tasks):
-            self.tasks[self.current_task_index]["status"] = "completed"
-            self.tasks[self.current_task_index]["result"] = result
-            self.completed_tasks.append(self.tasks[self.current_task_index])
-            self.current_task_index += 1
-            self.update_timestamp()
+        Pending tasks with a failed or skipped dependency are marked as skipped.
+        """
+        ready = []
+        for task in self.tasks:
+            if task["status"] != "pending":
+                continue
             
-    def get_current_task(self) -> Optional[Dict[str, Any]]:
-        """Get the current task in the queue"""
-        if self.current_task_index < len(self.tasks):
-            return self.tasks[self.current_task_index]
-        return None
+            statuses = [self.tasks[dependency]["status"] for dependency in task["depends_on"]]
+            if any(status in ("failed", "skipped") for status in statuses):
+                task["status"] = "skipped"
+                task["error"] = "A task it depends on did not complete"
+            elif all(status == "completed" for status in statuses):
+                ready.append(task)
+        
+        self.update_timestamp()
+        return ready
+    
+    def start_task(self, task: Dict[str, Any]) -> None:
+        """Mark a task as running"""
+        task["status"] = "running"
+        task["started_at"] = time.time()
+        self.update_timestamp()
+    
+    def finish_task(self, task: Dict[str, Any], result: Any = None, error: Optional[str] = None) -> None:
+        """Mark a running task as completed, or as failed if there is an error"""
+        task["finished_at"] = time.time()
+        task["duration"] = task["finished_at"] - task["started_at"]
+        if error is None:
+            task["status"] = "completed"
+            task["result"] = result
+            self.completed_tasks.append(task)
+        else:
+            task["status"] = "failed"
+            task["error"] = error
+        self.update_timestamp()
+    
+    def has_pending_tasks(self) -> bool:
+        """Whether any task is still waiting to run or running"""
+        return any(task["status"] in ("pending", "running") for task in self.tasks)
 
 def create_system_message() -> SystemMessage:
     """Create a system message for the executor agent"""
@@ -58,186 +102,333 @@ def create_system_message() -> SystemMessage:
     Follow instructions precisely and report back your results in a clear, structured format.
     """)
 
-def parse_tasks(state: ExecutorState) -> ExecutorState:
-    """Parse the user's request into specific tasks"""
-    logger.info("Parsing tasks from user request")
+def get_user_request(state: ExecutorState) -> Optional[str]:
+    """Get the latest user request"""
+    user_message = state.messages.get_last_message("user")
+    return user_message.content if user_message else None
+
+def create_parse_messages(request: str) -> List[BaseMessage]:
+    """Create the messages asking the agent to break a request down into tasks"""
+    return [
+        create_system_message(),
+        HumanMessage(content=f"I need you to execute the following:\n\n{request}\n\nBreak this down into a list of specific tasks that need to be performed. List each task on a separate, numbered line. If a task needs the results of earlier tasks, end its line with (depends on: <task numbers>); tasks without dependencies are run in parallel.")
+    ]
+
+def create_report_messages(state: ExecutorState) -> List[BaseMessage]:
+    """Create the messages asking the agent for a report of the completed tasks"""
+    # Format the tasks and results
+    tasks_text = ""
+    for task in state.tasks:
+        tasks_text += f"## Task {task['id']+1}: {task['description']}\n\n"
+        if task["status"] == "completed":
+            tasks_text += f"**Result:** {task['result']}\n\n"
+        else:
+            tasks_text += f"**{task['status'].capitalize()}:** {task['error']}\n\n"
+    
+    return [
+        create_system_message(),
+        HumanMessage(content=f"I've completed the following tasks:\n\n{tasks_text}\n\nProvide a summary report of what was accomplished.")
+    ]
+
+def get_task_type(task: Dict[str, Any]) -> str:
+    """Classify a task as a file read, file write or general task"""
+    description = task["description"].lower()
+    if "read" in description and "file" in description:
+        return "file_read"
+    if "write" in description and "file" in description:
+        return "file_write"
+    return "general"
+
+def create_task_agent(task_type: str) -> ChatOpenAI:
+    """Get the LLM agent for a task, opting general tasks out of the response cache"""
+    # General tasks are carried out afresh on every run
+    if task_type == "general":
+        return create_llm_agent(cache=False)
+    return create_llm_agent()
+
+def get_dependency_results(state: ExecutorState, task: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Get the descriptions and results of the tasks a task depends on"""
+    return [(state.tasks[dependency]["description"], state.tasks[dependency]["result"]) for dependency in task["depends_on"]]
+
+def create_task_messages(task: Dict[str, Any], task_type: str, dependency_results: Optional[List[Tuple[str, Any]]] = None) -> List[BaseMessage]:
+    """Create the messages asking the agent how to execute a task"""
+    if task_type == "file_read":
+        prompt = f"I need to execute this task: {task['description']}\n\nWhat file path should I read from? Extract just the file path."
+    elif task_type == "file_write":
+        prompt = f"I need to execute this task: {task['description']}\n\nProvide the file path and content I should write in this format:\nFILE PATH: <path>\nCONTENT:\n<content>"
+    else:
+        prompt = f"I need to execute this task: {task['description']}\n\nProvide a step-by-step approach to complete this task and then execute it. Report your result."
     
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
+    if dependency_results:
+        context = "\n\n".join(f"Task: {description}\nResult: {result}" for description, result in dependency_results)
+        prompt = f"Results of the tasks this task depends on:\n\n{context}\n\n{prompt}"
     
-    # Get the user's request from messages
-    user_messages = [msg for msg in state.messages.messages if msg.role == "user"]
-    if not user_messages:
-        state.add_error("parse_tasks", "No user message found in state")
-        return state
+    return [create_system_message(), HumanMessage(content=prompt)]
+
+def parse_write_instructions(content: str) -> Optional[Dict[str, str]]:
+    """Extract the file path and content from the agent's write instructions"""
+    parts = content.split("CONTENT:", 1)
+    if len(parts) != 2:
+        return None
     
-    request = user_messages[-1].content
+    return {
+        "file_path": parts[0].replace("FILE PATH:", "").strip(),
+        "content": parts[1].strip()
+    }
+
+# A task line: an optional bullet and number, then the description with an optional dependency clause
+_TASK_NUMBER_PATTERN = re.compile(r"^\s*(?:[-*]\s*)?(?:(\d+)[.):]\s*)?")
+_DEPENDS_ON_PATTERN = re.compile(r"\s*\((?:depends on|after)\s*:?\s*([^)]*)\)", re.IGNORECASE)
+
+def parse_task_graph(content: str) -> List[Tuple[str, List[int]]]:
+    """
+    Parse the agent's numbered task list into tasks and the indexes of the tasks they depend on.
     
-    # Ask the agent to break down the request into tasks
-    messages = [
-        create_system_message(),
-        HumanMessage(content=f"I need you to execute the following:\n\n{request}\n\nBreak this down into a list of specific tasks that need to be performed. List each task on a separate line.")
-    ]
+    Only dependencies on earlier tasks are kept, so the result is always acyclic.
+    """
+    tasks: List[Tuple[str, List[int]]] = []
+    indexes: Dict[int, int] = {}
+    for line in content.split('\n'):
+        if not line.strip():
+            continue
+        
+        number_match = _TASK_NUMBER_PATTERN.match(line)
+        description = line[number_match.end():]
+        
+        depends_on = []
+        depends_match = _DEPENDS_ON_PATTERN.search(description)
+        if depends_match:
+            description = (description[:depends_match.start()] + description[depends_match.end():]).strip()
+            depends_on = [indexes[int(number)] for number in re.findall(r"\d+", depends_match.group(1)) if int(number) in indexes]
+        
+        if number_match.group(1):
+            indexes[int(number_match.group(1))] = len(tasks)
+        tasks.append((description.strip() or line.strip(), sorted(set(depends_on))))
     
-    response = agent.invoke(messages)
+    return tasks
+
+def store_tasks(state: ExecutorState, content: str) -> Dict[str, Any]:
+    """Extract the task graph from the agent's response"""
+    # Add the tasks to a copy so the graph's current state isn't modified
+    state = state.copy(update={"tasks": list(state.tasks)})
+    for description, depends_on in parse_task_graph(content):
+        state.add_task(description, depends_on=depends_on)
     
-    # Extract tasks
-    tasks = [line.strip() for line in response.content.split('\n') if line.strip()]
+    return {
+        "tasks": state.tasks,
+        **node_output_update("parse_tasks", [
+            {"id": task["id"], "task": task["description"], "depends_on": task["depends_on"]}
+            for task in state.tasks
+        ]),
+        **next_node_update(state, "execute_tasks")
+    }
+
+def start_ready_tasks(state: ExecutorState, running: int) -> List[Dict[str, Any]]:
+    """Start as many ready tasks as the concurrency limit allows"""
+    tasks = state.get_ready_tasks()[:max(0, max(1, settings.agent.max_concurrency) - running)]
+    for task in tasks:
+        logger.info(f"Executing task: {task['description']}")
+        state.start_task(task)
+        emit_event("task_start", {"task": task["id"], "description": task["description"]})
+    return tasks
+
+def store_task_outcome(state: ExecutorState, task: Dict[str, Any], future: Union[Future, asyncio.Future], errors: List[Dict[str, Any]]) -> None:
+    """Record the result or error of a finished task"""
+    try:
+        state.finish_task(task, result=future.result())
+    except Exception as e:
+        logger.error(f"Task failed: {task['description']}: {str(e)}")
+        state.finish_task(task, error=str(e))
+        errors.extend(error_update("execute_tasks", f"Task {task['id']+1} failed: {str(e)}", {"task": task["description"]})["errors"])
     
-    # Add tasks to state
+    emit_event("task_end", {
+        "task": task["id"],
+        "status": task["status"],
+        "result": task["result"],
+        "duration": task["duration"]
+    })
+
+def store_task_results(state: ExecutorState, errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Record the status, timing and result of every task"""
+    return {
+        "tasks": state.tasks,
+        "completed_tasks": state.completed_tasks,
+        "errors": errors,
+        **node_output_update("execute_tasks", [
+            {
+                "task": task["description"],
+                "status": task["status"],
+                "result": task["result"],
+                "error": task["error"],
+                "duration": task["duration"]
+            }
+            for task in state.tasks
+        ]),
+        **next_node_update(state, "final_report")
+    }
+
+def copy_task_state(state: ExecutorState) -> ExecutorState:
+    """Copy the tasks so the scheduler can update them without modifying the graph's current state"""
+    tasks = [dict(task) for task in state.tasks]
+    # Tasks interrupted in a run being resumed are run again
     for task in tasks:
-        state.add_task(task)
+        if task["status"] == "running":
+            task["status"] = "pending"
+    
+    return state.copy(update={
+        "tasks": tasks,
+        "completed_tasks": [task for task in tasks if task["status"] == "completed"]
+    })
+
+def task_progress_update(state: ExecutorState) -> Dict[str, Any]:
+    """Create the checkpoint of the scheduler's progress, so a resumed run skips finished tasks"""
+    return {"tasks": state.tasks, "completed_tasks": state.completed_tasks}
+
+def store_report(state: ExecutorState, content: str) -> Dict[str, Any]:
+    """Add the final report to the message thread"""
+    return {
+        "messages": [MessageRecord(role="assistant", content=content)],
+        **node_output_update("final_report", content)
+    }
+
+def parse_tasks(state: ExecutorState) -> Dict[str, Any]:
+    """Parse the user's request into specific tasks"""
+    logger.info("Parsing tasks from user request")
+    
+    request = get_user_request(state)
+    if request is None:
+        return error_update("parse_tasks", "No user message found in state")
     
-    state.add_node_output("parse_tasks", tasks)
-    state.set_next_node("execute_tasks")
+    response = create_llm_agent().invoke(create_parse_messages(request))
     
-    return state
+    return store_tasks(state, response.content)
 
-def execute_tasks(state: ExecutorState) -> ExecutorState:
-    """Execute the current task in the queue"""
-    # Get the current task
-    task = state.get_current_task()
+async def aparse_tasks(state: ExecutorState) -> Dict[str, Any]:
+    """Parse the user's request into specific tasks (async)"""
+    logger.info("Parsing tasks from user request")
     
-    if not task:
-        logger.info("No tasks to execute")
-        return state
+    request = get_user_request(state)
+    if request is None:
+        return error_update("parse_tasks", "No user message found in state")
     
-    logger.info(f"Executing task: {task['description']}")
+    response = await create_llm_agent().ainvoke(create_parse_messages(request))
     
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
+    return store_tasks(state, response.content)
+
+def run_task(task: Dict[str, Any], dependency_results: List[Tuple[str, Any]]) -> Any:
+    """Execute a single task"""
+    # Execute based on task type
+    task_type = get_task_type(task)
+    response = create_task_agent(task_type).invoke(create_task_messages(task, task_type, dependency_results))
     
+    if task_type == "file_read":
+        return file_read_tool.run(file_path=response.content.strip())
+    elif task_type == "file_write":
+        instructions = parse_write_instructions(response.content)
+        if instructions:
+            return file_write_tool.run(**instructions)
+        return "Failed to parse file path and content"
+    return response.content
+
+async def arun_task(task: Dict[str, Any], dependency_results: List[Tuple[str, Any]]) -> Any:
+    """Execute a single task (async)"""
     # Execute based on task type
-    if "read" in task["description"].lower() and "file" in task["description"].lower():
-        # This is likely a file read task
-        messages = [
-            create_system_message(),
-            HumanMessage(content=f"I need to execute this task: {task['description']}\n\nWhat file path should I read from? Extract just the file path.")
-        ]
-        
-        response = agent.invoke(messages)
-        file_path = response.content.strip()
-        
-        # Read the file
-        result = file_read_tool.run(file_path=file_path)
-        
-    elif "write" in task["description"].lower() and "file" in task["description"].lower():
-        # This is likely a file write task
-        messages = [
-            create_system_message(),
-            HumanMessage(content=f"I need to execute this task: {task['description']}\n\nProvide the file path and content I should write in this format:\nFILE PATH: <path>\nCONTENT:\n<content>")
-        ]
-        
-        response = agent.invoke(messages)
-        
-        # Extract file path and content
-        parts = response.content.split("CONTENT:", 1)
-        if len(parts) == 2:
-            file_path_part = parts[0]
-            content = parts[1].strip()
+    task_type = get_task_type(task)
+    response = await create_task_agent(task_type).ainvoke(create_task_messages(task, task_type, dependency_results))
+    
+    if task_type == "file_read":
+        return await file_read_tool.arun(file_path=response.content.strip())
+    elif task_type == "file_write":
+        instructions = parse_write_instructions(response.content)
+        if instructions:
+            return await file_write_tool.arun(**instructions)
+        return "Failed to parse file path and content"
+    return response.content
+
+def execute_tasks(state: ExecutorState) -> Dict[str, Any]:
+    """Execute the task graph, running ready tasks concurrently"""
+    if not state.tasks:
+        logger.info("No tasks to execute")
+        return {}
+    
+    state = copy_task_state(state)
+    errors: List[Dict[str, Any]] = []
+    running: Dict[Future, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, settings.agent.max_concurrency)) as pool:
+        while True:
+            for task in start_ready_tasks(state, len(running)):
+                context = contextvars.copy_context()
+                running[pool.submit(context.run, run_task, task, get_dependency_results(state, task))] = task
             
-            file_path = file_path_part.replace("FILE PATH:", "").strip()
+            if not running:
+                break
             
-            # Write to the file
-            result = file_write_tool.run(file_path=file_path, content=content)
-        else:
-            result = "Failed to parse file path and content"
-    else:
-        # General task
-        messages = [
-            create_system_message(),
-            HumanMessage(content=f"I need to execute this task: {task['description']}\n\nProvide a step-by-step approach to complete this task and then execute it. Report your result.")
-        ]
-        
-        response = agent.invoke(messages)
-        result = response.content
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                store_task_outcome(state, running.pop(future), future, errors)
+            save_checkpoint("execute_tasks", task_progress_update(state), kind=PROGRESS)
     
-    # Mark the task as complete
-    state.mark_current_task_complete(result)
+    return store_task_results(state, errors)
+
+async def aexecute_tasks(state: ExecutorState) -> Dict[str, Any]:
+    """Execute the task graph, running ready tasks concurrently (async)"""
+    if not state.tasks:
+        logger.info("No tasks to execute")
+        return {}
     
-    state.add_node_output("execute_tasks", {
-        "task": task["description"],
-        "result": result
-    })
+    state = copy_task_state(state)
+    errors: List[Dict[str, Any]] = []
+    running: Dict[asyncio.Future, Dict[str, Any]] = {}
+    try:
+        while True:
+            for task in start_ready_tasks(state, len(running)):
+                running[asyncio.ensure_future(arun_task(task, get_dependency_results(state, task)))] = task
+            
+            if not running:
+                break
+            
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                store_task_outcome(state, running.pop(future), future, errors)
+            await asave_checkpoint("execute_tasks", task_progress_update(state), kind=PROGRESS)
+    finally:
+        for future in running:
+            future.cancel()
     
-    return state
+    return store_task_results(state, errors)
 
-def final_report(state: ExecutorState) -> ExecutorState:
+def final_report(state: ExecutorState) -> Dict[str, Any]:
     """Create a final report of all executed tasks"""
     logger.info("Creating final report")
     
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
-    
-    # Format the tasks and results
-    tasks_text = ""
-    for i, task in enumerate(state.completed_tasks):
-        tasks_text += f"## Task {i+1}: {task['description']}\n\n"
-        tasks_text += f"**Result:** {task['result']}\n\n"
+    response = create_llm_agent().invoke(create_report_messages(state))
     
-    # Ask the agent to create a summary report
-    messages = [
-        create_system_message(),
-        HumanMessage(content=f"I've completed the following tasks:\n\n{tasks_text}\n\nProvide a summary report of what was accomplished.")
-    ]
-    
-    response = agent.invoke(messages)
-    
-    # Add response to message thread
-    state.messages.add_assistant_message(response.content)
+    return store_report(state, response.content)
+
+async def afinal_report(state: ExecutorState) -> Dict[str, Any]:
+    """Create a final report of all executed tasks (async)"""
+    logger.info("Creating final report")
     
-    state.add_node_output("final_report", response.content)
+    content = await agenerate_streamed(create_llm_agent(), create_report_messages(state), "final_report")
     
-    return state
-
-def decide_next_step(state: ExecutorState) -> str:
-    """Decide the next step in the workflow"""
-    if not state.tasks:
-        return "parse_tasks"
-        
-    # If there are still tasks to execute
-    if state.current_task_index < len(state.tasks):
-        return "execute_tasks"
-        
-    # If all tasks are complete, generate a report
-    return "final_report"
+    return store_report(state, content)
 
 def create_executor_agent() -> StateGraph:
     """Create the executor agent workflow"""
     # Create the graph
-    workflow = StateGraph(ExecutorState)
+    workflow = StateGraph(ExecutorState.graph_schema())
     
     # Add nodes
-    workflow.add_node("parse_tasks", parse_tasks)
-    workflow.add_node("execute_tasks", execute_tasks)
-    workflow.add_node("final_report", final_report)
-    
-    # Add conditional edges
-    workflow.add_conditional_edges(
-        "",  # Starting node
-        decide_next_step,
-        {
-            "parse_tasks": "parse_tasks",
-            "execute_tasks": "execute_tasks",
-            "final_report": "final_report"
-        }
-    )
+    workflow.add_node("parse_tasks", create_node("parse_tasks", parse_tasks, aparse_tasks, graph="executor"))
+    workflow.add_node("execute_tasks", create_node("execute_tasks", execute_tasks, aexecute_tasks, graph="executor"))
+    workflow.add_node("final_report", create_node("final_report", final_report, afinal_report, graph="executor"))
+    
+    # Nodes that already finished in a resumed run skip themselves
+    workflow.set_entry_point("parse_tasks")
     
     # Add regular edges
     workflow.add_edge("parse_tasks", "execute_tasks")
-    workflow.add_edge("execute_tasks", decide_next_step)
+    workflow.add_edge("execute_tasks", "final_report")
     workflow.add_edge("final_report", END)
     
     # Compile the graph
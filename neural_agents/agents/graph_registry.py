@@ -0,0 +1,122 @@
+import threading
+from typing import Dict, Any, Callable, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class GraphRegistry:
+    """
+    Registry of compiled agent graphs.
+
+    Each agent type has a builder that returns a compiled graph. Graphs are
+    compiled once and reused by every request; a new version can be swapped in
+    at any time without restarting the server; requests already running keep
+    the graph they started with.
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._graphs: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def register(self, agent_type: str, builder: Callable[[], Any]) -> None:
+        """
+        Register the builder for an agent type.
+
+        Args:
+            agent_type: The agent type name
+            builder: A callable that returns a compiled graph
+        """
+        with self._lock:
+            self._builders[agent_type] = builder
+
+    def get(self, agent_type: str) -> Any:
+        """
+        Get the compiled graph for an agent type, compiling it on first use.
+
+        Args:
+            agent_type: The agent type name
+
+        Returns:
+            The compiled graph
+        """
+        graph = self._graphs.get(agent_type)
+        if graph is None:
+            with self._lock:
+                graph = self._graphs.get(agent_type)
+                if graph is None:
+                    graph = self._compile(agent_type)
+                    self._graphs[agent_type] = graph
+                    self._versions[agent_type] = self._versions.get(agent_type, 0) + 1
+        return graph
+
+    def swap(self, agent_type: str, graph: Any) -> int:
+        """
+        Replace the compiled graph for an agent type.
+
+        Args:
+            agent_type: The agent type name
+            graph: The new compiled graph
+
+        Returns:
+            The new version number
+        """
+        with self._lock:
+            self._graphs[agent_type] = graph
+            self._versions[agent_type] = self._versions.get(agent_type, 0) + 1
+            version = self._versions[agent_type]
+
+        logger.info(f"Swapped in version {version} of the {agent_type} graph")
+        return version
+
+    def reload(self, agent_type: str, builder: Optional[Callable[[], Any]] = None) -> int:
+        """
+        Recompile the graph for an agent type and swap it in.
+
+        The new graph is compiled before the old one is replaced, so requests
+        never see a half-built graph.
+
+        Args:
+            agent_type: The agent type name
+            builder: An optional new builder to register first
+
+        Returns:
+            The new version number
+        """
+        if builder is not None:
+            self.register(agent_type, builder)
+
+        return self.swap(agent_type, self._compile(agent_type))
+
+    def warm_up(self) -> List[str]:
+        """
+        Compile every registered graph that isn't compiled yet.
+
+        Returns:
+            The agent types that failed to compile
+        """
+        failed = []
+        for agent_type in list(self._builders):
+            try:
+                self.get(agent_type)
+            except Exception as e:
+                logger.error(f"Error compiling {agent_type} graph: {str(e)}")
+                failed.append(agent_type)
+        return failed
+
+    def versions(self) -> Dict[str, Optional[int]]:
+        """Get the current version of each registered graph (None if not compiled yet)"""
+        return {agent_type: self._versions.get(agent_type) for agent_type in self._builders}
+
+    def __contains__(self, agent_type: str) -> bool:
+        return agent_type in self._builders
+
+    def _compile(self, agent_type: str) -> Any:
+        """Build and compile the graph for an agent type"""
+        if agent_type not in self._builders:
+            raise ValueError(f"Unknown agent type: {agent_type}")
+
+        logger.info(f"Compiling {agent_type} graph")
+        return self._builders[agent_type]()
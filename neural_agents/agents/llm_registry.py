@@ -0,0 +1,378 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+import httpx
+import openai
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from ..config import settings
+from ..utils.concurrency import run_in_executor
+from ..utils.logger import get_logger
+from ..utils.metrics import LLMMetricsHandler, llm_queue_time
+from ..utils.rate_limit import LLMRateLimiter, describe_request, get_llm_rate_limiter
+from ..utils.shared_state import ConcurrencyLimiter, get_llm_limiter
+from ..utils.tracing import LLMTraceHandler
+
+logger = get_logger(__name__)
+
+ClientKey = Tuple[str, float, Optional[int], str, Tuple[Tuple[str, str], ...]]
+
+# Builds a chat model from (model, temperature, max_tokens, api_key, callbacks, **kwargs)
+ClientFactory = Callable[..., BaseChatModel]
+
+class _Slots:
+    """The concurrency slots an LLM request holds: its model's adaptive slot and the global one"""
+
+    def __init__(self, model_limiter: Optional[ConcurrencyLimiter], limiter: Optional[ConcurrencyLimiter]):
+        self._held: List[Tuple[ConcurrencyLimiter, str]] = []
+        self._model_limiter = model_limiter
+        self._limiter = limiter
+
+    def acquire(self) -> None:
+        for limiter in (self._model_limiter, self._limiter):
+            if limiter is not None:
+                self._held.append((limiter, limiter.acquire()))
+
+    async def aacquire(self) -> None:
+        for limiter in (self._model_limiter, self._limiter):
+            if limiter is not None:
+                self._held.append((limiter, await limiter.aacquire()))
+
+    def release(self) -> None:
+        while self._held:
+            limiter, token = self._held.pop()
+            limiter.release(token)
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the request's concurrency slots back once it is closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, slots: _Slots):
+        self._stream = stream
+        self._slots = slots
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._slots.release()
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Async response body that gives the request's concurrency slots back once it is closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, slots: _Slots):
+        self._stream = stream
+        self._slots = slots
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._slots.release()
+
+def _describe(request: httpx.Request) -> Tuple[str, int]:
+    """Get the model of an LLM request and the tokens it may use"""
+    try:
+        return describe_request(request.content)
+    except httpx.RequestNotRead:
+        return "unknown", 0
+
+class LLMTransport(httpx.BaseTransport):
+    """
+    HTTP transport in front of every LLM request.
+
+    Waits for the model's rate limits, then holds its adaptive concurrency
+    slot and the global one (`LLM_MAX_CONCURRENCY`) from sending the request
+    until its response is closed. Throttled, failed and timed out requests
+    are retried with backoff.
+    """
+
+    def __init__(self,
+                 transport: httpx.BaseTransport,
+                 rate_limiter: LLMRateLimiter,
+                 limiter: Optional[ConcurrencyLimiter] = None):
+        self._transport = transport
+        self._rate_limiter = rate_limiter
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _describe(request)
+        model_limiter = self._rate_limiter.for_model(model)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            time.sleep(model_limiter.reserve(tokens))
+            slots = _Slots(model_limiter.slots, self._limiter)
+            try:
+                slots.acquire()
+            except BaseException:
+                slots.release()
+                raise
+            llm_queue_time.observe(time.perf_counter() - start, model=model)
+
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                slots.release()
+                delay = model_limiter.on_error(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                slots.release()
+                raise
+            else:
+                delay = model_limiter.on_response(response.status_code, response.headers, attempt)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, slots)
+                    return response
+                response.close()
+                slots.release()
+
+            logger.warning(f"Retrying LLM request to {model} in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self._transport.close()
+
+class AsyncLLMTransport(httpx.AsyncBaseTransport):
+    """Async version of `LLMTransport`"""
+
+    def __init__(self,
+                 transport: httpx.AsyncBaseTransport,
+                 rate_limiter: LLMRateLimiter,
+                 limiter: Optional[ConcurrencyLimiter] = None):
+        self._transport = transport
+        self._rate_limiter = rate_limiter
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _describe(request)
+        model_limiter = self._rate_limiter.for_model(model)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            wait = await run_in_executor(model_limiter.reserve, tokens) if model_limiter.shared else model_limiter.reserve(tokens)
+            await asyncio.sleep(wait)
+            slots = _Slots(model_limiter.slots, self._limiter)
+            try:
+                await slots.aacquire()
+            except BaseException:
+                slots.release()
+                raise
+            llm_queue_time.observe(time.perf_counter() - start, model=model)
+
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                slots.release()
+                delay = model_limiter.on_error(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                slots.release()
+                raise
+            else:
+                delay = model_limiter.on_response(response.status_code, response.headers, attempt)
+                if delay is None:
+                    response.stream = _AsyncReleasingStream(response.stream, slots)
+                    return response
+                await response.aclose()
+                slots.release()
+
+            logger.warning(f"Retrying LLM request to {model} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+class LLMClientRegistry:
+    """
+    Process-wide registry of ChatOpenAI clients.
+
+    Clients are keyed by (model, temperature, max_tokens, api_key) plus any extra
+    constructor arguments, and all of them share one pooled sync and one pooled
+    async HTTP client, so keep-alive connections and TLS sessions are reused
+    across nodes and requests. The pools' transports apply the per-model rate
+    limits, adaptive concurrency limits and retries of the LLM rate limiter,
+    and with `LLM_MAX_CONCURRENCY` set hold a slot of the global LLM
+    concurrency limiter for every request (the limits and token buckets are
+    shared by all worker processes in multi-worker mode).
+    """
+
+    def __init__(self,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.llm.max_connections,
+            max_keepalive_connections=max_keepalive_connections or settings.llm.max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.llm.keepalive_expiry
+        )
+        self._clients: Dict[ClientKey, ChatOpenAI] = {}
+        self._hits: Dict[ClientKey, int] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._client_factory: Optional[ClientFactory] = None
+        self.limiter = get_llm_limiter()
+        self.rate_limiter = get_llm_rate_limiter()
+
+    def set_client_factory(self, factory: Optional[ClientFactory]) -> None:
+        """
+        Build clients with `factory` instead of ChatOpenAI (e.g. a local stand-in
+        for benchmarks), or go back to ChatOpenAI with None.
+
+        Clients created before the switch are forgotten.
+        """
+        with self._lock:
+            self._client_factory = factory
+            self._clients.clear()
+            self._hits.clear()
+
+    def get(self,
+            model: str,
+            temperature: float,
+            max_tokens: Optional[int],
+            api_key: str,
+            **kwargs) -> ChatOpenAI:
+        """
+        Get the shared client for the given configuration, creating it on first use.
+
+        Args:
+            model: The model to use
+            temperature: The temperature to use
+            max_tokens: The maximum number of tokens to generate
+            api_key: The API key to use
+            **kwargs: Additional arguments to pass to the ChatOpenAI constructor
+
+        Returns:
+            A ChatOpenAI instance backed by the shared connection pools
+        """
+        key = (model, temperature, max_tokens, api_key, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create_client(model, temperature, max_tokens, api_key, **kwargs)
+                self._clients[key] = client
+                self._hits[key] = 0
+                logger.info(f"Created LLM client for model {model} (temperature={temperature}, max_tokens={max_tokens})")
+            self._hits[key] += 1
+
+        return client
+
+    def _create_client(self,
+                       model: str,
+                       temperature: float,
+                       max_tokens: Optional[int],
+                       api_key: str,
+                       **kwargs) -> BaseChatModel:
+        """Create a ChatOpenAI instance that uses the shared HTTP clients and records call metrics and traces"""
+        callbacks = [LLMMetricsHandler(model), LLMTraceHandler(model), *(kwargs.pop("callbacks", None) or [])]
+        if self._client_factory is not None:
+            return self._client_factory(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                api_key=api_key,
+                callbacks=callbacks,
+                **kwargs
+            )
+
+        # Retries happen in the transport, where they respect the rate limits and Retry-After
+        client_params = {"api_key": api_key, "max_retries": kwargs.get("max_retries", 0)}
+        if kwargs.get("base_url"):
+            client_params["base_url"] = kwargs["base_url"]
+
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=api_key,
+            client=openai.OpenAI(http_client=self._get_http_client(), **client_params).chat.completions,
+            async_client=openai.AsyncOpenAI(http_client=self._get_async_http_client(), **client_params).chat.completions,
+            callbacks=callbacks,
+            **kwargs
+        )
+
+    def _get_http_client(self) -> httpx.Client:
+        """Get the pooled sync HTTP client"""
+        if self._http_client is None:
+            transport = LLMTransport(httpx.HTTPTransport(limits=self.limits), self.rate_limiter, self.limiter)
+            self._http_client = httpx.Client(transport=transport)
+        return self._http_client
+
+    def _get_async_http_client(self) -> httpx.AsyncClient:
+        """Get the pooled async HTTP client"""
+        if self._async_http_client is None:
+            transport = AsyncLLMTransport(httpx.AsyncHTTPTransport(limits=self.limits), self.rate_limiter, self.limiter)
+            self._async_http_client = httpx.AsyncClient(transport=transport)
+        return self._async_http_client
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the registered clients and connection pools.
+
+        Returns:
+            A dictionary with per-client usage counts and pool connection counts
+        """
+        return {
+            "clients": [
+                {
+                    "model": key[0],
+                    "temperature": key[1],
+                    "max_tokens": key[2],
+                    "requests": self._hits.get(key, 0)
+                }
+                for key in list(self._clients)
+            ],
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry
+            },
+            "sync_pool": _connection_stats(self._http_client),
+            "async_pool": _connection_stats(self._async_http_client),
+            "concurrency": self.limiter.stats() if self.limiter is not None else None,
+            "rate_limits": self.rate_limiter.stats()
+        }
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP clients and forget all registered clients"""
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            async_http_client, self._async_http_client = self._async_http_client, None
+            self._clients.clear()
+            self._hits.clear()
+
+        if http_client is not None:
+            http_client.close()
+        if async_http_client is not None:
+            await async_http_client.aclose()
+
+def _connection_stats(http_client: Optional[Any]) -> Dict[str, int]:
+    """Count the open, idle and active connections of an HTTP client's pool"""
+    transport = getattr(http_client, "_transport", None)
+    # Look through the rate-limiting wrapper
+    transport = getattr(transport, "_transport", transport)
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle
+    }
+
+# Global registry instance
+llm_registry = LLMClientRegistry()
@@ -0,0 +1,97 @@
+from typing import Any, Awaitable, Callable, Dict, List
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableLambda
+
+from ..utils.checkpoint import get_checkpoint_run
+from ..utils.events import emit_event, streaming_enabled
+from ..utils.metrics import node_duration, node_errors
+from ..utils.tracing import trace_span
+
+def _node_end_event(name: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the payload of a node's end event from the output recorded in its state update"""
+    node_output = update.get("node_outputs", {}).get(name)
+    return {"node": name, "output": node_output.output if node_output else None}
+
+def create_node(name: str,
+                func: Callable[[Any], Dict[str, Any]],
+                afunc: Callable[[Any], Awaitable[Dict[str, Any]]],
+                graph: str = "") -> RunnableLambda:
+    """
+    Wrap the sync and async implementations of a node into a single runnable.
+
+    The graph uses `func` when run with `invoke()` and `afunc` when run with `ainvoke()`.
+    Both take the current state and return a state update (the changed channels),
+    and emit `node_start` and `node_end` events for streaming clients. When the
+    run is checkpointed, each update is saved, and nodes that already finished
+    in the run being resumed are skipped. The latency and failures of each
+    run are recorded in the node metrics, and traced requests get a span per run.
+
+    Args:
+        name: The node name
+        func: The synchronous node implementation
+        afunc: The asynchronous node implementation
+        graph: The graph the node belongs to, used to label its metrics
+
+    Returns:
+        A runnable that can be added to a StateGraph
+    """
+    def run(state: Any) -> Dict[str, Any]:
+        checkpoint_run = get_checkpoint_run()
+        if checkpoint_run is not None and checkpoint_run.skip_completed(name):
+            emit_event("node_end", {"node": name, "output": None, "skipped": True})
+            return {}
+
+        emit_event("node_start", {"node": name})
+        try:
+            with node_duration.time(graph=graph, node=name), trace_span(name, "node", graph=graph):
+                update = func(state)
+        except Exception:
+            node_errors.inc(graph=graph, node=name)
+            raise
+        if checkpoint_run is not None:
+            checkpoint_run.save(name, update)
+        emit_event("node_end", _node_end_event(name, update))
+        return update
+
+    async def arun(state: Any) -> Dict[str, Any]:
+        checkpoint_run = get_checkpoint_run()
+        if checkpoint_run is not None and checkpoint_run.skip_completed(name):
+            emit_event("node_end", {"node": name, "output": None, "skipped": True})
+            return {}
+
+        emit_event("node_start", {"node": name})
+        try:
+            with node_duration.time(graph=graph, node=name), trace_span(name, "node", graph=graph):
+                update = await afunc(state)
+        except Exception:
+            node_errors.inc(graph=graph, node=name)
+            raise
+        if checkpoint_run is not None:
+            await checkpoint_run.asave(name, update)
+        emit_event("node_end", _node_end_event(name, update))
+        return update
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+async def agenerate_streamed(agent: BaseChatModel, messages: List[BaseMessage], node: str) -> str:
+    """
+    Generate a response, streaming its tokens as `token` events when the run is being streamed.
+
+    Args:
+        agent: The LLM agent to call
+        messages: The messages to send
+        node: The node generating the response
+
+    Returns:
+        The full response content
+    """
+    if not streaming_enabled():
+        response = await agent.ainvoke(messages)
+        return response.content
+
+    chunks = []
+    async for chunk in agent.astream(messages):
+        chunks.append(chunk.content)
+        emit_event("token", {"node": node, "content": chunk.content})
+    return "".join(chunks)
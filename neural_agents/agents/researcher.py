@@ -1,22 +1,32 @@
-from typing import Dict, List, Any, Optional, TypeVar, Union, Callable
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from typing import Dict, List, Any, Optional, Tuple, TypeVar, Union, Callable, Annotated
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage, AIMessage
 from langgraph.graph import StateGraph, END
 
 from ..config import settings
-from ..schemas.agent_state import AgentState
+from ..schemas.agent_state import AgentState, add_unique, merge_dicts, error_update, next_node_update, node_output_update
+from ..schemas.message import MessageRecord
 from ..tools.web_search import WebSearchTool
+from ..utils.checkpoint import PROGRESS, asave_checkpoint
+from ..utils.concurrency import gather_with_concurrency
+from ..utils.events import emit_event
 from ..utils.logger import get_logger
+from ..utils.semantic_cache import get_semantic_cache
+from ..utils.tokens import estimate_tokens, group_by_token_budget
+from .agent_factory import create_llm_agent
+from .node import agenerate_streamed, create_node
 
 logger = get_logger(__name__)
 
+# Upper bound on the levels of partial summaries, in case the model's summaries don't shrink
+MAX_SUMMARY_LEVELS = 4
+
 # Initialize tools
 web_search_tool = WebSearchTool()
 
 class ResearcherState(AgentState):
     """State for the researcher agent workflow"""
-    research_topics: List[str] = []
-    research_findings: Dict[str, str] = {}
+    research_topics: Annotated[List[str], add_unique] = []
+    research_findings: Annotated[Dict[str, str], merge_dicts] = {}
     summary: str = ""
     
     def add_research_topic(self, topic: str) -> None:
@@ -49,157 +59,271 @@ def create_system_message() -> SystemMessage:
     Be thorough, accurate, and focus on factual information rather than opinions or speculation.
     """)
 
-def identify_research_topics(state: ResearcherState) -> ResearcherState:
-    """Identify research topics to explore"""
-    logger.info("Identifying research topics")
-    
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
-    
-    # Get the user's query from messages
-    user_messages = [msg for msg in state.messages.messages if msg.role == "user"]
-    if not user_messages:
-        state.add_error("identify_research_topics", "No user message found in state")
-        return state
+def create_synthesis_messages(topic: str, search_results: Any) -> List[BaseMessage]:
+    """Create the messages asking the agent to synthesize search results for a topic"""
+    return [
+        create_system_message(),
+        HumanMessage(content=f"Research subtopic: {topic}\n\nSearch results:\n{search_results}\n\nSynthesize this information into a concise paragraph.")
+    ]
+
+def create_topic_messages(query: str) -> List[BaseMessage]:
+    """Create the messages asking the agent to identify research topics"""
+    return [
+        create_system_message(),
+        HumanMessage(content=f"I need to research the following topic: {query}\n\nWhat are 3-5 specific subtopics or aspects I should research about this? List each one on a separate line.")
+    ]
+
+def format_findings(findings: Dict[str, str]) -> List[str]:
+    """Format the research findings as one markdown section per topic"""
+    return [f"## {topic}\n\n{finding}" for topic, finding in findings.items()]
+
+def create_summary_messages(sections: List[str]) -> List[BaseMessage]:
+    """Create the messages asking the agent to summarize the research findings"""
+    findings_text = "\n\n".join(sections)
     
-    query = user_messages[-1].content
+    return [
+        create_system_message(),
+        HumanMessage(content=f"Based on the following research findings, create a comprehensive summary:\n\n{findings_text}")
+    ]
+
+def create_partial_summary_messages(sections: List[str]) -> List[BaseMessage]:
+    """Create the messages asking the agent to condense a group of findings for a later summary"""
+    findings_text = "\n\n".join(sections)
     
-    # Ask the agent to identify research topics
-    messages = [
+    return [
         create_system_message(),
-        HumanMessage(content=f"I need to research the following topic: {query}\n\nWhat are 3-5 specific subtopics or aspects I should research about this? List each one on a separate line.")
+        HumanMessage(content=f"Condense the following research findings into a shorter set of notes. Keep every key fact, figure and source, and keep the topic headings:\n\n{findings_text}")
     ]
+
+def needs_reduction(sections: List[str], level: int) -> bool:
+    """Whether the findings are too large to summarize in one call"""
+    if len(sections) < 2 or level >= MAX_SUMMARY_LEVELS:
+        return False
+    return sum(estimate_tokens(section) for section in sections) > settings.agent.summary_token_threshold
+
+def get_user_query(state: ResearcherState) -> Optional[str]:
+    """Get the latest user query"""
+    user_message = state.messages.get_last_message("user")
+    return user_message.content if user_message else None
+
+def get_pending_topics(state: ResearcherState) -> List[str]:
+    """Get the topics that have not been researched yet"""
+    return [topic for topic in state.research_topics if topic not in state.research_findings]
+
+def store_research_topics(state: ResearcherState, content: str) -> Dict[str, Any]:
+    """Extract the research topics from the agent's response"""
+    topics = [line.strip() for line in content.split('\n') if line.strip()]
     
-    response = agent.invoke(messages)
+    return {
+        "research_topics": topics,
+        **node_output_update("identify_research_topics", topics),
+        **next_node_update(state, "research")
+    }
+
+def find_cached_findings(topics: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Reuse findings of semantically similar, previously researched topics.
     
-    # Extract topics
-    topics = [line.strip() for line in response.content.split('\n') if line.strip()]
+    Returns:
+        A tuple of (findings reused from the cache, topics that still need research)
+    """
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is None:
+        return {}, list(topics)
     
-    # Update state
+    findings = {}
+    uncached_topics = []
     for topic in topics:
-        state.add_research_topic(topic)
-        
-    state.add_node_output("identify_research_topics", topics)
-    state.set_next_node("research_topics")
+        match = semantic_cache.lookup(topic, namespace=settings.llm.model)
+        if match:
+            cached_topic, finding, similarity = match
+            logger.info(f"Reusing findings for '{cached_topic}' for topic '{topic}' (similarity {similarity:.2f})")
+            emit_event("topic_finding", {"topic": topic, "finding": finding, "cached": True})
+            findings[topic] = finding
+        else:
+            uncached_topics.append(topic)
     
-    return state
+    return findings, uncached_topics
 
-def research_topics(state: ResearcherState) -> ResearcherState:
-    """Research each identified topic"""
-    logger.info(f"Researching {len(state.research_topics)} topics")
-    
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
-    
-    # Research each topic
-    for topic in state.research_topics:
-        if topic in state.research_findings:
-            continue  # Skip if already researched
-            
-        logger.info(f"Researching topic: {topic}")
-        
-        # Search for information
-        search_results = web_search_tool.run(query=topic)
-        
-        # Synthesize the information
-        messages = [
-            create_system_message(),
-            HumanMessage(content=f"Research subtopic: {topic}\n\nSearch results:\n{search_results}\n\nSynthesize this information into a concise paragraph.")
-        ]
-        
-        response = agent.invoke(messages)
-        
-        # Store findings
-        state.add_research_finding(topic, response.content)
+def cache_findings(topics: List[str], responses: List[BaseMessage]) -> Dict[str, str]:
+    """Collect the synthesized findings and add them to the semantic cache"""
+    findings = {topic: response.content for topic, response in zip(topics, responses)}
     
-    state.add_node_output("research_topics", list(state.research_findings.keys()))
-    state.set_next_node("create_summary")
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        for topic, finding in findings.items():
+            semantic_cache.add(topic, finding, namespace=settings.llm.model)
     
-    return state
+    return findings
 
-def create_summary(state: ResearcherState) -> ResearcherState:
-    """Create a final summary of all research findings"""
-    logger.info("Creating research summary")
+def store_research_findings(state: ResearcherState, topics: List[str], findings: Dict[str, str]) -> Dict[str, Any]:
+    """Add the findings in topic order"""
+    research_findings = {topic: findings[topic] for topic in topics}
     
-    # Create LLM agent
-    agent = ChatOpenAI(
-        model=settings.llm.model,
-        temperature=settings.llm.temperature,
-        api_key=settings.llm.api_key
-    )
+    return {
+        "research_findings": research_findings,
+        **node_output_update("research_topics", list(state.research_findings) + list(research_findings)),
+        **next_node_update(state, "create_summary")
+    }
+
+def store_summary(state: ResearcherState, content: str) -> Dict[str, Any]:
+    """Store the final summary and add it to the message thread"""
+    return {
+        "summary": content,
+        "messages": [MessageRecord(role="assistant", content=content)],
+        **node_output_update("create_summary", content)
+    }
+
+def identify_research_topics(state: ResearcherState) -> Dict[str, Any]:
+    """Identify research topics to explore"""
+    logger.info("Identifying research topics")
     
-    # Format the research findings
-    findings_text = ""
-    for topic, finding in state.research_findings.items():
-        findings_text += f"## {topic}\n\n{finding}\n\n"
+    query = get_user_query(state)
+    if query is None:
+        return error_update("identify_research_topics", "No user message found in state")
     
-    # Ask the agent to create a summary
-    messages = [
-        create_system_message(),
-        HumanMessage(content=f"Based on the following research findings, create a comprehensive summary:\n\n{findings_text}")
-    ]
+    response = create_llm_agent().invoke(create_topic_messages(query))
     
-    response = agent.invoke(messages)
+    return store_research_topics(state, response.content)
+
+async def aidentify_research_topics(state: ResearcherState) -> Dict[str, Any]:
+    """Identify research topics to explore (async)"""
+    logger.info("Identifying research topics")
     
-    # Store the summary
-    state.set_summary(response.content)
+    query = get_user_query(state)
+    if query is None:
+        return error_update("identify_research_topics", "No user message found in state")
     
-    # Add response to message thread
-    state.messages.add_assistant_message(response.content)
+    response = await create_llm_agent().ainvoke(create_topic_messages(query))
+    
+    return store_research_topics(state, response.content)
+
+def research_topics(state: ResearcherState) -> Dict[str, Any]:
+    """Research each identified topic"""
+    pending_topics = get_pending_topics(state)
+    logger.info(f"Researching {len(pending_topics)} topics")
     
-    state.add_node_output("create_summary", response.content)
+    # Topics close enough to previously researched ones skip search and synthesis
+    findings, uncached_topics = find_cached_findings(pending_topics)
+    if uncached_topics:
+        max_concurrency = max(1, settings.agent.max_concurrency)
+        
+        # Search for information on all topics in one batch
+        search_results = web_search_tool.run_batch(uncached_topics, max_concurrency=max_concurrency)
+        
+        # Synthesize the information for all topics in one batch call
+        responses = create_llm_agent().batch(
+            [create_synthesis_messages(topic, results) for topic, results in zip(uncached_topics, search_results)],
+            config={"max_concurrency": max_concurrency}
+        )
+        for topic, response in zip(uncached_topics, responses):
+            emit_event("topic_finding", {"topic": topic, "finding": response.content})
+        findings.update(cache_findings(uncached_topics, responses))
     
-    return state
+    return store_research_findings(state, pending_topics, findings)
 
-def decide_next_step(state: ResearcherState) -> str:
-    """Decide the next step in the workflow"""
-    if not state.research_topics:
-        return "identify_research_topics"
+async def aresearch_topics(state: ResearcherState) -> Dict[str, Any]:
+    """Research each identified topic (async)"""
+    pending_topics = get_pending_topics(state)
+    logger.info(f"Researching {len(pending_topics)} topics")
+    
+    # Topics close enough to previously researched ones skip search and synthesis
+    findings, uncached_topics = find_cached_findings(pending_topics)
+    if uncached_topics:
+        max_concurrency = max(1, settings.agent.max_concurrency)
         
-    # If we have topics but not all findings, continue research
-    if len(state.research_findings) < len(state.research_topics):
-        return "research_topics"
+        # Search for information on all topics in one batch
+        search_results = await web_search_tool.arun_batch(uncached_topics, max_concurrency=max_concurrency)
         
-    # If we have all findings but no summary, create summary
-    if state.research_findings and not state.summary:
-        return "create_summary"
+        agent = create_llm_agent()
         
-    # Otherwise, we're done
-    return "end"
+        async def synthesize(topic: str, results: Any) -> BaseMessage:
+            response = await agent.ainvoke(create_synthesis_messages(topic, results))
+            emit_event("topic_finding", {"topic": topic, "finding": response.content})
+            # A resumed run only researches the topics that haven't finished
+            await asave_checkpoint("research", {"research_findings": {topic: response.content}}, kind=PROGRESS)
+            return response
+        
+        # Synthesize the information for all topics concurrently, streaming each finding as it completes
+        responses = await gather_with_concurrency(
+            max_concurrency,
+            *(synthesize(topic, results) for topic, results in zip(uncached_topics, search_results))
+        )
+        findings.update(cache_findings(uncached_topics, responses))
+    
+    return store_research_findings(state, pending_topics, findings)
+
+def reduce_findings(sections: List[str]) -> List[str]:
+    """
+    Condense findings too large for one summary call into partial summaries.
+    
+    Sections are grouped into chunks of at most `summary_chunk_tokens` and each
+    chunk is summarized in parallel, level after level, until the partial
+    summaries fit under `summary_token_threshold`.
+    """
+    agent = create_llm_agent()
+    level = 0
+    while needs_reduction(sections, level):
+        groups = group_by_token_budget(sections, settings.agent.summary_chunk_tokens)
+        logger.info(f"Condensing {len(sections)} findings into {len(groups)} partial summaries")
+        responses = agent.batch(
+            [create_partial_summary_messages(group) for group in groups],
+            config={"max_concurrency": max(1, settings.agent.max_concurrency)}
+        )
+        sections = [response.content for response in responses]
+        level += 1
+    return sections
+
+async def areduce_findings(sections: List[str]) -> List[str]:
+    """Condense findings too large for one summary call into partial summaries (async)"""
+    agent = create_llm_agent()
+    level = 0
+    while needs_reduction(sections, level):
+        groups = group_by_token_budget(sections, settings.agent.summary_chunk_tokens)
+        logger.info(f"Condensing {len(sections)} findings into {len(groups)} partial summaries")
+        responses = await gather_with_concurrency(
+            settings.agent.max_concurrency,
+            *(agent.ainvoke(create_partial_summary_messages(group)) for group in groups)
+        )
+        sections = [response.content for response in responses]
+        level += 1
+    return sections
+
+def create_summary(state: ResearcherState) -> Dict[str, Any]:
+    """Create a final summary of all research findings"""
+    logger.info("Creating research summary")
+    
+    sections = reduce_findings(format_findings(state.research_findings))
+    response = create_llm_agent().invoke(create_summary_messages(sections))
+    
+    return store_summary(state, response.content)
+
+async def acreate_summary(state: ResearcherState) -> Dict[str, Any]:
+    """Create a final summary of all research findings (async)"""
+    logger.info("Creating research summary")
+    
+    sections = await areduce_findings(format_findings(state.research_findings))
+    content = await agenerate_streamed(create_llm_agent(), create_summary_messages(sections), "create_summary")
+    
+    return store_summary(state, content)
 
 def create_researcher_agent() -> StateGraph:
     """Create the researcher agent workflow"""
     # Create the graph
-    workflow = StateGraph(ResearcherState)
+    workflow = StateGraph(ResearcherState.graph_schema())
     
     # Add nodes
-    workflow.add_node("identify_research_topics", identify_research_topics)
-    workflow.add_node("research_topics", research_topics)
-    workflow.add_node("create_summary", create_summary)
-    
-    # Add edges based on the decision function
-    workflow.add_conditional_edges(
-        "",  # This is the starting node (empty string)
-        decide_next_step,
-        {
-            "identify_research_topics": "identify_research_topics",
-            "research_topics": "research_topics",
-            "create_summary": "create_summary",
-            "end": END
-        }
-    )
+    workflow.add_node("identify_research_topics", create_node("identify_research_topics", identify_research_topics, aidentify_research_topics, graph="researcher"))
+    # Not "research_topics": StateGraph rejects node names that are also state channels
+    workflow.add_node("research", create_node("research", research_topics, aresearch_topics, graph="researcher"))
+    workflow.add_node("create_summary", create_node("create_summary", create_summary, acreate_summary, graph="researcher"))
+    
+    # Nodes that already finished in a resumed run skip themselves
+    workflow.set_entry_point("identify_research_topics")
     
     # Add regular edges
-    workflow.add_edge("identify_research_topics", "research_topics")
-    workflow.add_edge("research_topics", "create_summary")
+    workflow.add_edge("identify_research_topics", "research")
+    workflow.add_edge("research", "create_summary")
     workflow.add_edge("create_summary", END)
     
     # Compile the graph
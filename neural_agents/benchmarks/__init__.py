@@ -0,0 +1 @@
+"""Benchmarks for the neural agent system"""
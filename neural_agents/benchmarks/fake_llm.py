@@ -0,0 +1,249 @@
+"""
+Deterministic local stand-in for the OpenAI chat model.
+
+The same prompt always gets the same response, token counts and latency, so
+benchmarks measure the graph, API and tool overhead instead of the provider.
+Latency is drawn from a configurable distribution (seeded by the prompt) and
+responses have a configurable number of completion tokens. Prompts asking for
+research topics or a numbered task list get answers the agents can parse.
+
+Use it in-process with `install_fake_llm()`, which makes the LLM client
+registry build `FakeChatModel`s instead of ChatOpenAI clients, or over HTTP
+with `fake_openai_server`.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from ..agents.llm_registry import llm_registry
+from ..utils.tokens import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# Words the fake responses are made of (one token each)
+_WORDS = (
+    "model", "agent", "graph", "state", "data", "result", "method", "system", "network", "layer",
+    "training", "inference", "latency", "cache", "token", "search", "report", "analysis", "task", "summary"
+)
+
+class LatencyModel:
+    """
+    Distribution of response latencies in seconds.
+
+    `spread` is the half-width for uniform, the standard deviation for normal
+    and the sigma of the underlying normal for lognormal; the mean is kept at
+    `mean` for every distribution.
+    """
+
+    def __init__(self, distribution: str = "lognormal", mean: float = 0.5, spread: float = 0.3):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution} (expected one of {list(LATENCY_DISTRIBUTIONS)})")
+        self.distribution = distribution
+        self.mean = mean
+        self.spread = spread
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "fixed":
+            return self.mean
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == "normal":
+            return max(0.0, rng.gauss(self.mean, self.spread))
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(math.log(self.mean) - self.spread ** 2 / 2, self.spread)
+        return rng.expovariate(1 / self.mean)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"distribution": self.distribution, "mean": self.mean, "spread": self.spread}
+
+class FakeResponse:
+    """A fake completion: its content, token counts and latency"""
+    __slots__ = ("content", "prompt_tokens", "completion_tokens", "latency")
+
+    def __init__(self, content: str, prompt_tokens: int, completion_tokens: int, latency: float):
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency = latency
+
+class FakeResponder:
+    """
+    Generates deterministic responses to prompts.
+
+    Args:
+        latency: The latency distribution
+        completion_tokens: Mean number of completion tokens
+        completion_spread: Completion tokens vary uniformly by up to this many either way
+        list_items: Number of topics or tasks in list answers
+        seed: Mixed into every prompt's seed, to get a different but still repeatable run
+    """
+
+    def __init__(self,
+                 latency: Optional[LatencyModel] = None,
+                 completion_tokens: int = 200,
+                 completion_spread: int = 50,
+                 list_items: int = 4,
+                 seed: int = 0):
+        self.latency = latency or LatencyModel()
+        self.completion_tokens = completion_tokens
+        self.completion_spread = completion_spread
+        self.list_items = list_items
+        self.seed = seed
+
+    def respond(self, messages: Sequence[Tuple[str, str]]) -> FakeResponse:
+        """Respond to a conversation given as (role, content) pairs"""
+        prompt = "\n".join(content for _, content in messages)
+        digest = hashlib.sha256(f"{self.seed}\x00{prompt}".encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+
+        last_message = messages[-1][1] if messages else ""
+        if "numbered line" in last_message:
+            content = self._task_list(rng)
+        elif "separate line" in last_message or "List 3-5" in last_message:
+            content = "\n".join(self._words(rng, 4).capitalize() for _ in range(self.list_items))
+        else:
+            count = max(1, self.completion_tokens + rng.randint(-self.completion_spread, self.completion_spread))
+            content = self._words(rng, count).capitalize() + "."
+
+        return FakeResponse(content, estimate_tokens(prompt), estimate_tokens(content), self.latency.sample(rng))
+
+    def _words(self, rng: random.Random, count: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+    def _task_list(self, rng: random.Random) -> str:
+        """A numbered task list where every other task depends on the one before it"""
+        lines = []
+        for number in range(1, self.list_items + 1):
+            line = f"{number}. {self._words(rng, 5).capitalize()}"
+            if number % 2 == 0:
+                line += f" (depends on: {number - 1})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.to_dict(),
+            "completion_tokens": self.completion_tokens,
+            "completion_spread": self.completion_spread,
+            "list_items": self.list_items,
+            "seed": self.seed
+        }
+
+# Tokens per streamed chunk
+STREAM_CHUNK_TOKENS = 8
+
+# Share of the latency spent before the first streamed chunk
+FIRST_CHUNK_SHARE = 0.3
+
+def split_stream(response: FakeResponse) -> Tuple[float, List[Tuple[float, str]]]:
+    """Split a response into streamed chunks: the delay before the first one, then (delay, text) pairs"""
+    words = response.content.split(" ")
+    pieces = [" ".join(words[i:i + STREAM_CHUNK_TOKENS]) for i in range(0, len(words), STREAM_CHUNK_TOKENS)]
+    delay = response.latency * (1 - FIRST_CHUNK_SHARE) / max(1, len(pieces) - 1)
+    return response.latency * FIRST_CHUNK_SHARE, [
+        (delay if i else 0.0, piece if i == 0 else " " + piece) for i, piece in enumerate(pieces)
+    ]
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering with a `FakeResponder`, reporting token usage like ChatOpenAI"""
+
+    responder: Any
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-openai"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def _respond(self, messages: List[BaseMessage]) -> FakeResponse:
+        return self.responder.respond([(message.type, str(message.content)) for message in messages])
+
+    def _result(self, response: FakeResponse) -> ChatResult:
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=response.content))],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": response.prompt_tokens,
+                    "completion_tokens": response.completion_tokens,
+                    "total_tokens": response.prompt_tokens + response.completion_tokens
+                },
+                "model_name": self.model_name
+            }
+        )
+
+    def _generate(self,
+                  messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None,
+                  **kwargs: Any) -> ChatResult:
+        response = self._respond(messages)
+        time.sleep(response.latency)
+        return self._result(response)
+
+    async def _agenerate(self,
+                         messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        response = self._respond(messages)
+        await asyncio.sleep(response.latency)
+        return self._result(response)
+
+    def _stream(self,
+                messages: List[BaseMessage],
+                stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        first_delay, chunks = split_stream(self._respond(messages))
+        time.sleep(first_delay)
+        for delay, text in chunks:
+            time.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self,
+                       messages: List[BaseMessage],
+                       stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        first_delay, chunks = split_stream(self._respond(messages))
+        await asyncio.sleep(first_delay)
+        for delay, text in chunks:
+            await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+def install_fake_llm(responder: Optional[FakeResponder] = None) -> FakeResponder:
+    """
+    Make the LLM client registry build `FakeChatModel`s for every agent.
+
+    Returns:
+        The responder the fake models answer with
+    """
+    responder = responder or FakeResponder()
+
+    def create_fake_client(model: str, temperature: float, max_tokens: Optional[int], api_key: str, callbacks: List[Any], **kwargs) -> FakeChatModel:
+        return FakeChatModel(responder=responder, model_name=model, callbacks=callbacks, cache=kwargs.get("cache"))
+
+    llm_registry.set_client_factory(create_fake_client)
+    return responder
+
+def uninstall_fake_llm() -> None:
+    """Go back to ChatOpenAI clients"""
+    llm_registry.set_client_factory(None)
@@ -0,0 +1,112 @@
+"""
+Local OpenAI-compatible HTTP stub answering with the deterministic fake LLM.
+
+Serves `POST /v1/chat/completions` (plain and streamed), so the apps can be
+benchmarked end to end, including their HTTP client pools, by pointing them at
+it: `LLM_BASE_URL` for `neural_agents/main.py`, `OPENAI_BASE_URL` for `app.py`.
+
+Run from the repository root:
+
+    python -m neural_agents.benchmarks.fake_openai_server --port 8100 --latency lognormal --latency-mean 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+import uvicorn
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+from .fake_llm import LATENCY_DISTRIBUTIONS, FakeResponder, LatencyModel, split_stream
+
+def create_app(responder: Optional[FakeResponder] = None) -> FastAPI:
+    """Create the stub app answering with `responder`"""
+    responder = responder or FakeResponder()
+    app = FastAPI(title="Fake OpenAI")
+    ids = itertools.count(1)
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "responder": responder.to_dict()}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any] = Body(...)):
+        messages = [(message.get("role", "user"), str(message.get("content") or "")) for message in body.get("messages", [])]
+        response = responder.respond(messages)
+        completion_id = f"chatcmpl-fake-{next(ids)}"
+        model = body.get("model", "fake")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(response.latency)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": response.content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": response.prompt_tokens,
+                    "completion_tokens": response.completion_tokens,
+                    "total_tokens": response.prompt_tokens + response.completion_tokens
+                }
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def stream() -> AsyncIterator[str]:
+            first_delay, chunks = split_stream(response)
+            yield chunk({"role": "assistant", "content": ""})
+            await asyncio.sleep(first_delay)
+            for delay, text in chunks:
+                await asyncio.sleep(delay)
+                yield chunk({"content": text})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+def add_responder_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options configuring the fake responses"""
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="Latency distribution")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mean latency in seconds")
+    parser.add_argument("--latency-spread", type=float, default=0.3, help="Latency spread (see LatencyModel)")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Mean completion tokens per response")
+    parser.add_argument("--seed", type=int, default=0, help="Seed mixed into every prompt's seed")
+
+def create_responder(args: argparse.Namespace) -> FakeResponder:
+    """Create the responder configured by the command line options"""
+    return FakeResponder(
+        latency=LatencyModel(args.latency, args.latency_mean, args.latency_spread),
+        completion_tokens=args.completion_tokens,
+        completion_spread=args.completion_tokens // 4,
+        seed=args.seed
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8100, help="Port to listen on")
+    add_responder_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(create_responder(args)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
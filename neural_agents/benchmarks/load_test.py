@@ -0,0 +1,275 @@
+"""
+Load test of the agent APIs and graphs with the deterministic fake LLM.
+
+Sends requests at fixed concurrency levels and reports throughput and
+p50/p95/p99 latency for each level. Targets:
+
+- `query-researcher`, `query-executor`: `POST /query` of `neural_agents/main.py`
+- `research`: `POST /research` of `app.py`
+- `graph-researcher`, `graph-executor`: the compiled graphs run in-process with
+  the fake LLM installed in the client registry (no HTTP, just graph and tool overhead)
+
+The HTTP targets run against `--url`, or with `--launch` the app is started on
+`--port` and pointed at a fake OpenAI stub served on `--stub-port`. Results are
+saved as JSON under `--output` and can be compared with an earlier run.
+
+Run from the repository root:
+
+    python -m neural_agents.benchmarks.load_test --target query-researcher --launch --concurrency 1 8 32
+    python -m neural_agents.benchmarks.load_test --target graph-executor --concurrency 1 8 32 --requests 32 --compare neural_agents/benchmarks/results/baseline-graph-executor.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+import uvicorn
+
+from .fake_llm import FakeResponder, install_fake_llm
+from .fake_openai_server import add_responder_arguments, create_app, create_responder
+
+TARGETS = ("query-researcher", "query-executor", "research", "graph-researcher", "graph-executor")
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """The p-th percentile of sorted values, interpolating between the closest ranks"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+def create_query(i: int) -> str:
+    """The i-th benchmark query (distinct, so the LLM and search caches don't skew the results)"""
+    return f"What are the recent advances in area {i} of neural network research?"
+
+def create_http_request(target: str, client: httpx.AsyncClient) -> Callable[[int], Awaitable[None]]:
+    """Build the function sending the i-th request of an HTTP target"""
+    async def send(i: int) -> None:
+        if target == "research":
+            response = await client.post("/research", json={"query": create_query(i)})
+        else:
+            agent_type = target.split("-", 1)[1]
+            response = await client.post("/query", json={"query": create_query(i), "agent_type": agent_type})
+        response.raise_for_status()
+
+    return send
+
+def create_graph_request(target: str) -> Callable[[int], Awaitable[None]]:
+    """Build the function running the i-th in-process graph run"""
+    from ..agents.agent_factory import create_agent
+    from ..agents.executor import ExecutorState
+    from ..agents.researcher import ResearcherState
+
+    agent_type = target.split("-", 1)[1]
+    state_class = ResearcherState if agent_type == "researcher" else ExecutorState
+    agent_graph = create_agent(agent_type)
+
+    async def run(i: int) -> None:
+        state = state_class()
+        state.messages.add_user_message(create_query(i))
+        output = await agent_graph.ainvoke(state.to_channels())
+        if output.get("errors"):
+            raise RuntimeError(output["errors"][-1])
+
+    return run
+
+async def run_level(send: Callable[[int], Awaitable[None]], concurrency: int, requests: int, offset: int) -> Dict[str, Any]:
+    """Send `requests` requests with `concurrency` workers and summarize their latencies"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_request = iter(range(offset, offset + requests))
+
+    async def worker() -> None:
+        for i in next_request:
+            start = time.perf_counter()
+            try:
+                await send(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                error = type(e).__name__
+                errors[error] = errors.get(error, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        }
+    }
+
+def start_stub(responder: FakeResponder, port: int) -> uvicorn.Server:
+    """Serve the fake OpenAI stub in a background thread"""
+    server = uvicorn.Server(uvicorn.Config(create_app(responder), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def launch_app(target: str, port: int, stub_port: int, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Start the app under test, pointed at the stub, and wait until it is healthy"""
+    stub_url = f"http://127.0.0.1:{stub_port}/v1"
+    env = {**os.environ, "PORT": str(port), "OPENAI_API_KEY": "fake", "SERVICE_DEBUG": "False", **(extra_env or {})}
+    if target == "research":
+        command, cwd = [sys.executable, "app.py"], REPOSITORY_ROOT
+        env["OPENAI_BASE_URL"] = stub_url
+    else:
+        command, cwd = [sys.executable, "-m", "neural_agents.main"], REPOSITORY_ROOT
+        env["LLM_BASE_URL"] = stub_url
+
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{command[-1]} exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{command[-1]} didn't become healthy within 60 seconds")
+
+async def run_benchmark(args: argparse.Namespace, responder: FakeResponder) -> List[Dict[str, Any]]:
+    """Run the warm-up and every concurrency level of the target"""
+    if args.target.startswith("graph-"):
+        install_fake_llm(responder)
+        send = create_graph_request(args.target)
+        client = None
+    else:
+        max_connections = max(args.concurrency)
+        client = httpx.AsyncClient(
+            base_url=args.url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        send = create_http_request(args.target, client)
+
+    try:
+        offset = 0
+        if args.warmup:
+            await run_level(send, min(args.warmup, max(args.concurrency)), args.warmup, offset)
+            offset += args.warmup
+
+        levels = []
+        for concurrency in args.concurrency:
+            level = await run_level(send, concurrency, args.requests, offset)
+            offset += args.requests
+            levels.append(level)
+            latency = level["latency_ms"]
+            print(f"{concurrency:>11} {level['throughput_rps']:>10.2f} {latency['p50']:>10.1f} {latency['p95']:>10.1f} "
+                  f"{latency['p99']:>10.1f} {sum(level['errors'].values()):>7}")
+        return levels
+    finally:
+        if client is not None:
+            await client.aclose()
+
+def git_commit() -> Optional[str]:
+    """The commit being benchmarked, if the tree is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(results: Dict[str, Any], output: str) -> str:
+    """Save a run's results, returning the file's path"""
+    os.makedirs(output, exist_ok=True)
+    path = os.path.join(output, f"{results['timestamp'].replace(':', '').replace('-', '')}-{results['target']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def compare_results(results: Dict[str, Any], baseline_path: str) -> None:
+    """Print the change in throughput and latency percentiles against a saved run"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("target") != results["target"]:
+        print(f"Baseline is for {baseline.get('target')}, not {results['target']}; skipping comparison")
+        return
+
+    def change(before: float, after: float) -> str:
+        return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+    print(f"{'concurrency':>11} {'rps':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for level in results["levels"]:
+        before = baseline_levels.get(level["concurrency"])
+        if before is None:
+            continue
+        print(f"{level['concurrency']:>11} {change(before['throughput_rps'], level['throughput_rps']):>10} "
+              + " ".join(f"{change(before['latency_ms'][p], level['latency_ms'][p]):>10}" for p in ("p50", "p95", "p99")))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=TARGETS, default="query-researcher", help="What to load")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Request timeout in seconds")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL of the app under test (HTTP targets)")
+    parser.add_argument("--launch", action="store_true", help="Start the app under test and the fake OpenAI stub")
+    parser.add_argument("--port", type=int, default=8050, help="Port to launch the app on")
+    parser.add_argument("--stub-port", type=int, default=8100, help="Port to serve the fake OpenAI stub on")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Directory to save results in")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    add_responder_arguments(parser)
+    args = parser.parse_args()
+
+    responder = create_responder(args)
+    process = None
+    if args.launch and not args.target.startswith("graph-"):
+        start_stub(responder, args.stub_port)
+        process = launch_app(args.target, args.port, args.stub_port)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.target}: {args.requests} requests per level, fake LLM {responder.to_dict()}")
+    print(f"{'concurrency':>11} {'rps':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+    try:
+        levels = asyncio.run(run_benchmark(args, responder))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results = {
+        "target": args.target,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "fake_llm": responder.to_dict(),
+        "levels": levels
+    }
+    print(f"\nSaved results to {save_results(results, args.output)}")
+    if args.compare:
+        compare_results(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Throughput scaling of `neural_agents/main.py` with the number of worker processes.
+
+For every worker count the app is launched in multi-worker mode (`WORKERS`,
+with the LLM cache, search cache and LLM concurrency limit shared through
+SQLite) against the fake OpenAI stub, which runs in its own process so it
+doesn't become the bottleneck. `POST /query` is then loaded at a fixed
+concurrency. Each worker count gets fresh shared stores, so every run does
+the same work. Reports throughput, latency percentiles and the speedup over
+the first worker count, and saves the results under `--output`.
+
+Run from the repository root:
+
+    python -m neural_agents.benchmarks.scaling --workers 1 2 4 8 --concurrency 64 --requests 400
+"""
+import argparse
+import asyncio
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+import httpx
+
+from .fake_openai_server import add_responder_arguments, create_responder
+from .load_test import DEFAULT_OUTPUT, REPOSITORY_ROOT, create_http_request, git_commit, launch_app, run_level, save_results
+
+def start_stub_process(args: argparse.Namespace) -> subprocess.Popen:
+    """Run the fake OpenAI stub in its own process and wait until it is healthy"""
+    command = [
+        sys.executable, "-m", "neural_agents.benchmarks.fake_openai_server",
+        "--port", str(args.stub_port),
+        "--latency", args.latency,
+        "--latency-mean", str(args.latency_mean),
+        "--latency-spread", str(args.latency_spread),
+        "--completion-tokens", str(args.completion_tokens),
+        "--seed", str(args.seed)
+    ]
+    process = subprocess.Popen(command, cwd=REPOSITORY_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Stub exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.stub_port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Stub didn't become healthy within 30 seconds")
+
+async def load(args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    """Warm the app up, then load it at the configured concurrency"""
+    client = httpx.AsyncClient(
+        base_url=url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    )
+    try:
+        send = create_http_request(f"query-{args.agent_type}", client)
+        if args.warmup:
+            await run_level(send, min(args.warmup, args.concurrency), args.warmup, 0)
+        return await run_level(send, args.concurrency, args.requests, args.warmup)
+    finally:
+        await client.aclose()
+
+def run_workers(args: argparse.Namespace, workers: int) -> Dict[str, Any]:
+    """Launch the app with `workers` processes and load it"""
+    with tempfile.TemporaryDirectory(prefix="scaling-") as directory:
+        env = {
+            "WORKERS": str(workers),
+            "SHARED_STATE_PATH": os.path.join(directory, "shared_state.sqlite"),
+            "SEARCH_CACHE_PATH": os.path.join(directory, "search_cache.sqlite"),
+            "LLM_CACHE_PATH": os.path.join(directory, "llm_cache.sqlite"),
+            "JOB_QUEUE_PATH": os.path.join(directory, "jobs.sqlite"),
+            "LLM_MAX_CONCURRENCY": str(args.llm_max_concurrency)
+        }
+        process = launch_app(f"query-{args.agent_type}", args.port, args.stub_port, env)
+        try:
+            level = asyncio.run(load(args, f"http://127.0.0.1:{args.port}"))
+        finally:
+            process.terminate()
+            process.wait()
+    level["workers"] = workers
+    return level
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--agent-type", choices=("researcher", "executor"), default="researcher", help="Agent to query")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per worker count")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Request timeout in seconds")
+    parser.add_argument("--llm-max-concurrency", type=int, default=0, help="LLM_MAX_CONCURRENCY of the app (0: no limit)")
+    parser.add_argument("--port", type=int, default=8050, help="Port to launch the app on")
+    parser.add_argument("--stub-port", type=int, default=8100, help="Port to serve the fake OpenAI stub on")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Directory to save results in")
+    add_responder_arguments(parser)
+    args = parser.parse_args()
+
+    responder = create_responder(args)
+    print(f"query-{args.agent_type}: {args.requests} requests at concurrency {args.concurrency}, fake LLM {responder.to_dict()}")
+    print(f"{'workers':>7} {'rps':>10} {'speedup':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+
+    stub = start_stub_process(args)
+    levels: List[Dict[str, Any]] = []
+    try:
+        for workers in args.workers:
+            level = run_workers(args, workers)
+            baseline = levels[0]["throughput_rps"] if levels else level["throughput_rps"]
+            level["speedup"] = round(level["throughput_rps"] / baseline, 2) if baseline else 0.0
+            levels.append(level)
+            latency = level["latency_ms"]
+            print(f"{workers:>7} {level['throughput_rps']:>10.2f} {level['speedup']:>7.2f}x {latency['p50']:>10.1f} "
+                  f"{latency['p95']:>10.1f} {latency['p99']:>10.1f} {sum(level['errors'].values()):>7}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    results = {
+        "target": f"scaling-{args.agent_type}",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "fake_llm": responder.to_dict(),
+        "levels": levels
+    }
+    print(f"\nSaved results to {save_results(results, args.output)}")
+
+if __name__ == "__main__":
+    main()
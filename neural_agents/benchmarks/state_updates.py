@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the per-step cost of graph state updates.
+
+Compares the previous approach (every step builds a validated state and the
+node mutates it with validated assignments) with delta updates (the state is
+built without validation and the node's update is merged through the channel
+reducers).
+
+Run from the repository root:
+
+    python -m neural_agents.benchmarks.state_updates --steps 2000 --messages 50
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from ..agents.researcher import ResearcherState
+from ..schemas.agent_state import next_node_update, node_output_update
+from ..schemas.message import MessageRecord
+
+def create_state(num_messages: int) -> ResearcherState:
+    """Create a state with a message thread and some research progress"""
+    state = ResearcherState()
+    for i in range(num_messages):
+        state.messages.add_user_message(f"Question {i}")
+        state.messages.add_assistant_message(f"Answer {i}")
+    state.research_topics = [f"Topic {i}" for i in range(5)]
+    state.research_findings = {f"Topic {i}": f"Finding {i}" for i in range(5)}
+    return state
+
+def whole_state_step(values: Dict[str, Any], step: int) -> Dict[str, Any]:
+    """One step of the previous approach: validated state, mutated in place"""
+    state = ResearcherState(**values)
+    state.add_node_output("create_summary", f"Summary {step}")
+    state.set_next_node("create_summary")
+    state.summary = f"Summary {step}"
+    state.messages.add_assistant_message(f"Summary {step}")
+    state.updated_at = datetime.now()
+    return state.to_channels()
+
+def delta_step(values: Dict[str, Any], step: int) -> Dict[str, Any]:
+    """One step with delta updates: unvalidated state, update merged by the reducers"""
+    schema = ResearcherState.graph_schema()
+    state = schema(**values)
+    update = {
+        "summary": f"Summary {step}",
+        "messages": [MessageRecord(role="assistant", content=f"Summary {step}")],
+        **node_output_update("create_summary", f"Summary {step}"),
+        **next_node_update(state, "create_summary")
+    }
+    return ResearcherState.apply_update(values, update)
+
+def measure(step: Callable[[Dict[str, Any], int], Dict[str, Any]], num_messages: int, steps: int) -> float:
+    """Run a step function repeatedly and return the mean time per step in microseconds"""
+    values = create_state(num_messages).to_channels()
+    start = time.perf_counter()
+    for i in range(steps):
+        values = step(values, i)
+    return (time.perf_counter() - start) / steps * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=2000, help="Steps to run per measurement")
+    parser.add_argument("--messages", type=int, nargs="+", default=[0, 50, 500], help="Thread lengths to measure")
+    args = parser.parse_args()
+    
+    print(f"{'messages':>10} {'whole state (us/step)':>24} {'delta (us/step)':>18} {'speedup':>9}")
+    for num_messages in args.messages:
+        before = measure(whole_state_step, num_messages, args.steps)
+        after = measure(delta_step, num_messages, args.steps)
+        print(f"{num_messages:>10} {before:>24.1f} {after:>18.1f} {before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
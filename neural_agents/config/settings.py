@@ -14,6 +14,19 @@ class LLMConfig(BaseModel):
         default=int(os.getenv("LLM_MAX_TOKENS", "1000")) if os.getenv("LLM_MAX_TOKENS") else None
     )
     api_key: str = os.getenv("OPENAI_API_KEY", "")
+    base_url: str = os.getenv("LLM_BASE_URL", "")
+    max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    max_keepalive_connections: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30.0"))
+    max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+    slot_lease: float = float(os.getenv("LLM_SLOT_LEASE", "300"))
+    requests_per_minute: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    tokens_per_minute: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    rate_limits: str = os.getenv("LLM_RATE_LIMITS", "")
+    adaptive_concurrency: int = int(os.getenv("LLM_ADAPTIVE_CONCURRENCY", "32"))
+    max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "60"))
 
 class AgentConfig(BaseModel):
     """Configuration for agents"""
@@ -22,29 +35,89 @@ class AgentConfig(BaseModel):
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     memory_type: str = os.getenv("MEMORY_TYPE", "buffer")
     memory_size: int = int(os.getenv("MEMORY_SIZE", "5"))
+    max_concurrency: int = int(os.getenv("AGENT_MAX_CONCURRENCY", "5"))
+    summary_token_threshold: int = int(os.getenv("SUMMARY_TOKEN_THRESHOLD", "6000"))
+    summary_chunk_tokens: int = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
     
 class ToolConfig(BaseModel):
     """Configuration for tools"""
     search_engine: str = os.getenv("SEARCH_ENGINE", "duckduckgo")
     search_api_key: Optional[str] = os.getenv("SEARCH_API_KEY", None)
     max_search_results: int = int(os.getenv("MAX_SEARCH_RESULTS", "5"))
+    search_cache_ttl: float = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+    search_cache_size: int = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    search_cache_path: str = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite")
+    search_max_concurrency: int = int(os.getenv("SEARCH_MAX_CONCURRENCY", "5"))
+    tool_timeout: float = float(os.getenv("TOOL_TIMEOUT", "30"))
+    tool_max_concurrency: int = int(os.getenv("TOOL_MAX_CONCURRENCY", "0"))
+    file_read_max_bytes: int = int(os.getenv("FILE_READ_MAX_BYTES", "1048576"))
+    file_index_cache_size: int = int(os.getenv("FILE_INDEX_CACHE_SIZE", "32"))
+    file_write_behind: bool = os.getenv("FILE_WRITE_BEHIND", "False").lower() == "true"
+    file_write_buffer_bytes: int = int(os.getenv("FILE_WRITE_BUFFER_BYTES", "65536"))
+    file_write_flush_interval: float = float(os.getenv("FILE_WRITE_FLUSH_INTERVAL", "1.0"))
+
+class CacheConfig(BaseModel):
+    """Configuration for caches"""
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "False").lower() == "true"
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+    llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", "86400"))
+    llm_cache_memory_entries: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+    llm_cache_disk_entries: int = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "100000"))
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+    semantic_cache_min_overlap: float = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", "0.5"))
+    semantic_cache_max_entries: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "4096"))
+    semantic_cache_ttl: float = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+
+class CheckpointConfig(BaseModel):
+    """Configuration for run checkpoints"""
+    enabled: bool = os.getenv("CHECKPOINT_ENABLED", "False").lower() == "true"
+    path: str = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+    ttl: float = float(os.getenv("CHECKPOINT_TTL", "604800"))
+
+class JobConfig(BaseModel):
+    """Configuration for the job queue"""
+    path: str = os.getenv("JOB_QUEUE_PATH", ".cache/jobs.sqlite")
+    workers: int = int(os.getenv("JOB_WORKERS", "64"))
+    max_queued: int = int(os.getenv("JOB_MAX_QUEUED", "100"))
+    max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    retry_agent_types: str = os.getenv("JOB_RETRY_AGENT_TYPES", "researcher")
+    retry_delay: float = float(os.getenv("JOB_RETRY_DELAY", "2.0"))
+    lease: float = float(os.getenv("JOB_LEASE", "60"))
+    poll_interval: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    result_ttl: float = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+class TraceConfig(BaseModel):
+    """Configuration for request traces"""
+    store_size: int = int(os.getenv("TRACE_STORE_SIZE", "256"))
+    ttl: float = float(os.getenv("TRACE_TTL", "3600"))
 
 class VisualizationConfig(BaseModel):
     """Configuration for visualizations"""
     graph_layout: str = os.getenv("GRAPH_LAYOUT", "dot")
     show_state_details: bool = os.getenv("SHOW_STATE_DETAILS", "True").lower() == "true"
+    svg_cache_size: int = int(os.getenv("SVG_CACHE_SIZE", "64"))
     
 class ServiceConfig(BaseModel):
     """Configuration for web service"""
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     debug: bool = os.getenv("SERVICE_DEBUG", "False").lower() == "true"
+    workers: int = int(os.getenv("WORKERS", "1"))
+    shared_state_path: str = os.getenv("SHARED_STATE_PATH", ".cache/shared_state.sqlite")
+    executor_workers: int = int(os.getenv("EXECUTOR_WORKERS", "16"))
+    process_workers: int = int(os.getenv("PROCESS_WORKERS", "4"))
+    coalesce_agent_types: str = os.getenv("COALESCE_AGENT_TYPES", "researcher")
 
 class Settings(BaseModel):
     """Main settings container"""
     llm: LLMConfig = LLMConfig()
     agent: AgentConfig = AgentConfig()
     tool: ToolConfig = ToolConfig()
+    cache: CacheConfig = CacheConfig()
+    checkpoint: CheckpointConfig = CheckpointConfig()
+    jobs: JobConfig = JobConfig()
+    trace: TraceConfig = TraceConfig()
     viz: VisualizationConfig = VisualizationConfig()
     service: ServiceConfig = ServiceConfig()
     
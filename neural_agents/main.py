@@ -1,15 +1,34 @@
+import asyncio
+import json
+import os
+import time
+import uuid
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Body
+from contextlib import nullcontext
+from fastapi import FastAPI, Depends, HTTPException, Body, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message as ASGIMessage, Receive, Scope, Send
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional, Union
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple, Type, Union
 
-from config import settings
-from schemas.message import Message, MessageThread
-from schemas.agent_state import AgentState
-from agents import create_agent
-from utils.visualization import visualize_graph
-from utils.logger import get_logger
+from .config import settings
+from .schemas.message import Message, MessageThread
+from .schemas.agent_state import AgentState
+from .agents import create_agent, llm_registry, graph_registry, warm_up_agents
+from .utils.visualization import avisualize_graph, graph_cache_key
+from .utils.logger import get_logger
+from .utils.llm_cache import get_llm_response_cache
+from .utils.semantic_cache import get_semantic_cache
+from .utils.concurrency import run_in_executor, shutdown_executor
+from .utils.checkpoint import CheckpointRun, get_checkpoint_store
+from .utils.metrics import (
+    CONTENT_TYPE, jobs, llm_slots_in_use, llm_slots_waiting, metrics, record_cache_stats, request_duration, requests_in_flight
+)
+from .utils.tracing import Trace, get_stored_trace, store_trace, trace_span
+from .utils.coalescing import RequestCoalescer, SharedRun, normalize_query, settings_fingerprint
+from .utils.jobs import JobError, JobQueue, QueueFullError, get_job_store
 
 logger = get_logger("main")
 
@@ -28,17 +47,138 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+def get_route_path(scope: Scope) -> str:
+    """Get the path template of the route a request matches (e.g. `/runs/{run_id}`), to label its metrics"""
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """
+    Count in-flight requests and time every response.
+    
+    Written as plain ASGI middleware so a streamed response is counted until
+    its last event is sent, not just until its headers are.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = get_route_path(scope)
+        status = 500
+        
+        async def send_with_status(message: ASGIMessage) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        with requests_in_flight.track_in_progress(path=path):
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                request_duration.observe(time.perf_counter() - start, method=scope["method"], path=path, status=status)
+
+app.add_middleware(MetricsMiddleware)
+
+def collect_cache_metrics() -> None:
+    """Export the hit and miss counters of the shared caches"""
+    from .agents.researcher import web_search_tool
+    
+    llm_cache = get_llm_response_cache()
+    if llm_cache is not None:
+        llm_stats = llm_cache.stats()
+        record_cache_stats("llm", llm_stats["hits"], llm_stats["misses"])
+    
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        semantic_stats = semantic_cache.stats()
+        record_cache_stats("semantic", semantic_stats["hits"], semantic_stats["misses"])
+    
+    search_stats = web_search_tool.cache.stats()
+    record_cache_stats("search", search_stats["hits"], search_stats["misses"])
+
+metrics.add_collector(collect_cache_metrics)
+
+def collect_job_metrics() -> None:
+    """Export the number of jobs in each status"""
+    if job_queue is not None:
+        for status, count in job_queue.store.counts().items():
+            jobs.set(count, status=status)
+
+metrics.add_collector(collect_job_metrics)
+
+def collect_limiter_metrics() -> None:
+    """Export the use of the LLM concurrency limit"""
+    if llm_registry.limiter is not None:
+        limiter_stats = llm_registry.limiter.stats()
+        llm_slots_in_use.set(limiter_stats["in_use_all_processes"])
+        llm_slots_waiting.set(limiter_stats["waiting"])
+
+metrics.add_collector(collect_limiter_metrics)
+
 class QueryRequest(BaseModel):
     """Model for query requests"""
     query: str
     agent_type: str = Field(default="researcher", description="Type of agent to use (researcher, executor)")
     context: Optional[str] = Field(default=None, description="Additional context for the agent")
+    run_id: Optional[str] = Field(default=None, description="Id of a checkpointed run to resume (or to give a new run)")
 
 class AgentResponse(BaseModel):
     """Model for agent responses"""
     result: str
     details: Optional[Dict[str, Any]] = None
 
+# Identical concurrent queries share one run
+coalescer = RequestCoalescer()
+
+# Workers running queued jobs, started with the app
+job_queue: Optional[JobQueue] = None
+
+# Seconds clients are asked to wait before resubmitting when the job queue is full
+QUEUE_FULL_RETRY_AFTER = 5
+
+@app.on_event("startup")
+async def startup():
+    """Compile the agent graphs and create the shared clients before serving requests"""
+    warm_up = await run_in_executor(warm_up_agents)
+    logger.info(f"Warmed up agent graphs: {warm_up['versions']}")
+    
+    checkpoint_store = get_checkpoint_store()
+    if checkpoint_store is not None:
+        pruned = await run_in_executor(checkpoint_store.prune)
+        logger.info(f"Pruned {pruned} expired checkpointed runs")
+    
+    global job_queue
+    job_queue = JobQueue(
+        await run_in_executor(get_job_store),
+        run_job,
+        workers=settings.jobs.workers,
+        lease=settings.jobs.lease,
+        retry_delay=settings.jobs.retry_delay,
+        poll_interval=settings.jobs.poll_interval,
+        # Bad requests fail the same way every time
+        retryable=lambda error: not isinstance(error, HTTPException) or error.status_code >= 500
+    )
+    job_queue.start()
+    logger.info(f"Started {settings.jobs.workers} job workers")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the job workers and release the shared thread pool and LLM connection pools"""
+    if job_queue is not None:
+        await job_queue.stop()
+    shutdown_executor()
+    await llm_registry.aclose()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -49,75 +189,464 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
-@app.post("/query", response_model=AgentResponse)
-async def process_query(request: QueryRequest = Body(...)):
+@app.get("/stats")
+async def stats():
+    """Runtime statistics for shared resources"""
+    from .agents.researcher import web_search_tool
+    
+    llm_cache = get_llm_response_cache()
+    semantic_cache = get_semantic_cache()
+    return {
+        "worker": os.getpid(),
+        "llm_pool": await run_in_executor(llm_registry.stats),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "search": web_search_tool.cache_stats(),
+        "coalescing": coalescer.stats(),
+        "jobs": await run_in_executor(job_queue.stats) if job_queue is not None else None
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Node, LLM, tool, cache and request metrics in the Prometheus text format"""
+    return Response(await run_in_executor(metrics.render), media_type=CONTENT_TYPE)
+
+def get_state_class(agent_type: str) -> Type[AgentState]:
+    """Get the state class of an agent type"""
+    if agent_type == "researcher":
+        from .agents.researcher import ResearcherState
+        return ResearcherState
+    elif agent_type == "executor":
+        from .agents.executor import ExecutorState
+        return ExecutorState
+    else:
+        raise ValueError(f"Unknown agent type: {agent_type}")
+
+def create_initial_state(request: QueryRequest) -> AgentState:
+    """Create the initial agent state for a query"""
+    state = get_state_class(request.agent_type)()
+        
+    # Add user message
+    state.messages.add_user_message(request.query)
+    
+    # Add context if provided
+    if request.context:
+        state.messages.add_system_message(request.context)
+    
+    return state
+
+def start_run(request: QueryRequest, run_id: Optional[str] = None) -> Tuple[AgentState, Optional[CheckpointRun]]:
     """
-    Process a query using the specified agent type
+    Create the state to run an agent with, resuming the request's run if it was checkpointed
+    
+    Args:
+        request: The query
+        run_id: The run id to use if the request has none (e.g. a job's, so its retries resume the run)
+    
+    Returns:
+        A tuple of (the initial or restored state, the run recording checkpoints, if checkpointing is enabled)
+    """
+    checkpoint_store = get_checkpoint_store()
+    if checkpoint_store is None:
+        if request.run_id:
+            raise HTTPException(status_code=400, detail="Runs can't be resumed: checkpointing is disabled")
+        return create_initial_state(request), None
+    
+    run_id = request.run_id or run_id
+    if run_id:
+        run_info = checkpoint_store.get_run(run_id)
+        if run_info is not None:
+            if run_info["agent_type"] != request.agent_type:
+                raise HTTPException(status_code=400, detail=f"Run {run_id} is a {run_info['agent_type']} run")
+            
+            resumed = checkpoint_store.resume_run(run_id, get_state_class(request.agent_type))
+            if resumed is not None:
+                logger.info(f"Resuming run {run_id} after {run_info['completed_nodes']}")
+                run, state = resumed
+                return state, run
+    
+    state = create_initial_state(request)
+    run = checkpoint_store.create_run(run_id or str(uuid.uuid4()), request.agent_type, state)
+    return state, run
+
+async def run_agent_graph(agent_graph: Any,
+                          state: AgentState,
+                          run: Optional[CheckpointRun],
+                          trace: Optional[Trace] = None,
+                          agent_type: str = "graph") -> AgentState:
+    """Run an agent graph from a state, recording checkpoints if the run is checkpointed and spans if it is traced"""
+    with run.bind() if run is not None else nullcontext(), trace.bind() if trace is not None else nullcontext():
+        try:
+            with trace_span(agent_type, "graph"):
+                output = await agent_graph.ainvoke(state.to_channels())
+        except BaseException:
+            if run is not None:
+                await run_in_executor(run.set_status, "failed")
+            raise
+        finally:
+            if trace is not None:
+                store_trace(trace)
+    
+    final_state = state.from_channels(output)
+    if run is not None:
+        await run_in_executor(run.set_status, "completed")
+    return final_state
+
+def create_agent_response(request: QueryRequest,
+                          final_state: AgentState,
+                          run: Optional[CheckpointRun] = None,
+                          trace: Optional[Trace] = None) -> AgentResponse:
+    """Create the API response from an agent's final state"""
+    # Extract result from messages
+    assistant_message = final_state.messages.get_last_message("assistant")
+    result = assistant_message.content if assistant_message else "No response generated."
+    
+    details = {
+        "agent_type": request.agent_type,
+        "run_id": run.run_id if run is not None else None,
+        "node_outputs": {k: v.output for k, v in final_state.node_outputs.items()},
+        "errors": final_state.errors
+    }
+    if trace is not None:
+        details["trace"] = trace.to_dict()
+    
+    return AgentResponse(result=result, details=details)
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format an event for a Server-Sent Events stream"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def get_coalescing_key(request: QueryRequest, trace_requested: bool, stream: bool) -> Optional[Tuple[Any, ...]]:
     """
+    Get the key identical concurrent requests share a run under, or None if the request runs on its own.
+    
+    Only the agent types in `COALESCE_AGENT_TYPES` are coalesced (by default not
+    the executor, whose tasks have side effects). Resumed runs and traced
+    requests always run on their own, and streamed runs are only shared with
+    other streaming requests.
+    """
+    coalesced_types = {agent_type.strip() for agent_type in settings.service.coalesce_agent_types.split(",")}
+    if request.agent_type not in coalesced_types or request.run_id or trace_requested:
+        return None
+    
+    fingerprint = settings_fingerprint(graph_registry.versions().get(request.agent_type))
+    return (request.agent_type, stream, normalize_query(request.query), (request.context or "").strip(), fingerprint)
+
+def trace_requested(http_request: Request) -> bool:
+    """Whether the request asked for a trace (`?trace=true` or an `X-Trace: true` header)"""
+    flag = http_request.query_params.get("trace") or http_request.headers.get("x-trace") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+async def execute_shared_run(shared: SharedRun,
+                             request: QueryRequest,
+                             agent_graph: Any,
+                             state: AgentState,
+                             run: Optional[CheckpointRun],
+                             trace: Optional[Trace],
+                             stream: bool) -> None:
+    """Run the agent for a shared run, publishing its events and outcome to every request attached to it"""
     try:
-        logger.info(f"Processing query with agent type: {request.agent_type}")
-        
-        # Create agent graph
+        with shared.events.bind(stream_tokens=stream):
+            try:
+                shared.events.emit("run_start", {"agent_type": request.agent_type, "run_id": run.run_id if run is not None else None})
+                logger.info("Running agent workflow")
+                final_state = await run_agent_graph(agent_graph, state, run, trace, request.agent_type)
+                
+                response = create_agent_response(request, final_state, run, trace)
+                shared.outcome.set_result(response)
+                shared.events.emit("result", response.dict())
+            except asyncio.CancelledError:
+                shared.outcome.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Error processing query: {str(e)}")
+                shared.outcome.set_exception(e)
+                shared.events.emit("error", {"detail": f"Error processing query: {str(e)}"})
+            finally:
+                shared.events.close()
+    finally:
+        coalescer.finish(shared)
+
+async def join_run(request: QueryRequest,
+                   traced: bool = False,
+                   stream: bool = False,
+                   run_id: Optional[str] = None) -> Tuple[SharedRun, bool]:
+    """
+    Attach the request to an identical run in progress, or start a new run for it
+    
+    Args:
+        request: The query
+        traced: Whether to record a trace of the run
+        stream: Whether the run's LLM output is streamed token by token
+        run_id: The run id to start (or resume) the run under if the request has none
+    
+    Returns:
+        A tuple of (the run, whether this request started it)
+    """
+    shared, leader = coalescer.join(get_coalescing_key(request, traced, stream))
+    if not leader:
+        logger.info(f"Attaching {request.agent_type} query to the identical run in progress")
+        return shared, leader
+    
+    try:
+        # Look up the compiled agent graph
         agent_graph = create_agent(request.agent_type)
         
-        # Initialize state with user message
-        if request.agent_type == "researcher":
-            from agents.researcher import ResearcherState
-            state = ResearcherState()
-        elif request.agent_type == "executor":
-            from agents.executor import ExecutorState
-            state = ExecutorState()
-        else:
-            raise ValueError(f"Unknown agent type: {request.agent_type}")
-            
-        # Add user message
-        state.messages.add_user_message(request.query)
-        
-        # Add context if provided
-        if request.context:
-            state.messages.add_system_message(request.context)
-        
-        # Run the agent
-        logger.info("Running agent workflow")
-        final_state = agent_graph.invoke(state)
-        
-        # Extract result from messages
-        assistant_messages = [msg for msg in final_state.messages.messages if msg.role == "assistant"]
-        result = assistant_messages[-1].content if assistant_messages else "No response generated."
-        
-        # Create response
-        response = AgentResponse(
-            result=result,
-            details={
-                "agent_type": request.agent_type,
-                "node_outputs": {k: v.output for k, v in final_state.node_outputs.items()},
-                "errors": final_state.errors
-            }
-        )
-        
-        return response
+        # Initialize state with user message, or restore the checkpointed run
+        state, run = await run_in_executor(start_run, request, run_id)
     except Exception as e:
+        # Requests that attached in the meantime fail the same way
+        coalescer.finish(shared)
+        shared.fail(e)
+        if isinstance(e, HTTPException):
+            raise
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    trace = Trace(run.run_id if run is not None else str(uuid.uuid4())) if traced else None
+    shared.start(execute_shared_run(shared, request, agent_graph, state, run, trace, stream))
+    return shared, leader
+
+async def run_job(job: Dict[str, Any], report_progress: Callable[[Dict[str, Any]], Awaitable[None]]) -> Dict[str, Any]:
+    """
+    Run a queued job's query, reporting the nodes, topics and tasks it completes as partial results
+    
+    Every attempt runs under the job's run id, so with checkpointing enabled a
+    retry resumes after the nodes the failed attempt completed.
+    """
+    request = QueryRequest(**job["payload"]["request"])
+    shared, leader = await join_run(request, traced=job["payload"].get("trace", False), run_id=job["payload"].get("run_id"))
+    progress = {"completed_nodes": [], "findings": [], "tasks": []}
+    
+    async def follow_progress():
+        async for event, data in shared.events:
+            if event == "node_end":
+                progress["completed_nodes"].append(data["node"])
+            elif event == "topic_finding":
+                progress["findings"].append({"topic": data["topic"], "finding": data["finding"]})
+            elif event == "task_end":
+                progress["tasks"].append(data)
+            else:
+                continue
+            await report_progress(progress)
+    
+    follower = asyncio.create_task(follow_progress())
+    try:
+        response = await shared.wait()
+    finally:
+        follower.cancel()
+    
+    return AgentResponse(result=response.result, details={**response.details, "coalesced": not leader}).dict()
+
+async def submit_job(request: QueryRequest, traced: bool) -> Dict[str, Any]:
+    """
+    Queue a query as a job, refusing it while the queue is full
+    
+    Only the agent types in `JOB_RETRY_AGENT_TYPES` are retried (by default
+    not the executor, whose tasks have side effects).
+    """
+    if request.agent_type not in graph_registry:
+        raise HTTPException(status_code=400, detail=f"Unknown agent type: {request.agent_type}")
+    
+    retried_types = {agent_type.strip() for agent_type in settings.jobs.retry_agent_types.split(",")}
+    max_attempts = settings.jobs.max_attempts if request.agent_type in retried_types else 1
+    payload = {"request": request.dict(), "trace": traced, "run_id": request.run_id or str(uuid.uuid4())}
+    try:
+        return await job_queue.submit(request.agent_type, payload, max_attempts)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)})
+
+def describe_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The public view of a job"""
+    return {
+        "job_id": job["job_id"],
+        "agent_type": job["agent_type"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job["finished_at"]
+    }
+
+@app.post("/query", response_model=AgentResponse)
+async def process_query(http_request: Request, request: QueryRequest = Body(...)):
+    """
+    Process a query using the specified agent type
+    
+    The query runs as a job (see `POST /jobs`) and the response is its
+    result, so it is retried on failure and refused with a 429 while the
+    job queue is full. Identical queries that arrive while one is running
+    share its run and result (see `get_coalescing_key`); their details have
+    `coalesced: true`.
+    
+    With `?trace=true` (or an `X-Trace: true` header) the response details
+    include a timeline of the graph, node, LLM and tool call spans, which is
+    also kept for `GET /traces/{run_id}`.
+    """
+    logger.info(f"Processing query with agent type: {request.agent_type}")
+    job = await submit_job(request, trace_requested(http_request))
+    
+    try:
+        result = await job_queue.wait(job["job_id"])
+    except asyncio.CancelledError:
+        # The client went away
+        asyncio.ensure_future(job_queue.cancel(job["job_id"]))
+        raise
+    except JobError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return AgentResponse(**result)
+
+@app.post("/jobs", status_code=202)
+async def create_job(http_request: Request, request: QueryRequest = Body(...)):
+    """
+    Queue a query and return its job id without waiting for it
+    
+    Poll `GET /jobs/{job_id}` for its status, partial results and result.
+    Responds with a 429 and a Retry-After header while the queue is full.
+    """
+    logger.info(f"Queueing job with agent type: {request.agent_type}")
+    job = await submit_job(request, trace_requested(http_request))
+    return {"job_id": job["job_id"], "status": job["status"], "created_at": job["created_at"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get a job's status (queued, running, succeeded, failed or cancelled),
+    its partial results so far, and its result or error once it has finished
+    
+    Results are kept for `JOB_RESULT_TTL` seconds.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return describe_job(job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job that hasn't finished"""
+    if not await job_queue.cancel(job_id):
+        job = await job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job['status']}")
+    return {"job_id": job_id, "status": "cancelled"}
+
+@app.post("/query/stream")
+async def stream_query(http_request: Request, request: QueryRequest = Body(...)):
+    """
+    Process a query and stream its progress as Server-Sent Events
+    
+    Events: `run_start`, `node_start`/`node_end` for every node,
+    `topic_finding` for each researched topic, `token` for the final summary
+    or report, then `result` (or `error`). Traced requests get the trace in
+    the `result` details. A request identical to one in progress attaches to
+    its stream, starting with the events already sent.
+    """
+    logger.info(f"Streaming query with agent type: {request.agent_type}")
+    shared, _ = await join_run(request, trace_requested(http_request), stream=True)
+    
+    async def event_source():
+        # Stop the run if every client streaming or awaiting it disconnects
+        with shared.attach():
+            async for event, data in shared.events:
+                yield format_sse(event, data)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """
+    Get the status and completed nodes of a checkpointed run
+    """
+    checkpoint_store = get_checkpoint_store()
+    run_info = await run_in_executor(checkpoint_store.get_run, run_id) if checkpoint_store else None
+    if run_info is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return run_info
+
+@app.get("/traces/{run_id}")
+async def get_trace(
+    run_id: str,
+    format: str = Query(default="json", description="Trace format: json (spans) or chrome (Chrome trace-event JSON)")
+):
+    """
+    Get the trace of a recently traced request
+    
+    The chrome format can be loaded in chrome://tracing or Perfetto.
+    """
+    trace = get_stored_trace(run_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Unknown trace: {run_id}")
+    if format == "chrome":
+        return trace.to_chrome_trace()
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unknown trace format: {format}")
+    return trace.to_dict()
+
+@app.get("/agents")
+async def list_agents():
+    """List the registered agent graphs and their versions"""
+    return {"agents": graph_registry.versions()}
+
+@app.post("/agents/{agent_type}/reload")
+async def reload_agent(agent_type: str):
+    """
+    Recompile an agent's graph and swap it in without restarting the server
+    """
+    if agent_type not in graph_registry:
+        raise HTTPException(status_code=404, detail=f"Unknown agent type: {agent_type}")
+    
+    try:
+        version = await run_in_executor(graph_registry.reload, agent_type)
+        return {"agent_type": agent_type, "version": version}
+    except Exception as e:
+        logger.error(f"Error reloading agent: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reloading agent: {str(e)}")
 
 @app.get("/visualize/{agent_type}")
-async def visualize_agent(agent_type: str):
+async def visualize_agent(
+    agent_type: str,
+    request: Request,
+    layout: Optional[str] = Query(default=None, description="Graph layout (dot, neato, fdp, sfdp, twopi, circo)"),
+    highlight: Optional[str] = Query(default=None, description="Comma-separated node names to highlight")
+):
     """
     Visualize an agent's workflow graph
+    
+    Responses carry an ETag; clients polling with If-None-Match get a 304 while
+    the graph is unchanged, without the graph being rendered.
     """
     try:
         agent_graph = create_agent(agent_type)
-        svg = visualize_graph(agent_graph)
+        highlight_nodes = [node.strip() for node in highlight.split(",") if node.strip()] if highlight else None
+        layout = layout or settings.viz.graph_layout
+        
+        etag = f'"{graph_cache_key(agent_graph, layout, highlight_nodes)}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
         
-        return {"svg": svg}
+        svg, _ = await avisualize_graph(agent_graph, layout=layout, highlight_nodes=highlight_nodes)
+        return JSONResponse({"svg": svg}, headers=headers)
     except Exception as e:
         logger.error(f"Error visualizing agent: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error visualizing agent: {str(e)}")
 
 if __name__ == "__main__":
     uvicorn.run(
-        "main:app",
+        "neural_agents.main:app",
         host=settings.service.host,
         port=settings.service.port,
-        reload=settings.service.debug
+        reload=settings.service.debug,
+        # Reloading only works with a single worker
+        workers=1 if settings.service.debug else settings.service.workers
     )
\ No newline at end of file
@@ -1,10 +1,11 @@
 from .base import BaseSchema
-from .message import Message, MessageThread
+from .message import Message, MessageRecord, MessageThread
 from .agent_state import AgentState, NodeOutput
 
 __all__ = [
     "BaseSchema",
     "Message",
+    "MessageRecord",
     "MessageThread",
     "AgentState",
     "NodeOutput"
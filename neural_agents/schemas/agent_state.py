@@ -1,9 +1,11 @@
-from typing import Dict, List, Any, Optional, TypeVar, Generic
+from typing import Dict, List, Any, Optional, TypeVar, Generic, Type, Union, Annotated, Callable, get_origin
 from pydantic import Field
 from datetime import datetime
+from functools import lru_cache
+import operator
 
 from .base import BaseSchema
-from .message import Message, MessageThread
+from .message import Message, MessageRecord, MessageThread
 
 T = TypeVar('T')
 
@@ -14,13 +16,33 @@ class NodeOutput(BaseSchema, Generic[T]):
     status: str = "completed"
     error: Optional[str] = None
 
+def add_messages(thread: MessageThread, messages: Union[MessageThread, List[MessageRecord]]) -> MessageThread:
+    """Reducer appending new messages (records or another thread's messages) to a thread"""
+    records = messages.records if isinstance(messages, MessageThread) else messages
+    for record in records:
+        thread._add(record)
+    return thread
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer merging new keys into a dict, the newer value winning"""
+    return {**left, **right}
+
+def add_unique(left: List[Any], right: List[Any]) -> List[Any]:
+    """Reducer appending the new items that aren't in the list yet"""
+    return left + [item for item in right if item not in left]
+
 class AgentState(BaseSchema):
-    """Base state for agent graphs in LangGraph"""
-    messages: MessageThread = Field(default_factory=MessageThread)
+    """
+    Base state for agent graphs in LangGraph
+    
+    Fields annotated with a reducer (e.g. `Annotated[list, operator.add]`) are
+    merged with the updates nodes return instead of being replaced.
+    """
+    messages: Annotated[MessageThread, add_messages] = Field(default_factory=MessageThread)
     current_node: Optional[str] = None
     next_node: Optional[str] = None
-    node_outputs: Dict[str, NodeOutput] = Field(default_factory=dict)
-    errors: List[Dict[str, Any]] = Field(default_factory=list)
+    node_outputs: Annotated[Dict[str, NodeOutput], merge_dicts] = Field(default_factory=dict)
+    errors: Annotated[List[Dict[str, Any]], operator.add] = Field(default_factory=list)
     
     def add_node_output(self, node_name: str, output: Any, status: str = "completed", error: Optional[str] = None) -> None:
         """Add output from a node"""
@@ -50,6 +72,39 @@ class AgentState(BaseSchema):
         self.next_node = node_name
         self.update_timestamp()
         
+    @classmethod
+    def graph_schema(cls) -> type:
+        """
+        Get the schema to build a StateGraph for this state with.
+        
+        LangGraph creates a channel for each annotation on the schema, using a
+        field's reducer if it has one, and builds the state passed to nodes by
+        calling the schema with the channel values. The returned schema
+        annotates every field of the state (inherited ones included) and builds
+        the state without validation; states are validated when they leave the
+        graph (see `from_channels`).
+        """
+        return _graph_schema(cls)
+    
+    @classmethod
+    def apply_update(cls, values: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge a node's update into channel values the way the graph does, using the fields' reducers"""
+        reducers = _reducers(cls)
+        merged = dict(values)
+        for key, value in update.items():
+            reducer = reducers.get(key)
+            merged[key] = reducer(merged[key], value) if reducer and key in merged else value
+        return merged
+    
+    def to_channels(self) -> Dict[str, Any]:
+        """Get the state as graph input (one value per channel)"""
+        return {name: getattr(self, name) for name in self.model_fields}
+    
+    @classmethod
+    def from_channels(cls, values: Dict[str, Any]) -> "AgentState":
+        """Build and validate a state from graph output"""
+        return cls.parse_obj(values)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert state to dictionary"""
         return {
@@ -58,4 +113,54 @@ class AgentState(BaseSchema):
             "next_node": self.next_node,
             "node_outputs": {k: v.dict() for k, v in self.node_outputs.items()},
             "errors": self.errors
-        } 
\ No newline at end of file
+        }
+
+def node_output_update(node_name: str, output: Any, status: str = "completed", error: Optional[str] = None) -> Dict[str, Any]:
+    """Create the state update recording the output of a node"""
+    node_output = NodeOutput.construct(node_name=node_name, output=output, status=status, error=error)
+    return {"node_outputs": {node_name: node_output}}
+
+def error_update(node_name: str, error_message: str, details: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Create the state update recording an error"""
+    return {"errors": [{
+        "node": node_name,
+        "message": error_message,
+        "timestamp": datetime.now().isoformat(),
+        "details": details or {}
+    }]}
+
+def next_node_update(state: AgentState, node_name: str) -> Dict[str, Any]:
+    """Create the state update setting the next node to execute"""
+    return {"current_node": state.next_node, "next_node": node_name}
+
+@lru_cache(maxsize=None)
+def _reducers(state_class: Type[AgentState]) -> Dict[str, Callable[[Any, Any], Any]]:
+    """Get the reducers declared on a state class's fields"""
+    reducers = {}
+    for name, field in state_class.model_fields.items():
+        reducer = next((metadata for metadata in field.metadata if callable(metadata)), None)
+        if reducer is not None:
+            reducers[name] = reducer
+    return reducers
+
+@lru_cache(maxsize=None)
+def _graph_schema(state_class: Type[AgentState]) -> type:
+    """Build the channel schema of a state class (see `AgentState.graph_schema`)"""
+    reducers = _reducers(state_class)
+    annotations = {}
+    for name, field in state_class.model_fields.items():
+        reducer = reducers.get(name)
+        if reducer is None:
+            annotations[name] = field.annotation
+        else:
+            # Channels create their initial value by calling the concrete type
+            annotations[name] = Annotated[get_origin(field.annotation) or field.annotation, reducer]
+    
+    def __new__(cls, **values: Any) -> AgentState:
+        return state_class.construct(**values)
+    
+    return type(f"{state_class.__name__}Channels", (), {
+        "__annotations__": annotations,
+        "__new__": __new__,
+        "__doc__": f"LangGraph channels of {state_class.__name__}"
+    })
@@ -11,8 +11,9 @@ class BaseSchema(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
     
     def update_timestamp(self):
-        """Update the updated_at timestamp"""
-        self.updated_at = datetime.now()
+        """Update the updated_at timestamp (without re-running assignment validation)"""
+        self.__dict__["updated_at"] = datetime.now()
+        self.__pydantic_fields_set__.add("updated_at")
         
     class Config:
         """Pydantic configuration"""
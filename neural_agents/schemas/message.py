@@ -1,9 +1,13 @@
-from typing import List, Dict, Any, Optional, Literal, Union
-from pydantic import Field, validator
+from typing import List, Dict, Any, Optional, Literal, Tuple, Union
+from pydantic import PrivateAttr, SerializationInfo, model_serializer, validator
 from datetime import datetime
+import copy
+import time
 
 from .base import BaseSchema
 
+VALID_ROLES = ("user", "assistant", "system", "tool", "function")
+
 class Message(BaseSchema):
     """Message model for agent communication"""
     role: Literal["user", "assistant", "system", "tool", "function"]
@@ -20,63 +24,175 @@ class Message(BaseSchema):
             raise ValueError(f"Role must be one of {valid_roles}")
         return role
 
+class MessageRecord:
+    """
+    Compact, unvalidated storage for a message in a thread.
+    
+    The Pydantic `Message` (with its id, timestamps and metadata) is only
+    built when it is first asked for, and then reused.
+    """
+    __slots__ = ("role", "content", "name", "tool_calls", "tool_call_id", "created_at", "_message", "_formatted")
+    
+    def __init__(self,
+                 role: str,
+                 content: str,
+                 name: Optional[str] = None,
+                 tool_calls: Optional[List[Dict[str, Any]]] = None,
+                 tool_call_id: Optional[str] = None,
+                 created_at: Optional[float] = None):
+        if role not in VALID_ROLES:
+            raise ValueError(f"Role must be one of {list(VALID_ROLES)}")
+        self.role = role
+        self.content = content
+        self.name = name
+        self.tool_calls = tool_calls
+        self.tool_call_id = tool_call_id
+        self.created_at = created_at if created_at is not None else time.time()
+        self._message: Optional[Message] = None
+        self._formatted: Optional[Dict[str, Any]] = None
+    
+    @classmethod
+    def from_message(cls, message: Message) -> "MessageRecord":
+        """Store an existing message, keeping the message itself"""
+        record = cls(
+            role=message.role,
+            content=message.content,
+            name=message.name,
+            tool_calls=message.tool_calls,
+            tool_call_id=message.tool_call_id,
+            created_at=message.created_at.timestamp()
+        )
+        record._message = message
+        return record
+    
+    def to_message(self) -> Message:
+        """Get the message as a Pydantic model"""
+        if self._message is None:
+            self._message = Message(
+                role=self.role,
+                content=self.content,
+                name=self.name,
+                tool_calls=self.tool_calls,
+                tool_call_id=self.tool_call_id,
+                created_at=datetime.fromtimestamp(self.created_at)
+            )
+        return self._message
+    
+    def to_formatted(self) -> Dict[str, Any]:
+        """Get the message formatted for LLM input (a copy the caller may modify)"""
+        return _copy_formatted(self._formatted_message())
+    
+    def _formatted_message(self) -> Dict[str, Any]:
+        """The cached formatted message, shared with the thread's cache"""
+        if self._formatted is None:
+            message_dict = {"role": self.role, "content": self.content}
+            
+            if self.name:
+                message_dict["name"] = self.name
+            
+            if self.tool_call_id:
+                message_dict["tool_call_id"] = self.tool_call_id
+            
+            if self.tool_calls:
+                message_dict["tool_calls"] = self.tool_calls
+            
+            self._formatted = message_dict
+        return self._formatted
+
+def _copy_formatted(message_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached formatted message, including its nested tool calls"""
+    message_copy = dict(message_dict)
+    if "tool_calls" in message_copy:
+        message_copy["tool_calls"] = copy.deepcopy(message_copy["tool_calls"])
+    return message_copy
+
 class MessageThread(BaseSchema):
-    """A thread of messages between agents or users and agents"""
-    messages: List[Message] = Field(default_factory=list)
+    """
+    A thread of messages between agents or users and agents
     
-    def add_user_message(self, content: str) -> Message:
-        """Add a user message to the thread"""
-        message = Message(role="user", content=content)
-        self.messages.append(message)
-        self.update_timestamp()
-        return message
+    Messages are stored as compact `MessageRecord`s; Pydantic `Message`
+    objects are only built at API boundaries (`messages`, serialization).
+    The `add_*_message` methods and `get_last_message` return the stored
+    `MessageRecord` rather than a `Message`; call its `to_message()` for the
+    Pydantic model. `messages` is a read-only tuple: add messages with the
+    `add_*_message` methods.
+    """
+    _records: List[MessageRecord] = PrivateAttr(default_factory=list)
+    _formatted: Optional[List[Dict[str, Any]]] = PrivateAttr(default=None)
     
-    def add_assistant_message(self, content: str) -> Message:
-        """Add an assistant message to the thread"""
-        message = Message(role="assistant", content=content)
-        self.messages.append(message)
-        self.update_timestamp()
-        return message
-        
-    def add_system_message(self, content: str) -> Message:
-        """Add a system message to the thread"""
-        message = Message(role="system", content=content)
-        self.messages.append(message)
+    def __init__(self, messages: Optional[List[Union[Message, Dict[str, Any]]]] = None, **data):
+        super().__init__(**data)
+        for message in messages or []:
+            if not isinstance(message, Message):
+                message = Message.parse_obj(message)
+            self._records.append(MessageRecord.from_message(message))
+    
+    @property
+    def records(self) -> List[MessageRecord]:
+        """The thread's messages in their compact form"""
+        return self._records
+    
+    @property
+    def messages(self) -> Tuple[Message, ...]:
+        """The thread's messages as Pydantic models (a snapshot, so it can't be modified)"""
+        return tuple(record.to_message() for record in self._records)
+    
+    @model_serializer(mode="wrap")
+    def serialize_messages(self, handler, info: SerializationInfo) -> Dict[str, Any]:
+        """Include the messages when the thread is serialized"""
+        data = handler(self)
+        data["messages"] = [message.model_dump(mode=info.mode) for message in self.messages]
+        return data
+    
+    def _add(self, record: MessageRecord) -> MessageRecord:
+        """Append a record, extending the cached formatted messages"""
+        self._records.append(record)
+        if self._formatted is not None:
+            self._formatted.append(record._formatted_message())
         self.update_timestamp()
-        return message
+        return record
+    
+    def add_user_message(self, content: str) -> MessageRecord:
+        """Add a user message to the thread, returning its `MessageRecord`"""
+        return self._add(MessageRecord(role="user", content=content))
+    
+    def add_assistant_message(self, content: str) -> MessageRecord:
+        """Add an assistant message to the thread, returning its `MessageRecord`"""
+        return self._add(MessageRecord(role="assistant", content=content))
+    
+    def add_system_message(self, content: str) -> MessageRecord:
+        """Add a system message to the thread, returning its `MessageRecord`"""
+        return self._add(MessageRecord(role="system", content=content))
     
-    def add_tool_message(self, content: str, name: str, tool_call_id: str) -> Message:
-        """Add a tool message to the thread"""
-        message = Message(
-            role="tool", 
-            content=content, 
+    def add_tool_message(self, content: str, name: str, tool_call_id: str) -> MessageRecord:
+        """Add a tool message to the thread, returning its `MessageRecord`"""
+        return self._add(MessageRecord(
+            role="tool",
+            content=content,
             name=name,
             tool_call_id=tool_call_id
-        )
-        self.messages.append(message)
-        self.update_timestamp()
-        return message
+        ))
+    
+    def get_last_message(self, role: str) -> Optional[MessageRecord]:
+        """Get the most recent message with the given role"""
+        for record in reversed(self._records):
+            if record.role == role:
+                return record
+        return None
     
     def get_formatted_messages(self) -> List[Dict[str, Any]]:
-        """Get messages formatted for LLM input"""
-        formatted = []
-        for msg in self.messages:
-            message_dict = {"role": msg.role, "content": msg.content}
-            
-            if msg.name:
-                message_dict["name"] = msg.name
-                
-            if msg.tool_call_id:
-                message_dict["tool_call_id"] = msg.tool_call_id
-                
-            if msg.tool_calls:
-                message_dict["tool_calls"] = msg.tool_calls
-                
-            formatted.append(message_dict)
-            
-        return formatted
+        """
+        Get messages formatted for LLM input.
+        
+        The formatted messages are cached and extended as messages are added;
+        callers get copies, so modifying them doesn't change the thread.
+        """
+        if self._formatted is None:
+            self._formatted = [record._formatted_message() for record in self._records]
+        return [_copy_formatted(message_dict) for message_dict in self._formatted]
     
     def clear(self) -> None:
         """Clear all messages in the thread"""
-        self.messages = []
-        self.update_timestamp()
\ No newline at end of file
+        self._records = []
+        self._formatted = None
+        self.update_timestamp()
@@ -0,0 +1,66 @@
+from langgraph.graph import END, StateGraph
+
+from neural_agents.schemas.agent_state import AgentState, error_update, node_output_update
+from neural_agents.schemas.message import MessageRecord
+
+def test_reducers_merge_updates():
+    state = AgentState()
+    state.messages.add_user_message("Question")
+    values = {**state.to_channels(), **node_output_update("first", 1), **error_update("first", "oops")}
+
+    merged = AgentState.apply_update(values, {
+        "messages": [MessageRecord(role="assistant", content="Answer")],
+        **node_output_update("second", 2),
+        **error_update("second", "again"),
+        "next_node": "third"
+    })
+
+    assert [record.content for record in merged["messages"].records] == ["Question", "Answer"]
+    assert sorted(merged["node_outputs"]) == ["first", "second"]
+    assert [error["node"] for error in merged["errors"]] == ["first", "second"]
+    assert merged["next_node"] == "third"
+
+def test_updates_replace_fields_without_reducer():
+    values = AgentState(current_node="a").to_channels()
+
+    assert AgentState.apply_update(values, {"current_node": "b"})["current_node"] == "b"
+
+def test_apply_update_leaves_values_alone():
+    values = {**AgentState().to_channels(), **error_update("first", "oops")}
+
+    AgentState.apply_update(values, error_update("second", "again"))
+
+    assert len(values["errors"]) == 1
+
+def test_graph_merges_node_deltas():
+    def first(state):
+        assert isinstance(state, AgentState)
+        return {
+            "messages": [MessageRecord(role="assistant", content="first")],
+            **node_output_update("first", "one"),
+            **error_update("first", "oops")
+        }
+
+    def second(state):
+        assert [record.content for record in state.messages.records] == ["Question", "first"]
+        return {
+            "messages": [MessageRecord(role="assistant", content="second")],
+            **node_output_update("second", "two"),
+            "current_node": "second"
+        }
+
+    workflow = StateGraph(AgentState.graph_schema())
+    workflow.add_node("first", first)
+    workflow.add_node("second", second)
+    workflow.set_entry_point("first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+
+    initial = AgentState()
+    initial.messages.add_user_message("Question")
+    state = AgentState.from_channels(workflow.compile().invoke(initial.to_channels()))
+
+    assert [message.content for message in state.messages.messages] == ["Question", "first", "second"]
+    assert {name: output.output for name, output in state.node_outputs.items()} == {"first": "one", "second": "two"}
+    assert [error["node"] for error in state.errors] == ["first"]
+    assert state.current_node == "second"
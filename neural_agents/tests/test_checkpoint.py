@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+
+import pytest
+from langgraph.graph import END, StateGraph
+
+from neural_agents.agents.node import create_node
+from neural_agents.schemas.agent_state import AgentState, error_update, node_output_update
+from neural_agents.schemas.message import MessageRecord
+from neural_agents.utils.checkpoint import PROGRESS, CheckpointStore, deserialize_update, save_checkpoint, serialize_update
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    yield store
+    store.close()
+
+def create_graph(calls, fail):
+    """A two-node graph recording its node runs; `second` raises while `fail` is set"""
+    def first(state):
+        calls.append("first")
+        return {"messages": [MessageRecord(role="assistant", content="first")], **node_output_update("first", 1)}
+
+    def second(state):
+        calls.append("second")
+        if fail:
+            raise RuntimeError("crashed")
+        return {"messages": [MessageRecord(role="assistant", content="second")], **node_output_update("second", 2)}
+
+    async def afirst(state):
+        return first(state)
+
+    async def asecond(state):
+        return second(state)
+
+    workflow = StateGraph(AgentState.graph_schema())
+    workflow.add_node("first", create_node("first", first, afirst))
+    workflow.add_node("second", create_node("second", second, asecond))
+    workflow.set_entry_point("first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+    return workflow.compile()
+
+def create_state():
+    state = AgentState()
+    state.messages.add_user_message("Question")
+    return state
+
+def test_serialization_round_trip():
+    state = create_state()
+    update = {
+        **state.to_channels(),
+        **node_output_update("node", {"nested": [1, 2]}),
+        **error_update("node", "oops")
+    }
+
+    restored = deserialize_update(serialize_update(update))
+
+    assert [record.content for record in restored["messages"].records] == ["Question"]
+    assert restored["node_outputs"]["node"].output == {"nested": [1, 2]}
+    assert restored["errors"] == update["errors"]
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_resumed_run_skips_finished_nodes(store, asynchronous):
+    calls = []
+    state = create_state()
+    run = store.create_run("run-1", "test", state)
+    with run.bind(), pytest.raises(RuntimeError):
+        graph = create_graph(calls, fail=True)
+        if asynchronous:
+            asyncio.run(graph.ainvoke(state.to_channels()))
+        else:
+            graph.invoke(state.to_channels())
+    assert store.get_run("run-1")["completed_nodes"] == ["first"]
+
+    run, state = store.resume_run("run-1", AgentState)
+    assert [record.content for record in state.messages.records] == ["Question", "first"]
+
+    calls.clear()
+    with run.bind():
+        graph = create_graph(calls, fail=False)
+        if asynchronous:
+            output = asyncio.run(graph.ainvoke(state.to_channels()))
+        else:
+            output = graph.invoke(state.to_channels())
+
+    assert calls == ["second"]
+    result = AgentState.from_channels(output)
+    assert [record.content for record in result.messages.records] == ["Question", "first", "second"]
+    assert sorted(result.node_outputs) == ["first", "second"]
+    assert store.get_run("run-1")["completed_nodes"] == ["first", "second"]
+
+def test_progress_checkpoints_are_replayed_without_skipping(store):
+    run = store.create_run("run-1", "test", create_state())
+    with run.bind():
+        save_checkpoint("node", error_update("node", "partial"), kind=PROGRESS)
+
+    run, state = store.resume_run("run-1", AgentState)
+
+    assert [error["message"] for error in state.errors] == ["partial"]
+    assert not run.skip_completed("node")
+
+def test_unknown_run_is_not_resumed(store):
+    assert store.resume_run("missing", AgentState) is None
+    assert store.get_run("missing") is None
+
+def test_prune_deletes_expired_runs(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"), ttl=-1)
+    store.create_run("run-1", "test", create_state())
+
+    assert store.prune() == 1
+    assert store.resume_run("run-1", AgentState) is None
+    store.close()
+
+def test_failed_run_creation_is_rolled_back(store):
+    store._conn.execute("CREATE TRIGGER refuse BEFORE INSERT ON checkpoints BEGIN SELECT RAISE(ABORT, 'refused'); END")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create_run("run-1", "test", create_state())
+
+    assert not store._conn.in_transaction
+    assert store.get_run("run-1") is None
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from neural_agents.utils.coalescing import RequestCoalescer, normalize_query
+
+async def run_shared(coalescer, shared, release, result="answer"):
+    """A stand-in for the agent run: waits for `release`, then publishes its result"""
+    try:
+        shared.events.emit("run_start", {})
+        await release.wait()
+        shared.outcome.set_result(result)
+    except asyncio.CancelledError:
+        shared.outcome.cancel()
+        raise
+    finally:
+        shared.events.close()
+        coalescer.finish(shared)
+
+def test_normalize_query():
+    assert normalize_query("  What is\tLangGraph?\n") == normalize_query("what is langgraph?")
+
+def test_identical_requests_share_a_run():
+    async def main():
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+
+        shared, leader = coalescer.join("key")
+        shared.start(run_shared(coalescer, shared, release))
+        same, same_leader = coalescer.join("key")
+        other, other_leader = coalescer.join("other")
+
+        assert (leader, same_leader, other_leader) == (True, False, True)
+        assert same is shared and other is not shared
+
+        waiters = [asyncio.create_task(shared.wait()) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["answer"] * 3
+        assert coalescer.stats() == {"requests": 3, "coalesced": 1, "in_flight": 1}
+
+        # Finished runs aren't handed out again
+        assert coalescer.join("key")[1]
+
+    asyncio.run(main())
+
+def test_requests_without_key_are_never_shared():
+    async def main():
+        coalescer = RequestCoalescer()
+
+        first, first_leader = coalescer.join(None)
+        second, second_leader = coalescer.join(None)
+
+        assert first_leader and second_leader and first is not second
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+def test_run_continues_while_a_request_is_attached():
+    async def main():
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+        shared, _ = coalescer.join("key")
+        shared.start(run_shared(coalescer, shared, release))
+
+        leaving = asyncio.create_task(shared.wait())
+        staying = asyncio.create_task(shared.wait())
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+
+        assert not shared.task.cancelled()
+        release.set()
+        assert await staying == "answer"
+
+    asyncio.run(main())
+
+def test_run_is_cancelled_when_the_last_request_leaves():
+    async def main():
+        coalescer = RequestCoalescer()
+        shared, _ = coalescer.join("key")
+        shared.start(run_shared(coalescer, shared, asyncio.Event()))
+
+        waiters = [asyncio.create_task(shared.wait()) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert shared.task.cancelled()
+        assert shared.outcome.cancelled()
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+def test_failed_start_fails_attached_requests():
+    async def main():
+        coalescer = RequestCoalescer()
+        shared, _ = coalescer.join("key")
+        attached, _ = coalescer.join("key")
+        waiter = asyncio.create_task(attached.wait())
+        await asyncio.sleep(0)
+
+        coalescer.finish(shared)
+        shared.fail(RuntimeError("no graph"))
+
+        with pytest.raises(RuntimeError, match="no graph"):
+            await waiter
+        assert [event async for event, _ in attached.events] == ["error"]
+
+    asyncio.run(main())
+
+def test_late_subscribers_get_earlier_events():
+    async def main():
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+        shared, _ = coalescer.join("key")
+        shared.start(run_shared(coalescer, shared, release))
+        await asyncio.sleep(0.01)
+
+        release.set()
+        with shared.attach():
+            events = [event async for event, _ in shared.events]
+
+        assert events == ["run_start"]
+
+    asyncio.run(main())
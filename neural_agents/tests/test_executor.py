@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from neural_agents.agents import executor
+from neural_agents.agents.executor import ExecutorState, parse_task_graph
+from neural_agents.config import settings
+
+def create_state(*tasks):
+    state = ExecutorState()
+    for description, depends_on in tasks:
+        state.add_task(description, depends_on=depends_on)
+    return state
+
+def statuses(update):
+    return [task["status"] for task in update["tasks"]]
+
+@pytest.fixture
+def run_task(monkeypatch):
+    """Replace the LLM call of each task: tasks named "fail ..." raise, others return their description"""
+    calls = []
+
+    def run(task, dependency_results):
+        calls.append((task["description"], [result for _, result in dependency_results]))
+        if task["description"].startswith("fail"):
+            raise RuntimeError("boom")
+        return task["description"]
+
+    async def arun(task, dependency_results):
+        return run(task, dependency_results)
+
+    monkeypatch.setattr(executor, "run_task", run)
+    monkeypatch.setattr(executor, "arun_task", arun)
+    return calls
+
+def test_parse_task_graph_keeps_only_earlier_dependencies():
+    content = "1. Read the file\n2. Summarize it (depends on: 1)\n3. Write the summary (depends on: 2, 4)\n4. Notify"
+
+    assert parse_task_graph(content) == [
+        ("Read the file", []),
+        ("Summarize it", [0]),
+        ("Write the summary", [1]),
+        ("Notify", []),
+    ]
+
+def test_dependents_of_failed_tasks_are_skipped():
+    state = create_state(("a", []), ("b", [0]), ("c", [1]), ("d", []))
+
+    for task in state.get_ready_tasks():
+        state.start_task(task)
+    state.finish_task(state.tasks[0], error="boom")
+    state.finish_task(state.tasks[3], result="done")
+
+    assert state.get_ready_tasks() == []
+    assert state.get_ready_tasks() == []
+    assert [task["status"] for task in state.tasks] == ["failed", "skipped", "skipped", "completed"]
+    assert not state.has_pending_tasks()
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_executes_tasks_in_dependency_order(run_task, asynchronous):
+    state = create_state(("a", []), ("b", [0]), ("fail c", [0]), ("d", [1, 2]), ("e", []))
+
+    if asynchronous:
+        update = asyncio.run(executor.aexecute_tasks(state))
+    else:
+        update = executor.execute_tasks(state)
+
+    assert statuses(update) == ["completed", "completed", "failed", "skipped", "completed"]
+    assert sorted(task["description"] for task in update["completed_tasks"]) == ["a", "b", "e"]
+    assert ("b", ["a"]) in run_task
+    assert [error["details"]["task"] for error in update["errors"]] == ["fail c"]
+    # The graph's own state is left as it was
+    assert [task["status"] for task in state.tasks] == ["pending"] * 5
+
+def test_concurrency_is_limited(monkeypatch):
+    monkeypatch.setattr(settings.agent, "max_concurrency", 2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run(task, dependency_results):
+        with lock:
+            running.append(task)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(task)
+
+    monkeypatch.setattr(executor, "run_task", run)
+
+    update = executor.execute_tasks(create_state(*[(str(i), []) for i in range(6)]))
+
+    assert statuses(update) == ["completed"] * 6
+    assert max(peak) == 2
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_zero_concurrency_runs_one_task_at_a_time(run_task, monkeypatch, asynchronous):
+    monkeypatch.setattr(settings.agent, "max_concurrency", 0)
+    state = create_state(("a", []), ("b", []))
+
+    if asynchronous:
+        update = asyncio.run(executor.aexecute_tasks(state))
+    else:
+        update = executor.execute_tasks(state)
+
+    assert statuses(update) == ["completed", "completed"]
+
+def test_resumed_run_skips_finished_tasks(run_task):
+    state = create_state(("a", []), ("b", [0]))
+    state.tasks[0].update(status="completed", result="a", started_at=0, finished_at=0, duration=0)
+    state.tasks[1].update(status="running", started_at=0)
+
+    update = executor.execute_tasks(state)
+
+    assert statuses(update) == ["completed", "completed"]
+    assert run_task == [("b", ["a"])]
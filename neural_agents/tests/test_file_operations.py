@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from neural_agents.tools.file_operations import FileReadTool
+
+@pytest.fixture
+def read():
+    tool = FileReadTool()
+    return lambda **kwargs: tool._run(**kwargs)
+
+def test_reads_line_ranges(read, tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nb\nc\n")
+
+    assert read(file_path=str(path), start_line=1, num_lines=1) == "b\n"
+    assert read(file_path=str(path), tail=2) == "b\nc\n"
+    assert read(file_path=str(path), byte_offset=4) == "c\n"
+    assert read(file_path=str(path), start_line=3).startswith("Error: Start line 3 is out of range")
+
+def test_reads_empty_file(read, tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+
+    assert read(file_path=str(path)) == "Error: Start line 0 is out of range (file has 0 lines)"
+    assert read(file_path=str(path), tail=3) == ""
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="No procfs")
+def test_reads_files_reporting_no_size(read):
+    assert os.stat("/proc/self/status").st_size == 0
+
+    assert read(file_path="/proc/self/status", num_lines=1).startswith("Name:")
+    assert read(file_path="/proc/self/status", tail=1).endswith("\n")
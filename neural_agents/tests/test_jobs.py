@@ -0,0 +1,195 @@
+import asyncio
+import time
+
+import pytest
+
+from neural_agents.tools.base import ToolOutput
+from neural_agents.utils.jobs import (
+    CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobError, JobQueue, JobStore, QueueFullError
+)
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    yield store
+    store.close()
+
+def test_claims_oldest_job_with_a_lease(store):
+    first = store.submit("researcher", {"query": "first"})
+    store.submit("researcher", {"query": "second"})
+
+    job = store.claim(lease=60)
+
+    assert job["job_id"] == first["job_id"]
+    assert (job["status"], job["attempts"]) == (RUNNING, 1)
+    assert job["available_at"] >= time.time() + 59
+    assert store.claim(lease=60)["payload"] == {"query": "second"}
+    assert store.claim(lease=60) is None
+
+def test_expired_lease_is_claimed_again(store):
+    job = store.submit("researcher", {}, max_attempts=2)
+    store.claim(lease=0)
+
+    reclaimed = store.claim(lease=60)
+
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["attempts"] == 2
+
+def test_expired_lease_on_last_attempt_fails_the_job(store):
+    job = store.submit("researcher", {}, max_attempts=1)
+    store.claim(lease=0)
+
+    assert store.claim(lease=60) is None
+    failed = store.get(job["job_id"])
+    assert failed["status"] == FAILED
+    assert failed["error"]["detail"] == "Job's worker stopped responding"
+
+def test_renewed_lease_is_not_claimed(store):
+    job = store.submit("researcher", {}, max_attempts=2)
+    store.claim(lease=0)
+
+    store.renew(job["job_id"], lease=60, progress={"completed_nodes": ["first"]})
+
+    assert store.claim(lease=60) is None
+    assert store.get(job["job_id"])["progress"] == {"completed_nodes": ["first"]}
+
+def test_failed_attempt_waits_for_retry_time(store):
+    job = store.submit("researcher", {}, max_attempts=3)
+    store.claim(lease=60)
+
+    store.fail(job["job_id"], {"status_code": 500, "detail": "boom"}, retry_at=time.time() + 60)
+
+    retried = store.get(job["job_id"])
+    assert (retried["status"], retried["error"]["detail"]) == (QUEUED, "boom")
+    assert store.claim(lease=60) is None
+
+def test_failed_attempt_is_retried(store):
+    job = store.submit("researcher", {}, max_attempts=3)
+    store.claim(lease=60)
+
+    store.fail(job["job_id"], {"status_code": 500, "detail": "boom"}, retry_at=time.time())
+
+    assert store.claim(lease=60)["attempts"] == 2
+
+def test_job_cancelled_while_running_is_not_retried(store):
+    job = store.submit("researcher", {}, max_attempts=3)
+    store.claim(lease=60)
+
+    assert store.cancel(job["job_id"])
+    store.fail(job["job_id"], {"status_code": 500, "detail": "boom"}, retry_at=time.time())
+
+    assert store.claim(lease=60) is None
+    assert store.get(job["job_id"])["status"] == CANCELLED
+
+def test_job_cancelled_while_running_keeps_its_status(store):
+    job = store.submit("researcher", {})
+    store.claim(lease=60)
+
+    store.cancel(job["job_id"])
+    store.complete(job["job_id"], {"result": "late"})
+
+    assert store.get(job["job_id"])["status"] == CANCELLED
+    assert not store.cancel(job["job_id"])
+
+def test_released_job_keeps_its_attempts(store):
+    job = store.submit("researcher", {})
+    store.claim(lease=60)
+
+    store.release(job["job_id"])
+
+    assert store.claim(lease=60)["attempts"] == 1
+
+def test_full_queue_refuses_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"), max_queued=1)
+    store.submit("researcher", {})
+
+    with pytest.raises(QueueFullError):
+        store.submit("researcher", {})
+    store.close()
+
+def test_queue_retries_failed_jobs(store):
+    attempts = []
+
+    async def runner(job, report_progress):
+        attempts.append(job["attempts"])
+        await report_progress({"attempt": job["attempts"]})
+        if job["attempts"] == 1:
+            raise RuntimeError("flaky")
+        return {"result": "done"}
+
+    async def main():
+        queue = JobQueue(store, runner, workers=1, retry_delay=0.01, poll_interval=0.01)
+        queue.start()
+        try:
+            job = await queue.submit("researcher", {}, max_attempts=2)
+            return await asyncio.wait_for(queue.wait(job["job_id"]), 5), job["job_id"]
+        finally:
+            await queue.stop()
+
+    result, job_id = asyncio.run(main())
+
+    assert result == {"result": "done"}
+    assert attempts == [1, 2]
+    assert store.get(job_id)["progress"] == {"attempt": 2}
+
+def test_queue_gives_up_after_max_attempts(store):
+    async def runner(job, report_progress):
+        raise RuntimeError("broken")
+
+    async def main():
+        queue = JobQueue(store, runner, workers=1, retry_delay=0.01, poll_interval=0.01)
+        queue.start()
+        try:
+            job = await queue.submit("researcher", {}, max_attempts=1)
+            with pytest.raises(JobError) as error:
+                await asyncio.wait_for(queue.wait(job["job_id"]), 5)
+            return error.value
+        finally:
+            await queue.stop()
+
+    error = asyncio.run(main())
+
+    assert error.job["status"] == FAILED
+    assert error.detail == "Error processing query: broken"
+
+def test_cancelling_a_running_job_stops_it(store):
+    started = []
+
+    async def runner(job, report_progress):
+        started.append(job["job_id"])
+        await asyncio.sleep(60)
+
+    async def main():
+        queue = JobQueue(store, runner, workers=1, retry_delay=0.01, poll_interval=0.01)
+        queue.start()
+        try:
+            job = await queue.submit("researcher", {}, max_attempts=3)
+            while not started:
+                await asyncio.sleep(0.01)
+
+            assert await queue.cancel(job["job_id"])
+            with pytest.raises(JobError):
+                await asyncio.wait_for(queue.wait(job["job_id"]), 5)
+            await asyncio.sleep(0.05)
+            return job["job_id"]
+        finally:
+            await queue.stop()
+
+    job_id = asyncio.run(main())
+
+    assert started == [job_id]
+    assert store.get(job_id)["status"] == CANCELLED
+    assert store.counts()[SUCCEEDED] == 0
+
+def test_results_keep_tool_outputs_structured(store):
+    job = store.submit("executor", {})
+    store.claim(lease=60)
+    output = ToolOutput(result="contents", metadata={"lines": 2})
+
+    store.renew(job["job_id"], lease=60, progress={"node_outputs": {"read": output}})
+    store.complete(job["job_id"], {"node_outputs": {"read": output}})
+
+    finished = store.get(job["job_id"])
+    expected = {"node_outputs": {"read": {"result": "contents", "error": None, "metadata": {"lines": 2}}}}
+    assert finished["progress"] == expected
+    assert finished["result"] == expected
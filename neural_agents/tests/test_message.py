@@ -0,0 +1,58 @@
+import pytest
+
+from neural_agents.schemas.message import Message, MessageRecord, MessageThread
+
+def test_formatted_messages_are_copies():
+    thread = MessageThread()
+    thread.add_user_message("Question")
+    thread.add_tool_message("Result", name="search", tool_call_id="call-1")
+
+    formatted = thread.get_formatted_messages()
+    formatted[0]["content"] = "Changed"
+    formatted[1]["name"] = "other"
+    formatted.append({"role": "user", "content": "Extra"})
+
+    assert thread.get_formatted_messages() == [
+        {"role": "user", "content": "Question"},
+        {"role": "tool", "content": "Result", "name": "search", "tool_call_id": "call-1"},
+    ]
+
+def test_formatted_tool_calls_are_copied():
+    tool_calls = [{"id": "call-1", "function": {"name": "search", "arguments": "{}"}}]
+    thread = MessageThread(messages=[Message(role="assistant", content="", tool_calls=tool_calls)])
+
+    thread.get_formatted_messages()[0]["tool_calls"][0]["function"]["arguments"] = "changed"
+    thread.records[0].to_formatted()["tool_calls"].clear()
+
+    assert thread.get_formatted_messages()[0]["tool_calls"] == tool_calls
+
+def test_formatted_messages_follow_added_messages():
+    thread = MessageThread()
+    thread.add_user_message("First")
+    thread.get_formatted_messages()
+
+    thread.add_assistant_message("Second")
+
+    assert [message["content"] for message in thread.get_formatted_messages()] == ["First", "Second"]
+
+def test_added_message_is_a_record():
+    thread = MessageThread()
+
+    record = thread.add_system_message("Be brief")
+
+    assert isinstance(record, MessageRecord)
+    message = record.to_message()
+    assert isinstance(message, Message)
+    assert (message.role, message.content) == ("system", "Be brief")
+    assert thread.messages == (message,)
+
+def test_messages_are_read_only():
+    thread = MessageThread()
+    thread.add_user_message("Question")
+
+    with pytest.raises(AttributeError):
+        thread.messages.append(Message(role="user", content="Lost"))
+    with pytest.raises(TypeError):
+        thread.messages[-1] = Message(role="user", content="Lost")
+
+    assert [message.content for message in thread.messages] == ["Question"]
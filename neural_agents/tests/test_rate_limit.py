@@ -0,0 +1,137 @@
+import email.utils
+import json
+import time
+
+import httpx
+import pytest
+
+from neural_agents.agents.llm_registry import LLMTransport
+from neural_agents.config import settings
+from neural_agents.utils.rate_limit import (
+    AIMDLimit, LLMRateLimiter, ModelLimiter, TokenBucket, describe_request, parse_rate_limits, parse_retry_after
+)
+from neural_agents.utils.shared_state import ConcurrencyLimiter
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings.llm, "max_retries", 3)
+    monkeypatch.setattr(settings.llm, "retry_base_delay", 0.01)
+    monkeypatch.setattr(settings.llm, "retry_max_delay", 1.0)
+
+def test_token_bucket_allows_bursts_then_spaces_requests():
+    bucket = TokenBucket("test", rate=10, capacity=2)
+
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    # Overdrawn: the third token is refilled in 0.1s, the fourth in 0.2s
+    assert bucket.reserve(1) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(1) == pytest.approx(0.2, abs=0.01)
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket("test", rate=1000, capacity=5)
+    bucket.reserve(5)
+
+    time.sleep(0.05)
+
+    assert bucket.reserve(5) == 0
+    assert bucket.reserve(1) > 0
+
+def test_aimd_increases_additively_and_halves_once_per_interval():
+    limiter = ConcurrencyLimiter("test", 8)
+    limit = AIMDLimit("test", limiter, minimum=1, maximum=8)
+
+    limit.on_throttle()
+    limit.on_throttle()
+    assert limiter.limit == 4
+
+    # Roughly one more slot per `value` successes
+    for _ in range(5):
+        limit.on_success()
+    assert limiter.limit == 5
+
+    limit._last_decrease = 0.0
+    limit.on_throttle()
+    assert limiter.limit == 2
+
+    for _ in range(100):
+        limit.on_success()
+    assert limiter.limit == 8
+
+def test_aimd_stays_above_minimum():
+    limiter = ConcurrencyLimiter("test", 2)
+    limit = AIMDLimit("test", limiter, minimum=1, maximum=2)
+
+    for _ in range(3):
+        limit._last_decrease = 0.0
+        limit.on_throttle()
+
+    assert limiter.limit == 1
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, None),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "1.5"}, 1.5),
+    ({"retry-after": "-1"}, 0.0),
+    ({"retry-after-ms": "250", "retry-after": "3"}, 0.25),
+    ({"retry-after-ms": "soon", "retry-after": "3"}, 3.0),
+    ({"retry-after": "whenever"}, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(headers) == expected
+
+def test_parse_retry_after_http_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+
+    assert parse_retry_after({"retry-after": date}) == pytest.approx(30, abs=1.5)
+
+def test_throttled_response_pauses_the_model():
+    limiter = ModelLimiter("gpt", max_concurrency=4)
+
+    delay = limiter.on_response(429, {"retry-after": "0.5"}, attempt=0)
+
+    assert 0.5 <= delay <= 0.51
+    assert limiter.reserve(1) == pytest.approx(0.5, abs=0.05)
+    assert limiter.slots.limit == 2
+    assert (limiter.throttled, limiter.retries) == (1, 1)
+
+def test_retries_stop_after_max_retries_or_long_retry_after():
+    limiter = ModelLimiter("gpt")
+
+    assert limiter.on_response(500, {}, attempt=2) is not None
+    assert limiter.on_response(500, {}, attempt=3) is None
+    assert limiter.on_response(429, {"retry-after": "120"}, attempt=0) is None
+    assert limiter.on_response(400, {}, attempt=0) is None
+    assert limiter.on_error(httpx.ConnectError("refused"), attempt=0) is not None
+
+def test_parse_rate_limits_and_per_model_limits():
+    limits = parse_rate_limits("gpt-4=500:30000, gpt-3.5-turbo=3500:0,")
+    rate_limiter = LLMRateLimiter(limits, requests_per_minute=60)
+
+    assert limits == {"gpt-4": (500, 30000), "gpt-3.5-turbo": (3500, 0)}
+    assert rate_limiter.for_model("gpt-4").stats()["tokens_per_minute"] == 30000
+    assert rate_limiter.for_model("gpt-3.5-turbo").tokens is None
+    assert rate_limiter.for_model("other").stats()["requests_per_minute"] == 60
+    assert rate_limiter.for_model("gpt-4") is rate_limiter.for_model("gpt-4")
+
+def test_describe_request():
+    body = json.dumps({"model": "gpt-4", "messages": [{"role": "user", "content": "Hello there"}], "max_tokens": 100})
+
+    assert describe_request(body.encode()) == ("gpt-4", 102)
+    assert describe_request(b"not json") == ("unknown", 0)
+
+def test_transport_retries_throttled_requests():
+    statuses = [429, 503, 200]
+
+    def handler(request):
+        # A streamed body, so the slot is held until the client closes the response
+        return httpx.Response(statuses.pop(0), headers={"retry-after-ms": "10"}, stream=httpx.ByteStream(b"{}"))
+
+    transport = LLMTransport(httpx.MockTransport(handler), LLMRateLimiter(max_concurrency=4))
+    with httpx.Client(transport=transport) as client:
+        response = client.post("https://llm.test/v1/chat/completions", json={"model": "gpt", "messages": []})
+
+    assert response.status_code == 200
+    assert statuses == []
+    model_limiter = transport._rate_limiter.for_model("gpt")
+    assert (model_limiter.throttled, model_limiter.retries) == (2, 2)
+    assert model_limiter.slots.stats()["in_use"] == 0
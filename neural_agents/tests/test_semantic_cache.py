@@ -0,0 +1,101 @@
+import pytest
+
+from neural_agents.config import settings
+from neural_agents.utils.semantic_cache import HashingEmbedder, SemanticCache
+
+# Rephrasings of the same topic: word order, inflection, spelling, possessives and function words differ
+SAME_TOPIC = [
+    ("Recent advances in LLMs", "recent advancements in LLMs"),
+    ("Recent advances in LLMs", "Latest LLM advancements"),
+    ("Advances in LLMs", "LLM advances"),
+    ("History of Python", "Python's history"),
+    ("Benefits of large language models", "large language model benefits"),
+    ("How transformers work", "How do transformers work?"),
+    ("Transformer optimization techniques", "Transformer optimisation techniques"),
+    ("Quantum computing applications", "Applications of quantum computers"),
+    ("Retrieval augmented generation", "Retrieval-augmented generation systems"),
+]
+
+# Topics that share most of their words but are about something else
+DIFFERENT_TOPICS = [
+    ("Risks of LLMs", "Benefits of LLMs"),
+    ("Risks of large language models", "Benefits of large language models"),
+    ("History of Python", "History of Java"),
+    ("GPT-4 costs", "GPT-3 costs"),
+    ("LLMs", "LLM safety"),
+]
+
+# Similar enough to pass the threshold, but about another product or version
+DIFFERENT_ENTITIES = [
+    ("Deploying machine learning models on AWS", "Deploying machine learning models on GCP"),
+    ("Python 3.12 performance improvements", "Python 3.11 performance improvements"),
+    ("GPT-4 costs", "GPT-3 costs"),
+]
+
+@pytest.fixture
+def cache():
+    return SemanticCache(threshold=settings.cache.semantic_cache_threshold, max_entries=16, ttl=60)
+
+@pytest.mark.parametrize("stored, query", SAME_TOPIC)
+def test_rephrased_topic_matches(cache, stored, query):
+    cache.add(stored, "finding")
+
+    match = cache.lookup(query)
+
+    assert match is not None
+    assert match[:2] == (stored, "finding")
+
+@pytest.mark.parametrize("stored, query", DIFFERENT_TOPICS)
+def test_different_topic_misses(cache, stored, query):
+    cache.add(stored, "finding")
+
+    assert cache.lookup(query) is None
+    assert cache.lookup(stored) is not None
+
+@pytest.mark.parametrize("stored, query", DIFFERENT_ENTITIES)
+def test_different_entity_misses(cache, stored, query):
+    embedder = HashingEmbedder()
+    cache.add(stored, "finding")
+
+    assert float(embedder.embed(stored) @ embedder.embed(query)) >= cache.threshold
+    assert cache.lookup(query) is None
+
+def test_lookup_picks_the_matching_topic_among_similar_ones(cache):
+    cache.add("Risks of LLMs", "risks")
+    cache.add("Benefits of LLMs", "benefits")
+
+    assert cache.lookup("LLM benefits")[1] == "benefits"
+    assert cache.lookup("LLM risks")[1] == "risks"
+
+def test_namespaces_are_separate(cache):
+    cache.add("History of Python", "finding", namespace="gpt-4")
+
+    assert cache.lookup("History of Python", namespace="gpt-3.5-turbo") is None
+    assert cache.lookup("History of Python", namespace="gpt-4") is not None
+
+def test_expired_entries_miss():
+    cache = SemanticCache(threshold=0.85, max_entries=4, ttl=-1)
+    cache.add("History of Python", "finding")
+
+    assert cache.lookup("History of Python") is None
+
+def test_oldest_entry_is_replaced_when_full():
+    cache = SemanticCache(threshold=0.85, max_entries=2, ttl=60)
+    for topic in ("History of Python", "History of Java", "History of Rust"):
+        cache.add(topic, topic)
+
+    assert cache.lookup("History of Python") is None
+    assert cache.lookup("History of Rust")[1] == "History of Rust"
+    assert cache.stats()["entries"] == 2
+
+def test_content_words_ignore_inflection_and_function_words():
+    embedder = HashingEmbedder()
+
+    assert embedder.content_words("The advances of LLMs") == embedder.content_words("LLM advance")
+
+def test_entities_are_names_and_numbers():
+    embedder = HashingEmbedder()
+
+    assert embedder.entities("History of Python") == {"python"}
+    assert embedder.entities("Python's history in 2024") == {"2024"}
+    assert embedder.entities("LLMs on AWS") == {"llm", "aws"}
@@ -0,0 +1,89 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from neural_agents.config import settings
+from neural_agents.tools.base import BaseTool, ToolInput
+
+class SleepInput(ToolInput):
+    seconds: float
+
+class SleepTool(BaseTool):
+    name = "sleep"
+    description = "Sleep for a while"
+    input_schema = SleepInput
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.finished = threading.Event()
+
+    def _run(self, seconds: float) -> float:
+        time.sleep(seconds)
+        self.finished.set()
+        return seconds
+
+def test_schema_is_built_once():
+    tool = SleepTool()
+
+    assert tool.get_schema() is tool.get_schema()
+    assert tool.get_schema()["parameters"] is SleepTool().get_schema()["parameters"]
+    assert "seconds" in tool.get_schema()["parameters"]["properties"]
+
+def test_sync_run_times_out():
+    tool = SleepTool(timeout=0.05)
+
+    start = time.perf_counter()
+    output = tool.run(seconds=1)
+
+    assert output.error == "Tool sleep timed out after 0.05 seconds"
+    assert time.perf_counter() - start < 0.5
+
+def test_sync_run_without_timeout_returns_result():
+    assert SleepTool(timeout=0).run(seconds=0).result == 0
+
+def test_default_timeout_runs_sync_calls_in_the_callers_thread(monkeypatch):
+    monkeypatch.setattr(settings.tool, "tool_timeout", 0.05)
+    tool = SleepTool()
+    threads = []
+    monkeypatch.setattr(tool, "_run", lambda seconds: threads.append(threading.current_thread()))
+
+    tool.run(seconds=0)
+
+    assert tool.timeout == 0.05
+    assert threads == [threading.current_thread()]
+
+def test_older_timeout_errors_are_reported_as_timeouts(monkeypatch):
+    tool = SleepTool(timeout=1)
+
+    def timed_out(inputs):
+        raise concurrent.futures.TimeoutError()
+
+    monkeypatch.setattr(tool, "_call", timed_out)
+
+    assert tool.run(seconds=0).error == "Tool sleep timed out after 1 seconds"
+
+def test_sync_timeout_keeps_slot_until_thread_finishes():
+    tool = SleepTool(timeout=0.05, max_concurrency=1)
+
+    assert tool.run(seconds=0.3).error is not None
+
+    assert not tool._semaphore.acquire(blocking=False)
+    assert tool.finished.wait(1)
+    time.sleep(0.01)
+    assert tool._semaphore.acquire(blocking=False)
+
+def test_async_timeout_keeps_slot_until_thread_finishes():
+    async def main():
+        tool = SleepTool(timeout=0.05, max_concurrency=1)
+
+        assert (await tool.arun(seconds=0.3)).error is not None
+        assert tool._alimit().locked()
+
+        # The next call waits for the abandoned one instead of overlapping it
+        start = time.perf_counter()
+        assert (await tool.arun(seconds=0)).result == 0
+        assert tool.finished.is_set()
+        assert time.perf_counter() - start > 0.1
+
+    asyncio.run(main())
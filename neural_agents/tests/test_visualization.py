@@ -0,0 +1,80 @@
+import shutil
+from typing import TypedDict
+
+import pytest
+from fastapi.testclient import TestClient
+from langgraph.graph import END, StateGraph
+
+from neural_agents.agents.agent_factory import create_agent
+from neural_agents.main import app
+from neural_agents.utils import visualization
+from neural_agents.utils.visualization import _graph_structure, graph_cache_key
+
+class State(TypedDict):
+    count: int
+
+def build_graph() -> StateGraph:
+    workflow = StateGraph(State)
+    workflow.add_node("plan", lambda state: {})
+    workflow.add_node("act", lambda state: {})
+    workflow.set_entry_point("plan")
+    workflow.add_conditional_edges("plan", lambda state: "act", {"act": "act", "done": END})
+    workflow.add_edge("act", END)
+    return workflow
+
+def test_structure_of_built_and_compiled_graph_match():
+    workflow = build_graph()
+
+    built = _graph_structure(workflow)
+    compiled = _graph_structure(workflow.compile())
+
+    assert sorted(built[0]) == sorted(compiled[0]) == sorted(["__start__", "plan", "act", END])
+    assert built[1] == compiled[1] == [("__start__", "plan"), ("act", END)]
+    assert built[2] == compiled[2] == [("plan", "act", "act"), ("plan", "done", END)]
+
+@pytest.mark.parametrize("agent_type", ["researcher", "executor"])
+def test_structure_of_agent_graphs(agent_type):
+    nodes, edges, _ = _graph_structure(create_agent(agent_type))
+
+    assert "__start__" in nodes and END in nodes
+    assert len(edges) == len(nodes) - 1
+
+def test_cache_key_changes_with_highlights():
+    graph = build_graph().compile()
+
+    assert graph_cache_key(graph, "dot") == graph_cache_key(build_graph().compile(), "dot")
+    assert graph_cache_key(graph, "dot") != graph_cache_key(graph, "dot", ["act"])
+
+def test_non_graph_agents_are_rejected():
+    with pytest.raises(TypeError):
+        _graph_structure(object())
+
+@pytest.mark.skipif(shutil.which("dot") is None, reason="Graphviz is not installed")
+def test_visualize_endpoint_revalidates_with_etag():
+    client = TestClient(app)
+
+    response = client.get("/visualize/researcher")
+    assert response.status_code == 200
+    assert "<svg" in response.json()["svg"]
+
+    etag = response.headers["ETag"]
+    assert client.get("/visualize/researcher", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/visualize/researcher?highlight=research").headers["ETag"] != etag
+
+def test_not_modified_graph_is_not_rendered(monkeypatch):
+    renders = []
+
+    def render(graph, layout, highlight_nodes=None):
+        renders.append(layout)
+        return "<svg/>"
+
+    monkeypatch.setattr(visualization, "_render_svg", render)
+    client = TestClient(app)
+
+    etag = client.get("/visualize/executor?layout=neato").headers["ETag"]
+    visualization._svg_cache.clear()
+    response = client.get("/visualize/executor?layout=neato", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert renders == ["neato"]
@@ -1,7 +1,30 @@
-from typing import Dict, Any, Optional, Type, List, Union, Callable
+from typing import Dict, Any, Optional, Type, List, Union, Callable, Iterator, Literal
 from pydantic import BaseModel, Field, validator
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache
+import asyncio
+import concurrent.futures
+import contextvars
 import inspect
+import threading
+import time
+import weakref
+
+from ..config import settings
+from ..utils.concurrency import get_process_executor, run_in_executor, run_in_process
+from ..utils.metrics import tool_calls, tool_duration
+from ..utils.tracing import annotate_span, trace_span
+
+# How a tool's work is executed:
+# - "io": blocking I/O, run in the shared thread pool when called asynchronously
+# - "cpu": CPU-bound, run in the shared process pool (the tool must be picklable)
+# - "async": the tool implements a native, non-blocking `_arun`
+ExecutionMode = Literal["io", "cpu", "async"]
+
+# What a timed out call raises (only the builtin TimeoutError from Python 3.11 on)
+_TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError, concurrent.futures.TimeoutError)
 
 class ToolInput(BaseModel):
     """Base model for tool inputs"""
@@ -14,58 +37,238 @@ class ToolOutput(BaseModel):
     error: Optional[str] = None
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
+@lru_cache(maxsize=None)
+def _parameters_schema(input_schema: Type[ToolInput]) -> Dict[str, Any]:
+    """Build the JSON schema of a tool's inputs (once per input schema)"""
+    return input_schema.schema()
+
 class BaseTool(ABC):
     """Base class for all tools"""
     name: str
     description: str
     input_schema: Type[ToolInput]
-    
-    def __init__(self, name: Optional[str] = None, description: Optional[str] = None):
+    execution_mode: ExecutionMode = "io"
+
+    # Per-tool limits; None uses the config defaults and 0 disables the limit
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+
+    _schema: Optional[Dict[str, Any]] = None
+    _sync_timeout: bool = False
+    _semaphore: Optional[threading.BoundedSemaphore] = None
+    _async_semaphores: Optional[weakref.WeakKeyDictionary] = None
+
+    def __init_subclass__(cls, **kwargs):
+        """Check the tool's declaration once, when the class is defined"""
+        super().__init_subclass__(**kwargs)
+
+        input_schema = cls.__dict__.get("input_schema")
+        if input_schema is not None and not (inspect.isclass(input_schema) and issubclass(input_schema, ToolInput)):
+            raise TypeError(f"{cls.__name__}.input_schema must be a ToolInput subclass")
+
+        if cls.execution_mode not in ("io", "cpu", "async"):
+            raise ValueError(f"Unknown execution mode for {cls.__name__}: {cls.execution_mode}")
+
+        if cls.execution_mode == "async" and cls._arun is BaseTool._arun:
+            raise TypeError(f"{cls.__name__} uses the async execution mode but doesn't implement _arun")
+
+    def __init__(self,
+                 name: Optional[str] = None,
+                 description: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
         if name:
             self.name = name
         if description:
             self.description = description
-    
+
+        timeout = timeout if timeout is not None else self.timeout
+        self.timeout = (timeout if timeout is not None else settings.tool.tool_timeout) or None
+        # Sync calls of I/O-bound tools only get a thread to time out in for a timeout of their own
+        self._sync_timeout = timeout is not None and self.timeout is not None
+
+        max_concurrency = max_concurrency if max_concurrency is not None else self.max_concurrency
+        self.max_concurrency = (max_concurrency if max_concurrency is not None else settings.tool.tool_max_concurrency) or None
+        if self.max_concurrency:
+            self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+            self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Semaphores can't be pickled; a copy sent to a worker process only runs `_run`
+        state = self.__dict__.copy()
+        state.pop("_semaphore", None)
+        state.pop("_async_semaphores", None)
+        return state
+
     @abstractmethod
     def _run(self, **kwargs) -> Any:
         """Implementation of the tool logic"""
         pass
-    
+
     async def _arun(self, **kwargs) -> Any:
-        """Async implementation of the tool logic"""
-        return self._run(**kwargs)
-    
-    def run(self, **kwargs) -> ToolOutput:
-        """Run the tool with the provided inputs"""
+        """Async implementation of the tool logic (runs `_run` in the shared thread or process pool)"""
+        if self.execution_mode == "cpu":
+            return await run_in_process(self._run, **kwargs)
+        return await run_in_executor(self._run, **kwargs)
+
+    def _validate(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate the inputs using the schema"""
+        return dict(self.input_schema(**inputs))
+
+    @contextmanager
+    def _limit(self) -> Iterator[None]:
+        """Hold one of the tool's concurrency slots"""
+        if self._semaphore is None:
+            yield
+            return
+
+        with self._semaphore:
+            yield
+
+    def _alimit(self) -> Optional[asyncio.Semaphore]:
+        """Get the tool's concurrency limiter for the running event loop"""
+        if self._async_semaphores is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        return semaphore
+
+    def _start(self, inputs: Dict[str, Any]) -> Future:
+        """Start `_run` in the shared process pool (CPU-bound tools) or in its own thread"""
+        if self.execution_mode == "cpu":
+            return get_process_executor().submit(self._run, **inputs)
+
+        # Not the shared thread pool: callers may be running in it themselves
+        future: Future = Future()
+        context = contextvars.copy_context()
+
+        def target() -> None:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(context.run(self._run, **inputs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+        threading.Thread(target=target, name=f"tool-{self.name}", daemon=True).start()
+        return future
+
+    def _call(self, inputs: Dict[str, Any]) -> Any:
+        """
+        Run `_run` in the background, waiting at most the tool's timeout.
+
+        A thread or process can't be stopped, so a call that times out keeps
+        its concurrency slot until the work actually finishes.
+        """
+        if self._semaphore is not None:
+            self._semaphore.acquire()
         try:
-            # Validate inputs using the schema
-            validated_inputs = self.input_schema(**kwargs)
-            
-            # Run the tool
-            result = self._run(**validated_inputs.dict())
-            
-            return ToolOutput(result=result)
-        except Exception as e:
-            return ToolOutput(result=None, error=str(e))
-            
+            future = self._start(inputs)
+        except BaseException:
+            if self._semaphore is not None:
+                self._semaphore.release()
+            raise
+
+        if self._semaphore is not None:
+            future.add_done_callback(lambda _: self._semaphore.release())
+        return future.result(timeout=self.timeout)
+
+    async def _acall(self, inputs: Dict[str, Any]) -> Any:
+        """
+        Run `_arun`, waiting at most the tool's timeout.
+
+        Async tools are cancelled when they time out. Work in a thread or
+        process can't be, so it keeps its concurrency slot until it finishes.
+        """
+        semaphore = self._alimit()
+        if semaphore is not None:
+            await semaphore.acquire()
+        task = asyncio.ensure_future(self._arun(**inputs))
+
+        def finished(task: asyncio.Future) -> None:
+            if semaphore is not None:
+                semaphore.release()
+            # Retrieve the outcome, which nobody awaits after a timeout
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(finished)
+        if self.execution_mode == "async":
+            return await asyncio.wait_for(task, timeout=self.timeout)
+        return await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+
+    def _timeout_error(self) -> ToolOutput:
+        return ToolOutput(result=None, error=f"Tool {self.name} timed out after {self.timeout} seconds")
+
+    def _record(self, start: float, output: ToolOutput, status: Optional[str] = None) -> ToolOutput:
+        """Record a call's latency and outcome in the tool metrics and the call's trace span"""
+        status = status or ("error" if output.error else "ok")
+        tool_duration.observe(time.perf_counter() - start, tool=self.name)
+        tool_calls.inc(tool=self.name, status=status)
+        annotate_span(status=status)
+        return output
+
+    def run(self, **kwargs) -> ToolOutput:
+        """
+        Run the tool with the provided inputs.
+
+        I/O-bound tools run in the caller's thread, or in their own thread when
+        they were given a timeout (`TOOL_TIMEOUT` alone doesn't apply to sync
+        calls); CPU-bound tools run in the shared process pool.
+        """
+        start = time.perf_counter()
+        with trace_span(self.name, "tool"):
+            try:
+                # Validate inputs using the schema
+                validated_inputs = self._validate(kwargs)
+
+                # Run the tool
+                if self.execution_mode == "cpu" or self._sync_timeout:
+                    result = self._call(validated_inputs)
+                else:
+                    with self._limit():
+                        result = self._run(**validated_inputs)
+
+                return self._record(start, ToolOutput(result=result))
+            except _TIMEOUT_ERRORS:
+                return self._record(start, self._timeout_error(), status="timeout")
+            except Exception as e:
+                return self._record(start, ToolOutput(result=None, error=str(e)))
+
     async def arun(self, **kwargs) -> ToolOutput:
-        """Run the tool asynchronously"""
-        try:
-            # Validate inputs using the schema
-            validated_inputs = self.input_schema(**kwargs)
-            
-            # Run the tool asynchronously
-            result = await self._arun(**validated_inputs.dict())
-            
-            return ToolOutput(result=result)
-        except Exception as e:
-            return ToolOutput(result=None, error=str(e))
-    
+        """
+        Run the tool asynchronously without blocking the event loop.
+
+        Calls are limited to the tool's `max_concurrency` and `timeout`.
+        """
+        start = time.perf_counter()
+        with trace_span(self.name, "tool"):
+            try:
+                # Validate inputs using the schema
+                validated_inputs = self._validate(kwargs)
+
+                # Run the tool asynchronously
+                result = await self._acall(validated_inputs)
+
+                return self._record(start, ToolOutput(result=result))
+            except _TIMEOUT_ERRORS:
+                return self._record(start, self._timeout_error(), status="timeout")
+            except Exception as e:
+                return self._record(start, ToolOutput(result=None, error=str(e)))
+
     def get_schema(self) -> Dict[str, Any]:
-        """Get the tool's schema for LLM consumption"""
-        schema = {
-            "name": self.name,
-            "description": self.description,
-            "parameters": self.input_schema.schema()
-        }
-        return schema 
\ No newline at end of file
+        """
+        Get the tool's schema for LLM consumption.
+
+        The schema is built once and shared (its parameters with every tool
+        that has the same input schema), so callers must not modify it.
+        """
+        if self._schema is None:
+            self._schema = {
+                "name": self.name,
+                "description": self.description,
+                "parameters": _parameters_schema(self.input_schema)
+            }
+        return self._schema
@@ -1,14 +1,34 @@
+import atexit
+import mmap
 import os
-from typing import Dict, Any, Optional, List
+import stat
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple, Callable
+import numpy as np
 from pydantic import Field
 
 from .base import BaseTool, ToolInput
+from ..config import settings
+from ..utils.cache import LRUCache
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Process umask, applied to files created by atomic writes
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 class FileReadInput(ToolInput):
     """Input schema for file read tool"""
     file_path: str = Field(..., description="Path to the file to read")
     start_line: int = Field(default=0, description="Line to start reading from (0-indexed)")
     num_lines: Optional[int] = Field(default=None, description="Number of lines to read (None for all)")
+    tail: Optional[int] = Field(default=None, description="Read the last N lines instead of a line range")
+    byte_offset: Optional[int] = Field(default=None, description="Read a byte range starting at this offset instead of a line range")
+    num_bytes: Optional[int] = Field(default=None, description="Number of bytes to read from byte_offset (None for all)")
+    max_bytes: Optional[int] = Field(default=None, description="Maximum number of bytes to return (defaults to config setting)")
 
 class FileWriteInput(ToolInput):
     """Input schema for file write tool"""
@@ -16,39 +36,320 @@ class FileWriteInput(ToolInput):
     content: str = Field(..., description="Content to write to the file")
     append: bool = Field(default=False, description="Whether to append to the file instead of overwriting")
 
+class LineIndex:
+    """Byte offsets of the start of every line in a file"""
+    
+    # Bytes scanned at a time when building an index
+    CHUNK_SIZE = 64 * 1024 * 1024
+    
+    def __init__(self, offsets: np.ndarray, size: int):
+        self.offsets = offsets
+        self.size = size
+    
+    @classmethod
+    def build(cls, data: Any) -> "LineIndex":
+        """Scan a mapped (or read) file for newlines, a chunk at a time"""
+        size = len(data)
+        chunks = [np.zeros(1, dtype=np.int64)]
+        for chunk_start in range(0, size, cls.CHUNK_SIZE):
+            chunk = np.frombuffer(data, dtype=np.uint8, count=min(cls.CHUNK_SIZE, size - chunk_start), offset=chunk_start)
+            chunks.append(np.flatnonzero(chunk == ord("\n")).astype(np.int64) + chunk_start + 1)
+            del chunk
+        
+        offsets = np.concatenate(chunks)
+        # A trailing newline doesn't start another line
+        if size == 0 or offsets[-1] == size:
+            offsets = offsets[:-1]
+        return cls(offsets, size)
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def line_range(self, start_line: int, num_lines: Optional[int]) -> Tuple[int, int]:
+        """Get the byte range covering a range of lines"""
+        end_line = len(self.offsets) if num_lines is None else start_line + num_lines
+        start = int(self.offsets[start_line])
+        end = int(self.offsets[end_line]) if end_line < len(self.offsets) else self.size
+        return start, end
+
+# Line indexes of recently read files, keyed by path, modification time and size
+_line_indexes = LRUCache(max_entries=settings.tool.file_index_cache_size)
+
+def get_line_index(file_path: str, stat: os.stat_result, data: mmap.mmap) -> LineIndex:
+    """Get the cached line index of a file, rebuilding it if the file has changed"""
+    key = f"{os.path.realpath(file_path)}\x00{stat.st_mtime_ns}\x00{stat.st_size}"
+    index = _line_indexes.get(key)
+    if index is None:
+        index = LineIndex.build(data)
+        _line_indexes.set(key, index)
+    return index
+
+def tail_range(data: mmap.mmap, num_lines: int) -> Tuple[int, int]:
+    """Get the byte range of the last lines of a mapped file by scanning backwards from the end"""
+    size = len(data)
+    # A trailing newline ends the last line rather than starting a new one
+    end = size - 1 if size and data[size - 1:size] == b"\n" else size
+    start = end
+    for _ in range(num_lines):
+        newline = data.rfind(b"\n", 0, start)
+        if newline == -1:
+            return 0, size
+        start = newline
+    return start + 1, size
+
+def read_window(data: Any,
+                get_index: Callable[[Any], LineIndex],
+                start_line: int,
+                num_lines: Optional[int],
+                tail: Optional[int],
+                byte_offset: Optional[int],
+                num_bytes: Optional[int],
+                max_bytes: int) -> str:
+    """
+    Decode the requested window of a file's content.
+    
+    Args:
+        data: The file's content, mapped or read into memory
+        get_index: Gets the line index of the content, only called for line ranges
+        start_line: Line to start reading from
+        num_lines: Number of lines to read (None for all)
+        tail: Read the last N lines instead of a line range
+        byte_offset: Read a byte range starting at this offset instead of a line range
+        num_bytes: Number of bytes to read from byte_offset (None for all)
+        max_bytes: Maximum number of bytes to return
+        
+    Returns:
+        The window's text, or an error message if it is out of range
+    """
+    size = len(data)
+    if tail is not None:
+        start, end = tail_range(data, tail) if tail > 0 else (size, size)
+    elif byte_offset is not None:
+        if byte_offset >= size:
+            return f"Error: Byte offset {byte_offset} is out of range (file has {size} bytes)"
+        start = byte_offset
+        end = size if num_bytes is None else min(byte_offset + num_bytes, size)
+    else:
+        index = get_index(data)
+        
+        # Apply line range if specified
+        if start_line >= len(index):
+            return f"Error: Start line {start_line} is out of range (file has {len(index)} lines)"
+        
+        start, end = index.line_range(start_line, num_lines)
+    
+    truncated = end - start > max_bytes
+    content = data[start:min(end, start + max_bytes)].decode('utf-8', errors='replace')
+    
+    if truncated:
+        content += f"\n[Truncated: returned {max_bytes} of {end - start} bytes]"
+    return content
+
+class WriteBehindBuffer:
+    """
+    Coalesces appends per file into batched writes.
+    
+    Appends are buffered in memory and written in one call when a file's
+    pending data reaches `max_bytes`, when it has been pending for
+    `flush_interval` seconds (checked by a background thread), when the file
+    is read or overwritten through the file tools, or at exit.
+    """
+    
+    def __init__(self, max_bytes: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.max_bytes = max_bytes or settings.tool.file_write_buffer_bytes
+        self.flush_interval = flush_interval or settings.tool.file_write_flush_interval
+        
+        # Pending appends per path: (chunks, pending bytes, time of the first append)
+        self._pending: Dict[str, Tuple[List[bytes], int, float]] = {}
+        self._path_locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.writes = 0
+        self.appends = 0
+    
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.realpath(file_path)
+    
+    def path_lock(self, file_path: str) -> threading.RLock:
+        """Get the lock serializing writes to a file"""
+        key = self._key(file_path)
+        with self._lock:
+            lock = self._path_locks.get(key)
+            if lock is None:
+                lock = self._path_locks[key] = threading.RLock()
+            return lock
+    
+    def append(self, file_path: str, content: str) -> None:
+        """Queue content to be appended to a file"""
+        key = self._key(file_path)
+        data = content.encode('utf-8')
+        with self._lock:
+            chunks, size, since = self._pending.get(key, ([], 0, time.monotonic()))
+            chunks.append(data)
+            self._pending[key] = (chunks, size + len(data), since)
+            self.appends += 1
+            full = size + len(data) >= self.max_bytes
+            
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="write-behind", daemon=True)
+                self._flusher.start()
+        
+        if full:
+            self.flush(file_path)
+    
+    def flush(self, file_path: Optional[str] = None) -> None:
+        """Write the pending appends of a file (or of every file) to disk"""
+        if file_path is not None:
+            keys = [self._key(file_path)]
+        else:
+            with self._lock:
+                keys = list(self._pending)
+        for key in keys:
+            with self.path_lock(key):
+                with self._lock:
+                    pending = self._pending.pop(key, None)
+                if pending is None:
+                    continue
+                
+                with open(key, 'ab') as file:
+                    file.write(b"".join(pending[0]))
+                self.writes += 1
+    
+    def discard(self, file_path: str) -> None:
+        """Drop the pending appends of a file (callers hold its path lock)"""
+        with self._lock:
+            self._pending.pop(self._key(file_path), None)
+    
+    def _flush_periodically(self) -> None:
+        """Flush files whose appends have been pending for longer than the flush interval"""
+        while not self._stopped.wait(self.flush_interval / 2):
+            now = time.monotonic()
+            with self._lock:
+                expired = [key for key, (_, _, since) in self._pending.items() if now - since >= self.flush_interval]
+            
+            for key in expired:
+                try:
+                    self.flush(key)
+                except Exception as e:
+                    logger.error(f"Error flushing buffered writes to {key}: {str(e)}")
+    
+    def close(self) -> None:
+        """Stop the background flusher and write all pending appends"""
+        self._stopped.set()
+        self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of buffered appends and the writes they were coalesced into"""
+        return {
+            "appends": self.appends,
+            "writes": self.writes,
+            "pending_files": len(self._pending),
+            "pending_bytes": sum(size for _, size, _ in list(self._pending.values()))
+        }
+
+# Appends made by write-behind FileWriteTools, flushed before the files are read
+write_behind_buffer = WriteBehindBuffer()
+atexit.register(write_behind_buffer.close)
+
+def atomic_write(file_path: str, content: str) -> None:
+    """Replace a file's content so readers see either the old or the new file, never a partial one"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        
+        # Keep the permissions of the file being replaced (mkstemp creates it private)
+        try:
+            mode = stat.S_IMODE(os.stat(file_path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
 class FileReadTool(BaseTool):
-    """Tool for reading files"""
+    """
+    Tool for reading files
+    
+    Files are memory-mapped and only the requested window is read. Line ranges
+    are located with a per-file line index that is cached until the file
+    changes, so repeated reads of a large file cost O(window).
+    """
     name = "file_read"
     description = "Read the contents of a file from the filesystem"
     input_schema = FileReadInput
     
-    def _run(self, file_path: str, start_line: int = 0, num_lines: Optional[int] = None) -> str:
+    # Most bytes read from a file without a size, such as a /proc file or a pipe
+    UNSIZED_READ_LIMIT = 64 * 1024 * 1024
+    
+    def _run(self,
+             file_path: str,
+             start_line: int = 0,
+             num_lines: Optional[int] = None,
+             tail: Optional[int] = None,
+             byte_offset: Optional[int] = None,
+             num_bytes: Optional[int] = None,
+             max_bytes: Optional[int] = None) -> str:
         """Read content from a file"""
+        if tail is not None and byte_offset is not None:
+            return "Error: tail and byte_offset can't be used together"
+        
+        max_bytes = max_bytes or settings.tool.file_read_max_bytes
+        
         try:
-            with open(file_path, 'r') as file:
-                lines = file.readlines()
-                
-                # Apply line range if specified
-                if start_line >= len(lines):
-                    return f"Error: Start line {start_line} is out of range (file has {len(lines)} lines)"
-                
-                if num_lines is None:
-                    selected_lines = lines[start_line:]
-                else:
-                    selected_lines = lines[start_line:start_line + num_lines]
+            # Read-after-write: include appends still buffered by write-behind tools
+            write_behind_buffer.flush(file_path)
+            
+            with open(file_path, 'rb') as file:
+                file_stat = os.fstat(file.fileno())
+                if file_stat.st_size == 0 or not stat.S_ISREG(file_stat.st_mode):
+                    # Files in /proc and /sys report a size of 0 and can't be mapped,
+                    # and pipes and devices have no size: read them as they come
+                    data = file.read(self.UNSIZED_READ_LIMIT)
+                    if not data:
+                        if tail is not None or byte_offset is not None:
+                            return ""
+                        return f"Error: Start line {start_line} is out of range (file has 0 lines)"
+                    return read_window(data, LineIndex.build, start_line, num_lines, tail, byte_offset, num_bytes, max_bytes)
                 
-                return ''.join(selected_lines)
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return read_window(
+                        data,
+                        lambda data: get_line_index(file_path, file_stat, data),
+                        start_line, num_lines, tail, byte_offset, num_bytes, max_bytes
+                    )
         except FileNotFoundError:
             return f"Error: File not found: {file_path}"
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
 class FileWriteTool(BaseTool):
-    """Tool for writing to files"""
+    """
+    Tool for writing to files
+    
+    Overwrites are atomic (written to a temporary file, then renamed). With
+    write-behind enabled, appends are coalesced into batched writes; reads
+    through FileReadTool flush a file's pending appends first.
+    """
     name = "file_write"
     description = "Write content to a file on the filesystem"
     input_schema = FileWriteInput
     
+    def __init__(self, write_behind: Optional[bool] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.write_behind = write_behind if write_behind is not None else settings.tool.file_write_behind
+    
     def _run(self, file_path: str, content: str, append: bool = False) -> str:
         """Write content to a file"""
         try:
@@ -56,10 +357,19 @@ class FileWriteTool(BaseTool):
             os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
             
             # Write to file
-            mode = 'a' if append else 'w'
-            with open(file_path, mode) as file:
-                file.write(content)
+            if append and self.write_behind:
+                write_behind_buffer.append(file_path, content)
+            elif append:
+                with write_behind_buffer.path_lock(file_path):
+                    write_behind_buffer.flush(file_path)
+                    with open(file_path, 'a', encoding='utf-8') as file:
+                        file.write(content)
+            else:
+                with write_behind_buffer.path_lock(file_path):
+                    # Buffered appends would be overwritten anyway
+                    write_behind_buffer.discard(file_path)
+                    atomic_write(file_path, content)
                 
             return f"Successfully wrote to {file_path}"
         except Exception as e:
-            return f"Error writing to file: {str(e)}" 
\ No newline at end of file
+            return f"Error writing to file: {str(e)}"
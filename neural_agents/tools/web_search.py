@@ -1,8 +1,14 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
 from pydantic import Field
 
-from .base import BaseTool, ToolInput
+from .base import BaseTool, ToolInput, ToolOutput
 from ..config import settings
+from ..utils.cache import LRUCache, SQLiteCache, TieredCache
+from ..utils.concurrency import SingleFlight, gather_with_concurrency, run_in_executor
+from ..utils.shared_state import multi_worker
+from ..utils.tracing import annotate_span
 
 class WebSearchInput(ToolInput):
     """Input schema for web search tool"""
@@ -14,6 +20,7 @@ class WebSearchTool(BaseTool):
     name = "web_search"
     description = "Search the web for current information about a topic or question"
     input_schema = WebSearchInput
+    execution_mode = "async"
     
     def __init__(self, 
                  api_key: Optional[str] = None, 
@@ -24,16 +31,117 @@ class WebSearchTool(BaseTool):
         self.search_engine = search_engine or settings.tool.search_engine
         self.max_results = max_results or settings.tool.max_search_results
         
+        # Results cache (backed by a store shared with the other workers in
+        # multi-worker mode) and deduplication of concurrent identical searches
+        self.cache = LRUCache(
+            max_entries=settings.tool.search_cache_size,
+            ttl=settings.tool.search_cache_ttl
+        )
+        if multi_worker():
+            self.cache = TieredCache(
+                self.cache,
+                SQLiteCache(settings.tool.search_cache_path, ttl=settings.tool.search_cache_ttl)
+            )
+        self._single_flight = SingleFlight()
+    
+    def _cache_key(self, query: str, num_results: int) -> str:
+        """Build the cache key for a search"""
+        normalized_query = " ".join(query.lower().split())
+        return f"{self.search_engine}\x00{normalized_query}\x00{num_results}"
+        
     def _run(self, query: str, num_results: int = 3) -> List[Dict[str, str]]:
         """
         Execute a web search query and return results.
         
-        In a real implementation, this would call a search API.
-        For now, it returns a mock response.
+        Results are cached for `search_cache_ttl` seconds, and concurrent
+        identical searches share a single backend call.
         """
         # Ensure we don't exceed the configured max results
         num_results = min(num_results, self.max_results)
         
+        key = self._cache_key(query, num_results)
+        results = self.cache.get(key)
+        annotate_span(cache_hit=results is not None)
+        if results is None:
+            results = self._single_flight.do(key, self._search_and_cache, key, query, num_results)
+        
+        return list(results)
+    
+    async def _arun(self, query: str, num_results: int = 3) -> List[Dict[str, str]]:
+        """Async implementation of the web search tool"""
+        # Ensure we don't exceed the configured max results
+        num_results = min(num_results, self.max_results)
+        
+        key = self._cache_key(query, num_results)
+        results = self.cache.get(key)
+        annotate_span(cache_hit=results is not None)
+        if results is None:
+            results = await self._single_flight.ado(key, run_in_executor, self._search_and_cache, key, query, num_results)
+        
+        return list(results)
+    
+    def run_batch(self, queries: List[str], num_results: int = 3, max_concurrency: Optional[int] = None) -> List[ToolOutput]:
+        """
+        Run several searches in one call.
+        
+        Runs the searches concurrently. Every query gets its own ToolOutput,
+        so a failing query doesn't fail the whole batch.
+        
+        Args:
+            queries: The search queries
+            num_results: Number of results to return per query
+            max_concurrency: Maximum number of concurrent searches (defaults to config setting)
+            
+        Returns:
+            One ToolOutput per query, in query order
+        """
+        if not queries:
+            return []
+        
+        max_concurrency = max_concurrency or settings.tool.search_max_concurrency
+        # Run each search in a copy of the caller's context so it is traced as part of the caller's span
+        contexts = [contextvars.copy_context() for _ in queries]
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(queries))) as pool:
+            return list(pool.map(
+                lambda context, query: context.run(self.run, query=query, num_results=num_results),
+                contexts,
+                queries
+            ))
+    
+    async def arun_batch(self, queries: List[str], num_results: int = 3, max_concurrency: Optional[int] = None) -> List[ToolOutput]:
+        """
+        Run several searches in one call asynchronously.
+        
+        Args:
+            queries: The search queries
+            num_results: Number of results to return per query
+            max_concurrency: Maximum number of concurrent searches (defaults to config setting)
+            
+        Returns:
+            One ToolOutput per query, in query order
+        """
+        if not queries:
+            return []
+        
+        max_concurrency = max_concurrency or settings.tool.search_max_concurrency
+        return await gather_with_concurrency(
+            max_concurrency,
+            *(self.arun(query=query, num_results=num_results) for query in queries)
+        )
+    
+    def _search_and_cache(self, key: str, query: str, num_results: int) -> List[Dict[str, str]]:
+        """Call the search backend and cache the results"""
+        results = self._search(query, num_results)
+        self.cache.set(key, results)
+        return results
+    
+    def _search(self, query: str, num_results: int) -> List[Dict[str, str]]:
+        """
+        Call the search backend.
+        
+        In a real implementation, this would call a search API.
+        For now, it returns a mock response.
+        """
         # Mock implementation
         results = []
         for i in range(num_results):
@@ -45,6 +153,9 @@ class WebSearchTool(BaseTool):
         
         return results
     
-    async def _arun(self, query: str, num_results: int = 3) -> List[Dict[str, str]]:
-        """Async implementation of the web search tool"""
-        return self._run(query=query, num_results=num_results) 
\ No newline at end of file
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get the results cache and request coalescing statistics"""
+        return {
+            "cache": self.cache.stats(),
+            "single_flight": self._single_flight.stats()
+        }
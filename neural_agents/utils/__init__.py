@@ -1,4 +1,6 @@
 from .logger import get_logger
-from .visualization import visualize_graph
+from .visualization import visualize_graph, avisualize_graph
+from .tokens import estimate_tokens, group_by_token_budget
+from .concurrency import get_executor, get_process_executor, run_in_executor, run_in_process, gather_with_concurrency
 
-__all__ = ["get_logger", "visualize_graph"] 
\ No newline at end of file
+__all__ = ["get_logger", "visualize_graph", "avisualize_graph", "get_executor", "get_process_executor", "run_in_executor", "run_in_process", "gather_with_concurrency", "estimate_tokens", "group_by_token_budget"]
\ No newline at end of file
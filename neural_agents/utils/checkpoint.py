@@ -0,0 +1,298 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, Tuple, Type
+from pydantic import BaseModel
+
+from ..config import settings
+from ..schemas.agent_state import AgentState, NodeOutput
+from ..schemas.message import MessageRecord, MessageThread
+from .concurrency import run_in_executor
+
+# Kinds of checkpoints: the initial state, a node's update, and partial progress within a node
+START = "start"
+NODE = "node"
+PROGRESS = "progress"
+
+def _encode(value: Any) -> Any:
+    """Encode the values JSON can't represent, keeping messages and node outputs compact"""
+    if isinstance(value, MessageRecord):
+        return {"__message__": [value.role, value.content, value.name, value.tool_calls, value.tool_call_id, value.created_at]}
+    if isinstance(value, MessageThread):
+        return {"__thread__": value.records}
+    if isinstance(value, NodeOutput):
+        return {"__node_output__": [value.node_name, value.output, value.status, value.error]}
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _decode(value: Dict[str, Any]) -> Any:
+    """Rebuild the values encoded by `_encode`"""
+    if len(value) == 1:
+        if "__message__" in value:
+            role, content, name, tool_calls, tool_call_id, created_at = value["__message__"]
+            return MessageRecord(role, content, name, tool_calls, tool_call_id, created_at)
+        if "__thread__" in value:
+            thread = MessageThread()
+            thread.records.extend(value["__thread__"])
+            return thread
+        if "__node_output__" in value:
+            node_name, output, status, error = value["__node_output__"]
+            return NodeOutput.construct(node_name=node_name, output=output, status=status, error=error)
+    return value
+
+def serialize_update(update: Dict[str, Any]) -> bytes:
+    """Serialize state values or a state update to compressed, compact JSON"""
+    return zlib.compress(json.dumps(update, default=_encode, separators=(",", ":")).encode("utf-8"))
+
+def deserialize_update(data: bytes) -> Dict[str, Any]:
+    """Deserialize state values or a state update"""
+    return json.loads(zlib.decompress(data).decode("utf-8"), object_hook=_decode)
+
+class CheckpointStore:
+    """
+    Persistent log of agent run checkpoints stored in SQLite.
+
+    A run is stored as its initial state followed by the updates of every
+    node (and the partial progress nodes report), so restoring a run replays
+    the updates through the state's reducers.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, agent_type TEXT NOT NULL, status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "run_id TEXT NOT NULL, step INTEGER NOT NULL, node TEXT NOT NULL, kind TEXT NOT NULL, "
+            "data BLOB NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (run_id, step))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_updated_at ON runs (updated_at)")
+
+    def create_run(self, run_id: str, agent_type: str, state: AgentState) -> "CheckpointRun":
+        """
+        Start a new run, checkpointing its initial state.
+
+        Args:
+            run_id: The run id
+            agent_type: The type of agent running
+            state: The initial state
+
+        Returns:
+            The run to record checkpoints with
+        """
+        data = serialize_update(state.to_channels())
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, agent_type, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (run_id, agent_type, "running", now, now)
+                )
+                self._conn.execute(
+                    "INSERT INTO checkpoints (run_id, step, node, kind, data, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, 0, "__start__", START, data, now)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return CheckpointRun(self, run_id, next_step=1)
+
+    def resume_run(self, run_id: str, state_class: Type[AgentState]) -> Optional[Tuple["CheckpointRun", AgentState]]:
+        """
+        Restore a run's latest state by replaying its checkpoints.
+
+        Args:
+            run_id: The run id
+            state_class: The state class of the run's agent
+
+        Returns:
+            A tuple of (the run to keep recording checkpoints with, the restored and
+            validated state), or None if the run has no checkpoints
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, node, kind, data FROM checkpoints WHERE run_id = ? ORDER BY step", (run_id,)
+            ).fetchall()
+            self._conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", ("running", time.time(), run_id))
+        if not rows or rows[0][2] != START:
+            return None
+
+        values = deserialize_update(rows[0][3])
+        completed_nodes = Counter()
+        for _, node, kind, data in rows[1:]:
+            values = state_class.apply_update(values, deserialize_update(data))
+            if kind == NODE:
+                completed_nodes[node] += 1
+
+        run = CheckpointRun(self, run_id, next_step=rows[-1][0] + 1, completed_nodes=completed_nodes)
+        return run, state_class.from_channels(values)
+
+    def write(self, run_id: str, step: int, node: str, kind: str, data: bytes) -> None:
+        """Store a serialized checkpoint"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, step, node, kind, data, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, step, node, kind, data, now)
+            )
+            self._conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+
+    def set_status(self, run_id: str, status: str) -> None:
+        """Set a run's status (running, completed or failed)"""
+        with self._lock:
+            self._conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", (status, time.time(), run_id))
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Get a run's agent type, status and checkpointed nodes"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT agent_type, status, created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            nodes = self._conn.execute(
+                "SELECT node FROM checkpoints WHERE run_id = ? AND kind = ? ORDER BY step", (run_id, NODE)
+            ).fetchall()
+
+        agent_type, status, created_at, updated_at = row
+        return {
+            "run_id": run_id,
+            "agent_type": agent_type,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "completed_nodes": [node for node, in nodes]
+        }
+
+    def prune(self) -> int:
+        """Delete runs that haven't been updated within the TTL, returning how many were deleted"""
+        if not self.ttl:
+            return 0
+
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM checkpoints WHERE run_id IN (SELECT run_id FROM runs WHERE updated_at < ?)", (cutoff,))
+                deleted = self._conn.execute("DELETE FROM runs WHERE updated_at < ?", (cutoff,)).rowcount
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return deleted
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+class CheckpointRun:
+    """Records the checkpoints of one run of an agent graph"""
+
+    def __init__(self, store: CheckpointStore, run_id: str, next_step: int = 1, completed_nodes: Optional[Counter] = None):
+        self.store = store
+        self.run_id = run_id
+        self._steps = itertools.count(next_step)
+        self._completed_nodes = completed_nodes or Counter()
+        self._lock = threading.Lock()
+
+    def _prepare(self, node: str, update: Dict[str, Any]) -> Tuple[int, bytes]:
+        """Number a checkpoint and serialize its update now, before the values can change"""
+        with self._lock:
+            step = next(self._steps)
+        return step, serialize_update(update)
+
+    def save(self, node: str, update: Dict[str, Any], kind: str = NODE) -> None:
+        """Checkpoint a node's update"""
+        step, data = self._prepare(node, update)
+        self.store.write(self.run_id, step, node, kind, data)
+
+    async def asave(self, node: str, update: Dict[str, Any], kind: str = NODE) -> None:
+        """Checkpoint a node's update without blocking the event loop"""
+        step, data = self._prepare(node, update)
+        await run_in_executor(self.store.write, self.run_id, step, node, kind, data)
+
+    def skip_completed(self, node: str) -> bool:
+        """Whether a node already finished in the run being resumed (each finished execution is skipped once)"""
+        with self._lock:
+            if self._completed_nodes[node] > 0:
+                self._completed_nodes[node] -= 1
+                return True
+            return False
+
+    def set_status(self, status: str) -> None:
+        """Set the run's status"""
+        self.store.set_status(self.run_id, status)
+
+    @contextmanager
+    def bind(self) -> Iterator["CheckpointRun"]:
+        """Record the checkpoints of the graph run in the current context in this run"""
+        token = _checkpoint_run.set(self)
+        try:
+            yield self
+        finally:
+            _checkpoint_run.reset(token)
+
+# Run whose checkpoints are recorded in the current context
+_checkpoint_run: ContextVar[Optional[CheckpointRun]] = ContextVar("checkpoint_run", default=None)
+
+def get_checkpoint_run() -> Optional[CheckpointRun]:
+    """Get the run recording checkpoints in the current context, if any"""
+    return _checkpoint_run.get()
+
+def save_checkpoint(node: str, update: Dict[str, Any], kind: str = NODE) -> None:
+    """Checkpoint an update if the current run is being checkpointed"""
+    run = _checkpoint_run.get()
+    if run is not None:
+        run.save(node, update, kind)
+
+async def asave_checkpoint(node: str, update: Dict[str, Any], kind: str = NODE) -> None:
+    """Checkpoint an update if the current run is being checkpointed (async)"""
+    run = _checkpoint_run.get()
+    if run is not None:
+        await run.asave(node, update, kind)
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """
+    Get the process-wide checkpoint store.
+
+    Returns:
+        The store, or None if checkpointing is disabled
+    """
+    global _checkpoint_store
+    if not settings.checkpoint.enabled:
+        return None
+
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore(settings.checkpoint.path, ttl=settings.checkpoint.ttl)
+    return _checkpoint_store
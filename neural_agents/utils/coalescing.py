@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+from contextlib import contextmanager
+from typing import Any, Coroutine, Dict, Hashable, Iterator, Optional, Tuple
+
+from ..config import settings
+from .events import EventStream
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for deduplication: collapse whitespace and ignore case"""
+    return " ".join(query.split()).casefold()
+
+def settings_fingerprint(*parts: Any) -> str:
+    """
+    Hash the settings that change what an agent answers, plus any extra parts (e.g. the graph version).
+
+    Requests only share a run when they would have been answered identically.
+    """
+    llm = settings.llm.dict(exclude={"api_key"})
+    data = json.dumps([llm, settings.agent.dict(), settings.tool.dict(exclude={"search_api_key"}), *parts], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+class SharedRun:
+    """
+    A run of an agent graph shared by identical concurrent requests.
+
+    Its events go to one `EventStream` that every streaming request subscribes
+    to, and its outcome to a future every other request awaits. The run is
+    cancelled when the last request attached to it goes away.
+    """
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.events = EventStream()
+        self.outcome: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        # Mark a failed outcome as retrieved even if nobody was left waiting for it
+        self.outcome.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self.task: Optional[asyncio.Task] = None
+        self.attached = 0
+
+    def start(self, coroutine: Coroutine[Any, Any, Any]) -> None:
+        """Start the run in its own task, so it isn't tied to the request that started it"""
+        self.task = asyncio.create_task(coroutine)
+
+    def fail(self, error: BaseException) -> None:
+        """Fail a run that couldn't be started"""
+        if not self.outcome.done():
+            self.outcome.set_exception(error)
+        self.events.emit("error", {"detail": str(error)})
+        self.events.close()
+
+    @contextmanager
+    def attach(self) -> Iterator["SharedRun"]:
+        """Keep the run going while the enclosed block waits for it or streams its events"""
+        self.attached += 1
+        try:
+            yield self
+        finally:
+            self.attached -= 1
+            if self.attached == 0 and self.task is not None and not self.task.done():
+                self.task.cancel()
+
+    async def wait(self) -> Any:
+        """Wait for the run's outcome"""
+        with self.attach():
+            return await asyncio.shield(self.outcome)
+
+class RequestCoalescer:
+    """
+    Single-flight deduplication of API requests.
+
+    The first request for a key starts a `SharedRun`; identical requests that
+    arrive while it is in progress attach to it instead of starting their own.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self):
+        self._runs: Dict[Hashable, SharedRun] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    def join(self, key: Optional[Hashable]) -> Tuple[SharedRun, bool]:
+        """
+        Get the run in progress for a key, or a new one if there is none (or the key is None).
+
+        Returns:
+            A tuple of (the run, whether this request is its leader and has to start it)
+        """
+        self.requests += 1
+        if key is not None:
+            shared = self._runs.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                return shared, False
+
+        shared = SharedRun(key)
+        if key is not None:
+            self._runs[key] = shared
+        return shared, True
+
+    def finish(self, shared: SharedRun) -> None:
+        """Stop handing out a run, once it has finished"""
+        if shared.key is not None and self._runs.get(shared.key) is shared:
+            del self._runs[shared.key]
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of requests, how many shared a run, and the runs in progress"""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._runs)
+        }
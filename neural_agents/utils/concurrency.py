@@ -0,0 +1,209 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from ..config import settings
+
+T = TypeVar('T')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_process_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared, bounded thread pool used for blocking work.
+
+    Returns:
+        The process-wide ThreadPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.service.executor_workers,
+                    thread_name_prefix="neural-agents"
+                )
+    return _executor
+
+async def run_in_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function in the shared thread pool without blocking the event loop.
+
+    The caller's context variables are carried over to the worker thread.
+
+    Args:
+        func: The blocking function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """
+    Get the shared, bounded process pool used for CPU-bound work.
+    
+    Returns:
+        The process-wide ProcessPoolExecutor
+    """
+    global _process_executor
+    if _process_executor is None:
+        with _executor_lock:
+            if _process_executor is None:
+                _process_executor = ProcessPoolExecutor(max_workers=settings.service.process_workers)
+    return _process_executor
+
+async def run_in_process(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a CPU-bound function in the shared process pool without blocking the event loop.
+    
+    The function and its arguments must be picklable.
+    
+    Args:
+        func: The function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+        
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    return await loop.run_in_executor(get_process_executor(), call)
+
+async def gather_with_concurrency(limit: int, *awaitables: Awaitable[T]) -> List[T]:
+    """
+    Await several awaitables concurrently, running at most `limit` at a time.
+
+    Args:
+        limit: Maximum number of awaitables running at once
+        *awaitables: The awaitables to run
+
+    Returns:
+        The results, in the same order as the awaitables
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(awaitable: Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls for the same key so they share one execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is still running wait for and receive the same result (or exception).
+    Works across threads and event-loop tasks alike.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Get the in-flight future for a key, creating it if this caller is the leader"""
+        with self._lock:
+            self.calls += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable) -> None:
+        """Forget the in-flight call for a key"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run `func` once for all concurrent callers with the same key.
+
+        Args:
+            key: The deduplication key
+            func: The function to run
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's return value
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    async def ado(self, key: Hashable, afunc: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """
+        Await `afunc` once for all concurrent callers with the same key.
+
+        Args:
+            key: The deduplication key
+            afunc: The coroutine function to run
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The coroutine's return value
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await afunc(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of calls and how many of them shared an in-flight call"""
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._calls)
+        }
+
+def shutdown_executor() -> None:
+    """Shut down the shared thread and process pools"""
+    global _executor, _process_executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _process_executor is not None:
+            _process_executor.shutdown(wait=False)
+            _process_executor = None
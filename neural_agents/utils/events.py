@@ -0,0 +1,106 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+EventSink = Callable[[str, Dict[str, Any]], None]
+
+# Sink for events emitted by the run executing in the current context
+_event_sink: ContextVar[Optional[EventSink]] = ContextVar("event_sink", default=None)
+
+# Whether the run executing in the current context streams its LLM output token by token
+_stream_tokens: ContextVar[bool] = ContextVar("stream_tokens", default=False)
+
+def emit_event(event: str, data: Dict[str, Any]) -> None:
+    """
+    Emit an event to the sink bound to the current run, if any.
+
+    Args:
+        event: The event name
+        data: The event payload
+    """
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event, data)
+
+def streaming_enabled() -> bool:
+    """Whether the current run has an event sink that wants token-level output"""
+    return _event_sink.get() is not None and _stream_tokens.get()
+
+class EventStream:
+    """
+    Collects the events of a run so they can be consumed asynchronously.
+
+    Events can be emitted from the event loop or from worker threads; they are
+    delivered in the order they were emitted. Any number of consumers can
+    subscribe, and each one first receives the events emitted before it
+    subscribed, so a consumer attaching to a run in progress misses nothing.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._history: List[Tuple[str, Dict[str, Any]]] = []
+        self._subscribers: List["asyncio.Queue[Any]"] = []
+        self._closed = False
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Add an event to the stream"""
+        self._loop.call_soon_threadsafe(self._publish, (event, data))
+
+    def close(self) -> None:
+        """Mark the end of the stream"""
+        self._loop.call_soon_threadsafe(self._publish, self._CLOSED)
+
+    def _publish(self, item: Any) -> None:
+        """Record an event and pass it to the subscribers (on the event loop)"""
+        if self._closed:
+            return
+        if item is self._CLOSED:
+            self._closed = True
+        else:
+            self._history.append(item)
+        for queue in self._subscribers:
+            queue.put_nowait(item)
+
+    @contextmanager
+    def bind(self, stream_tokens: bool = True) -> Iterator["EventStream"]:
+        """
+        Send the events emitted in the current context to this stream.
+
+        Without `stream_tokens` only progress events are sent, and LLM calls
+        aren't streamed (so they can be answered from the LLM cache).
+        """
+        token = _event_sink.set(self.emit)
+        tokens_token = _stream_tokens.set(stream_tokens)
+        try:
+            yield self
+        finally:
+            _stream_tokens.reset(tokens_token)
+            _event_sink.reset(token)
+
+    async def subscribe(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over the stream's events from the first one until it is closed"""
+        # Taking the history and registering happen without yielding to the loop, so no event is missed or repeated
+        history = list(self._history)
+        if self._closed:
+            for item in history:
+                yield item
+            return
+
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            for item in history:
+                yield item
+            while True:
+                item = await queue.get()
+                if item is self._CLOSED:
+                    return
+                yield item
+        finally:
+            self._subscribers.remove(queue)
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        return self.subscribe()
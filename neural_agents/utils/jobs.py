@@ -0,0 +1,480 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from ..config import settings
+from .concurrency import run_in_executor
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Runs a claimed job, reporting partial results through the callback, and returns its result
+JobRunner = Callable[[Dict[str, Any], Callable[[Dict[str, Any]], Awaitable[None]]], Awaitable[Dict[str, Any]]]
+
+def _dumps(value: Any) -> str:
+    """Serialize a job's progress or result, keeping pydantic models (e.g. tool outputs) structured"""
+    return json.dumps(jsonable_encoder(value))
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that is already full"""
+
+class JobError(Exception):
+    """Raised when waiting for a job that failed or was cancelled"""
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job = job
+        error = job.get("error") or {"status_code": 409, "detail": f"Job {job['job_id']} was {job['status']}"}
+        self.status_code = error["status_code"]
+        self.detail = error["detail"]
+        super().__init__(self.detail)
+
+class JobStore:
+    """
+    Persistent queue of agent jobs stored in SQLite.
+
+    A worker claims a queued job with a lease and keeps renewing it while the
+    job runs. If the worker dies the lease runs out and another worker claims
+    the job again, as a new attempt. Finished jobs keep their result until
+    the TTL runs out.
+    """
+
+    _COLUMNS = (
+        "job_id, agent_type, payload, status, attempts, max_attempts, progress, result, error, "
+        "created_at, updated_at, available_at, finished_at"
+    )
+
+    def __init__(self, path: str, max_queued: int = 0, result_ttl: Optional[float] = None):
+        self.path = path
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, agent_type TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, progress TEXT, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, available_at REAL NOT NULL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_available_at ON jobs (status, available_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+
+    def submit(self, agent_type: str, payload: Dict[str, Any], max_attempts: int = 1, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            agent_type: The type of agent to run
+            payload: What to run it on (JSON-serializable)
+            max_attempts: How many times to run the job before giving up
+            job_id: The job id (a new one by default)
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFullError: If `max_queued` jobs are already waiting
+        """
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.max_queued:
+                    queued, = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+                    if queued >= self.max_queued:
+                        raise QueueFullError(f"Job queue is full ({queued} jobs waiting)")
+                self._conn.execute(
+                    f"INSERT INTO jobs ({self._COLUMNS}) VALUES (?, ?, ?, ?, 0, ?, NULL, NULL, NULL, ?, ?, ?, NULL)",
+                    (job_id, agent_type, json.dumps(payload), QUEUED, max(1, max_attempts), now, now, now)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return self.get(job_id)
+
+    def claim(self, lease: float) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest job that is ready to run: queued and not waiting for a
+        retry, or running with an expired lease (its worker died).
+
+        Returns:
+            The claimed job, or None if no job is ready
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        f"SELECT {self._COLUMNS} FROM jobs WHERE status IN (?, ?) AND available_at <= ? "
+                        "ORDER BY available_at LIMIT 1",
+                        (QUEUED, RUNNING, now)
+                    ).fetchone()
+                    if row is None:
+                        job = None
+                        break
+
+                    job = self._to_job(row)
+                    if job["status"] == RUNNING and job["attempts"] >= job["max_attempts"]:
+                        # Its worker died on the last attempt
+                        error = json.dumps({"status_code": 500, "detail": "Job's worker stopped responding"})
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                            (FAILED, error, now, now, job["job_id"])
+                        )
+                        continue
+
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, available_at = ? WHERE job_id = ?",
+                        (RUNNING, now, now + lease, job["job_id"])
+                    )
+                    job.update(status=RUNNING, attempts=job["attempts"] + 1, updated_at=now, available_at=now + lease)
+                    break
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return job
+
+    def renew(self, job_id: str, lease: float, progress: Optional[Dict[str, Any]] = None) -> None:
+        """Extend a running job's lease, storing its partial results if given"""
+        now = time.time()
+        with self._lock:
+            if progress is None:
+                self._conn.execute(
+                    "UPDATE jobs SET updated_at = ?, available_at = ? WHERE job_id = ? AND status = ?",
+                    (now, now + lease, job_id, RUNNING)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET progress = ?, updated_at = ?, available_at = ? WHERE job_id = ? AND status = ?",
+                    (_dumps(progress), now, now + lease, job_id, RUNNING)
+                )
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        """Store a job's result"""
+        self._finish(job_id, SUCCEEDED, result=_dumps(result))
+
+    def fail(self, job_id: str, error: Dict[str, Any], retry_at: Optional[float] = None) -> None:
+        """Record a failed attempt, queueing the job again at `retry_at` if given"""
+        if retry_at is None:
+            self._finish(job_id, FAILED, error=json.dumps(error))
+            return
+
+        with self._lock:
+            # Unless it was cancelled meanwhile
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, available_at = ? WHERE job_id = ? AND status = ?",
+                (QUEUED, json.dumps(error), time.time(), retry_at, job_id, RUNNING)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that hasn't finished, returning whether it was cancelled"""
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, finished_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                (CANCELLED, now, now, job_id, QUEUED, RUNNING)
+            ).rowcount > 0
+
+    def release(self, job_id: str) -> None:
+        """Queue a running job again without counting the attempt (e.g. on shutdown)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), updated_at = ?, available_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (QUEUED, time.time(), time.time(), job_id, RUNNING)
+            )
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Mark a running job finished (unless it was cancelled meanwhile)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, finished_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (status, result, error, now, now, job_id, RUNNING)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status, partial results, and result or error"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = self._to_job(row)
+        if job["finished_at"] is not None and self.result_ttl and job["finished_at"] < time.time() - self.result_ttl:
+            return None
+        return job
+
+    def _to_job(self, row: tuple) -> Dict[str, Any]:
+        (job_id, agent_type, payload, status, attempts, max_attempts, progress, result, error,
+         created_at, updated_at, available_at, finished_at) = row
+        return {
+            "job_id": job_id,
+            "agent_type": agent_type,
+            "payload": json.loads(payload),
+            "status": status,
+            "attempts": attempts,
+            "max_attempts": max_attempts,
+            "progress": json.loads(progress) if progress else None,
+            "result": json.loads(result) if result else None,
+            "error": json.loads(error) if error else None,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "available_at": available_at,
+            "finished_at": finished_at
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """Count the jobs in each status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (QUEUED, RUNNING, *FINISHED)} | dict(rows)
+
+    def prune(self) -> int:
+        """Delete finished jobs whose results are past the TTL, returning how many were deleted"""
+        if not self.result_ttl:
+            return 0
+
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.result_ttl,)
+            ).rowcount
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+class JobQueue:
+    """
+    Bounded pool of workers running the jobs of a `JobStore`.
+
+    At most `workers` jobs run at once in this process; the rest wait in the
+    store, which refuses new jobs once `max_queued` are waiting. Failed
+    attempts are retried with exponential backoff (with jitter) when
+    `retryable` says the error is worth retrying.
+    """
+
+    def __init__(self,
+                 store: JobStore,
+                 runner: JobRunner,
+                 workers: int = 4,
+                 lease: float = 60.0,
+                 retry_delay: float = 1.0,
+                 poll_interval: float = 1.0,
+                 retryable: Optional[Callable[[BaseException], bool]] = None):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.retryable = retryable or (lambda error: True)
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, List["asyncio.Future[None]"]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_prune = 0.0
+
+    def start(self) -> None:
+        """Start the workers"""
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers, queueing the jobs they were running again"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, agent_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Queue a job and wake a worker to run it.
+
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        job = await run_in_executor(
+            self.store.submit, agent_type, payload, max_attempts or settings.jobs.max_attempts
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job"""
+        return await run_in_executor(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a job, stopping it if it is running in this process"""
+        cancelled = await run_in_executor(self.store.cancel, job_id)
+        task = self._running.get(job_id)
+        if cancelled and task is not None:
+            task.cancel()
+        self._notify(job_id)
+        return cancelled
+
+    async def wait(self, job_id: str) -> Dict[str, Any]:
+        """
+        Wait for a job to finish.
+
+        Jobs run by this process wake their waiters as soon as they finish;
+        the store is also polled, for jobs run by other processes.
+
+        Returns:
+            The job's result
+
+        Raises:
+            JobError: If the job failed or was cancelled
+        """
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job["status"] == SUCCEEDED:
+                return job["result"]
+            if job["status"] in FINISHED:
+                raise JobError(job)
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(job_id, []).append(waiter)
+            try:
+                await asyncio.wait_for(waiter, self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                waiters = self._waiters.get(job_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(job_id, None)
+
+    def _notify(self, job_id: str) -> None:
+        """Wake the requests waiting for a job"""
+        for waiter in self._waiters.pop(job_id, []):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _work(self) -> None:
+        """Claim and run jobs until stopped"""
+        while not self._stopping:
+            try:
+                await self._prune()
+                job = await run_in_executor(self.store.claim, self.lease)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        """Run a claimed job, renewing its lease until it finishes"""
+        job_id = job["job_id"]
+        logger.info(f"Running job {job_id} (attempt {job['attempts']} of {job['max_attempts']})")
+
+        async def report_progress(progress: Dict[str, Any]) -> None:
+            await run_in_executor(self.store.renew, job_id, self.lease, progress)
+
+        async def renew_lease() -> None:
+            while True:
+                await asyncio.sleep(self.lease / 3)
+                await run_in_executor(self.store.renew, job_id, self.lease)
+
+        task = asyncio.create_task(self.runner(job, report_progress))
+        self._running[job_id] = task
+        renewer = asyncio.create_task(renew_lease())
+        try:
+            result = await asyncio.shield(task)
+            await run_in_executor(self.store.complete, job_id, result)
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Let the job run again later
+                task.cancel()
+                await run_in_executor(self.store.release, job_id)
+                raise
+            # The job was cancelled
+        except Exception as e:
+            retry_at = None
+            if job["attempts"] < job["max_attempts"] and self.retryable(e):
+                retry_at = time.time() + self.retry_delay * 2 ** (job["attempts"] - 1) * random.uniform(0.5, 1.5)
+                logger.warning(f"Job {job_id} failed, retrying in {retry_at - time.time():.1f}s: {str(e)}")
+            else:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+            await run_in_executor(self.store.fail, job_id, describe_error(e), retry_at)
+        finally:
+            renewer.cancel()
+            self._running.pop(job_id, None)
+            self._notify(job_id)
+
+    async def _prune(self) -> None:
+        """Delete expired results now and then"""
+        if self.store.result_ttl and time.time() - self._last_prune > self.store.result_ttl / 10:
+            self._last_prune = time.time()
+            pruned = await run_in_executor(self.store.prune)
+            if pruned:
+                logger.info(f"Pruned {pruned} expired jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of workers, the jobs they are running and the jobs in each status"""
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "jobs": self.store.counts()
+        }
+
+def describe_error(error: BaseException) -> Dict[str, Any]:
+    """Describe an error as a status code and detail (HTTP errors keep theirs)"""
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return {"status_code": status_code, "detail": str(getattr(error, "detail", error))}
+    return {"status_code": 500, "detail": f"Error processing query: {str(error)}"}
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """Get the process-wide job store"""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStore(settings.jobs.path, max_queued=settings.jobs.max_queued, result_ttl=settings.jobs.result_ttl)
+    return _job_store
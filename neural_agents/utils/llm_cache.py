@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from ..config import settings
+from .cache import LRUCache, SQLiteCache, TieredCache
+
+class LLMResponseCache(BaseCache):
+    """
+    Two-tier LLM response cache: an in-memory LRU in front of a persistent SQLite store.
+
+    The SQLite store can be shared by several worker processes (see `TieredCache`).
+    LangChain calls `lookup`/`update` with the serialized message list as the prompt
+    and the serialized model parameters (model, temperature, ...) as the llm string,
+    so identical prompts to identically configured models share an entry.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 memory_entries: Optional[int] = None,
+                 disk_entries: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else settings.cache.llm_cache_ttl
+        self.memory = LRUCache(
+            max_entries=memory_entries or settings.cache.llm_cache_memory_entries,
+            ttl=ttl
+        )
+        self.disk = SQLiteCache(
+            path=path or settings.cache.llm_cache_path,
+            max_entries=disk_entries or settings.cache.llm_cache_disk_entries,
+            ttl=ttl
+        )
+        self.tiers = TieredCache(self.memory, self.disk, dumps=dumps, loads=loads)
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """Hash the model parameters and prompt into a cache key"""
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """Look up a cached response, promoting disk hits to the memory tier"""
+        return self.tiers.get(self.make_key(prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        """Store a response in both tiers"""
+        self.tiers.set(self.make_key(prompt, llm_string), list(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove all cached responses"""
+        self.tiers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for both tiers"""
+        return self.tiers.stats()
+
+_install_lock = threading.Lock()
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Get the process-wide LLM response cache, installing it on first use.
+
+    Returns:
+        The installed cache, or None if LLM response caching is disabled
+    """
+    if not settings.cache.llm_cache_enabled:
+        return None
+
+    with _install_lock:
+        cache = get_llm_cache()
+        if not isinstance(cache, LLMResponseCache):
+            cache = LLMResponseCache()
+            set_llm_cache(cache)
+        return cache
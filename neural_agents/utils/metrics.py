@@ -0,0 +1,304 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from .tokens import estimate_tokens
+
+# Content type of the Prometheus text exposition format (responses add the charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Latency buckets (seconds), from cache hits to long LLM generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Token count buckets
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Format a sample's labels, e.g. `{node="create_summary"}`"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Metric {self.name} takes labels {list(self.labels)}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        """Render the metric's sample lines"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric in the text exposition format"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """A value that only goes up"""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Metric):
+    """A value that can go up and down"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels) -> Iterator[None]:
+        """Count the enclosed block while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their count and sum"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count per bucket (the last one is +Inf), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, rendered in the Prometheus text format.
+
+    Collectors are called on every render to refresh gauges whose values are
+    owned elsewhere (cache statistics, pool sizes).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labels != metric.labels:
+                    raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        """Get or create a counter"""
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = ()) -> Gauge:
+        """Get or create a gauge"""
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Call `collector` before every render"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the text exposition format"""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+
+        for collector in collectors:
+            collector()
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Global registry instance
+metrics = MetricsRegistry()
+
+node_duration = metrics.histogram("agent_node_duration_seconds", "Time spent running graph nodes", ("graph", "node"))
+node_errors = metrics.counter("agent_node_errors_total", "Graph node runs that raised an exception", ("graph", "node"))
+llm_duration = metrics.histogram("llm_request_duration_seconds", "Time spent in LLM calls", ("model",))
+llm_requests = metrics.counter("llm_requests_total", "LLM calls by outcome", ("model", "status"))
+llm_tokens = metrics.histogram("llm_tokens", "Tokens per LLM call", ("model", "type"), buckets=TOKEN_BUCKETS)
+llm_tokens_total = metrics.counter("llm_tokens_total", "Tokens used by LLM calls", ("model", "type"))
+tool_duration = metrics.histogram("tool_call_duration_seconds", "Time spent in tool calls", ("tool",))
+tool_calls = metrics.counter("tool_calls_total", "Tool calls by outcome", ("tool", "status"))
+cache_hits = metrics.gauge("cache_hits", "Cache hits since startup", ("cache",))
+cache_misses = metrics.gauge("cache_misses", "Cache misses since startup", ("cache",))
+cache_hit_ratio = metrics.gauge("cache_hit_ratio", "Fraction of cache lookups that were hits", ("cache",))
+requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being served", ("path",))
+request_duration = metrics.histogram("http_request_duration_seconds", "Time to respond to HTTP requests", ("method", "path", "status"))
+jobs = metrics.gauge("agent_jobs", "Jobs in the job queue by status", ("status",))
+llm_slots_in_use = metrics.gauge("llm_concurrency_in_use", "LLM requests holding a concurrency slot, in every worker process")
+llm_slots_waiting = metrics.gauge("llm_concurrency_waiting", "LLM requests of this worker waiting for a concurrency slot")
+llm_queue_time = metrics.histogram("llm_queue_seconds", "Time LLM requests waited for rate limits and concurrency slots", ("model",))
+llm_throttled = metrics.counter("llm_throttled_total", "LLM responses asking to slow down (429 or 503)", ("model", "status"))
+llm_retries = metrics.counter("llm_retries_total", "LLM requests retried after a throttled, failed or timed out attempt", ("model", "reason"))
+llm_adaptive_limit = metrics.gauge("llm_adaptive_concurrency_limit", "Concurrency limit of a model adapted to throttling, in this worker", ("model",))
+
+def record_cache_stats(cache: str, hits: int, misses: int) -> None:
+    """Export a cache's hit and miss counters"""
+    lookups = hits + misses
+    cache_hits.set(hits, cache=cache)
+    cache_misses.set(misses, cache=cache)
+    cache_hit_ratio.set(hits / lookups if lookups else 0.0, cache=cache)
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """Record the tokens used by one LLM call"""
+    for token_type, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+        llm_tokens.observe(count, model=model, type=token_type)
+        llm_tokens_total.inc(count, model=model, type=token_type)
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording the latency, outcome and token usage of a model's calls.
+
+    Token counts come from the API's reported usage. Streamed responses carry
+    no usage, so their completion tokens are the number of streamed chunks and
+    their prompt tokens are estimated from the messages.
+    """
+
+    # Recording is cheap, so run in the caller's thread instead of the executor
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        # Per run id: (start time, estimated prompt tokens, streamed chunks)
+        self._runs: Dict[UUID, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs: Any) -> None:
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for batch in messages for message in batch)
+        with self._lock:
+            self._runs[run_id] = [time.perf_counter(), prompt_tokens, 0]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run[2] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+
+        start, estimated_prompt_tokens, streamed_chunks = run
+        llm_duration.observe(time.perf_counter() - start, model=self.model)
+        llm_requests.inc(model=self.model, status="ok")
+
+        usage = (response.llm_output or {}).get("token_usage")
+        if usage:
+            record_tokens(self.model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        elif streamed_chunks:
+            record_tokens(self.model, estimated_prompt_tokens, streamed_chunks)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            llm_duration.observe(time.perf_counter() - run[0], model=self.model)
+        llm_requests.inc(model=self.model, status="error")
@@ -0,0 +1,307 @@
+import email.utils
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from ..config import settings
+from .metrics import llm_adaptive_limit, llm_retries, llm_throttled
+from .shared_state import ConcurrencyLimiter, SharedStore, get_shared_store
+from .tokens import estimate_tokens
+
+# Seconds of traffic a token bucket lets through in one burst
+BURST_SECONDS = 10
+
+# Statuses worth retrying: timeouts, throttling, and the provider failing or being overloaded
+RETRY_STATUSES = frozenset((408, 409, 429, 500, 502, 503, 504))
+
+# Statuses asking for less traffic, which halve the model's concurrency limit
+THROTTLE_STATUSES = frozenset((429, 503))
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second and holding at most `capacity`.
+
+    Reservations may overdraw the bucket: the caller is told how long to wait
+    for its tokens to be refilled, and later callers queue up behind it. With
+    a `SharedStore` the bucket is shared by every process using the store.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, store: Optional[SharedStore] = None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` tokens.
+
+        Returns:
+            Seconds to wait before using them
+        """
+        if self.store is not None:
+            return self.store.reserve_tokens(self.name, amount, self.rate, self.capacity)
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate) - amount
+            self._updated_at = now
+            return max(0.0, -self._tokens / self.rate)
+
+class AIMDLimit:
+    """
+    Concurrency limit adjusted by additive increase, multiplicative decrease.
+
+    Every successful request raises the limit by 1/limit (about one per round
+    of requests), up to `maximum`; a throttled one halves it, down to
+    `minimum`, at most once per `DECREASE_INTERVAL` so a burst of throttled
+    responses to requests sent together only counts once.
+    """
+
+    DECREASE_INTERVAL = 1.0
+
+    def __init__(self, model: str, limiter: ConcurrencyLimiter, minimum: int = 1, maximum: int = 32):
+        self.model = model
+        self.limiter = limiter
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = float(maximum)
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._apply()
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.value < self.maximum:
+                self.value = min(float(self.maximum), self.value + 1 / self.value)
+                self._apply()
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.DECREASE_INTERVAL:
+                self._last_decrease = now
+                self.value = max(float(self.minimum), self.value / 2)
+                self._apply()
+
+    def _apply(self) -> None:
+        self.limiter.limit = int(self.value)
+        llm_adaptive_limit.set(self.limiter.limit, model=self.model)
+
+class ModelLimiter:
+    """
+    The limits of one model's requests: token buckets for requests and tokens
+    per minute, an adaptive concurrency limit, and the pause the provider
+    asked for after throttling a request.
+    """
+
+    def __init__(self,
+                 model: str,
+                 requests_per_minute: int = 0,
+                 tokens_per_minute: int = 0,
+                 max_concurrency: int = 0,
+                 store: Optional[SharedStore] = None):
+        self.model = model
+        self.shared = store is not None
+        self.requests = self._bucket("requests", requests_per_minute, store)
+        self.tokens = self._bucket("tokens", tokens_per_minute, store)
+        self.slots: Optional[ConcurrencyLimiter] = None
+        self.concurrency: Optional[AIMDLimit] = None
+        if max_concurrency:
+            self.slots = ConcurrencyLimiter(f"llm:{model}", max_concurrency)
+            self.concurrency = AIMDLimit(model, self.slots, maximum=max_concurrency)
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+    def _bucket(self, kind: str, per_minute: int, store: Optional[SharedStore]) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        rate = per_minute / 60
+        return TokenBucket(f"llm:{self.model}:{kind}", rate, max(1.0, rate * BURST_SECONDS), store)
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve a request of about `tokens` tokens.
+
+        Returns:
+            Seconds to wait before sending it
+        """
+        wait = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def on_response(self, status: int, headers: Mapping[str, str], attempt: int) -> Optional[float]:
+        """
+        Record a response to the model.
+
+        Returns:
+            Seconds to wait before retrying the request, or None to return the response
+        """
+        if status not in RETRY_STATUSES:
+            if status < 400 and self.concurrency is not None:
+                self.concurrency.on_success()
+            return None
+
+        retry_after = parse_retry_after(headers)
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            llm_throttled.inc(model=self.model, status=str(status))
+            if self.concurrency is not None:
+                self.concurrency.on_throttle()
+            if retry_after is not None:
+                # Hold back every request to the model, not only this one
+                pause = min(retry_after, settings.llm.retry_max_delay)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        return self._retry_delay(attempt, retry_after, str(status))
+
+    def on_error(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Record a request that failed without a response (connection error or timeout).
+
+        Returns:
+            Seconds to wait before retrying the request, or None to raise the error
+        """
+        return self._retry_delay(attempt, None, type(error).__name__)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float], reason: str) -> Optional[float]:
+        """Exponential backoff with full jitter, or the provider's Retry-After; None once retries run out"""
+        if attempt >= settings.llm.max_retries:
+            return None
+        if retry_after is not None:
+            if retry_after > settings.llm.retry_max_delay:
+                return None
+            delay = retry_after + random.uniform(0, settings.llm.retry_base_delay)
+        else:
+            delay = random.uniform(0, min(settings.llm.retry_max_delay, settings.llm.retry_base_delay * 2 ** attempt))
+
+        self.retries += 1
+        llm_retries.inc(model=self.model, reason=reason)
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the model's limits, its current concurrency and its throttling counters"""
+        return {
+            "requests_per_minute": round(self.requests.rate * 60) if self.requests is not None else None,
+            "tokens_per_minute": round(self.tokens.rate * 60) if self.tokens is not None else None,
+            "concurrency_limit": self.slots.limit if self.slots is not None else None,
+            "in_use": self.slots.stats()["in_use"] if self.slots is not None else None,
+            "waiting": self.slots.waiting if self.slots is not None else None,
+            "paused_for": max(0.0, self.paused_until - time.monotonic()),
+            "throttled": self.throttled,
+            "retries": self.retries
+        }
+
+class LLMRateLimiter:
+    """
+    Per-model rate limits and retry policy in front of every LLM request.
+
+    Limits come from `LLM_RATE_LIMITS` (`model=rpm:tpm,...`), falling back to
+    `LLM_REQUESTS_PER_MINUTE` and `LLM_TOKENS_PER_MINUTE`; 0 means unlimited.
+    In multi-worker mode the token buckets are shared by the workers, while
+    each worker adapts its own concurrency limits and pauses.
+    """
+
+    def __init__(self,
+                 limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 requests_per_minute: int = 0,
+                 tokens_per_minute: int = 0,
+                 max_concurrency: int = 0,
+                 store: Optional[SharedStore] = None):
+        self.limits = limits or {}
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.store = store
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, model: str) -> ModelLimiter:
+        """Get a model's limiter, creating it on first use"""
+        limiter = self._models.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._models.get(model)
+                if limiter is None:
+                    requests_per_minute, tokens_per_minute = self.limits.get(
+                        model, (self.requests_per_minute, self.tokens_per_minute)
+                    )
+                    limiter = ModelLimiter(model, requests_per_minute, tokens_per_minute, self.max_concurrency, self.store)
+                    self._models[model] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        """Get every model's limits and throttling counters"""
+        return {model: limiter.stats() for model, limiter in list(self._models.items())}
+
+def describe_request(content: bytes) -> Tuple[str, int]:
+    """
+    Get the model of a chat completion request body and the tokens it may use:
+    the estimated prompt tokens plus `max_tokens`.
+    """
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return "unknown", 0
+
+    prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in body.get("messages", []))
+    return str(body.get("model", "unknown")), prompt_tokens + (body.get("max_tokens") or 0)
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from `retry-after-ms` or `retry-after` (seconds or an HTTP date), if given"""
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse per-model limits given as `model=rpm:tpm,...` (either may be 0 for unlimited)"""
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        model, _, values = entry.partition("=")
+        requests_per_minute, _, tokens_per_minute = values.partition(":")
+        limits[model.strip()] = (int(requests_per_minute or 0), int(tokens_per_minute or 0))
+    return limits
+
+_rate_limiter: Optional[LLMRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get the process-wide LLM rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        store = get_shared_store()
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LLMRateLimiter(
+                    parse_rate_limits(settings.llm.rate_limits),
+                    requests_per_minute=settings.llm.requests_per_minute,
+                    tokens_per_minute=settings.llm.tokens_per_minute,
+                    max_concurrency=settings.llm.adaptive_concurrency,
+                    store=store
+                )
+    return _rate_limiter
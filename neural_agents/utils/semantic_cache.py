@@ -0,0 +1,229 @@
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
+import numpy as np
+
+from ..config import settings
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+_POSSESSIVE_PATTERN = re.compile(r"['\u2019]s\b")
+
+_STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "of", "on", "or", "the", "to", "with", "about", "its", "their", "this", "that", "these",
+    "those", "do", "does", "what", "how", "which",
+    # Research topics are about the current state anyway
+    "recent", "latest", "new", "current"
+])
+
+_SUFFIXES = ("ments", "ment", "ings", "ing", "ions", "ion", "es", "s")
+
+class HashingEmbedder:
+    """
+    Local text embedding based on hashed word and character n-grams.
+
+    No model or external service is needed: tokens are normalized, split into
+    character n-grams and hashed into a fixed number of buckets, and the
+    resulting vector is L2-normalized so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase, drop possessives and stop words, and strip common suffixes"""
+        tokens = []
+        for token in _TOKEN_PATTERN.findall(_POSSESSIVE_PATTERN.sub("", text.lower())):
+            if token in _STOP_WORDS:
+                continue
+            for suffix in _SUFFIXES:
+                if len(token) > len(suffix) + 2 and token.endswith(suffix):
+                    token = token[:-len(suffix)]
+                    break
+            # "advance" and "advanc(es)" are the same word
+            if len(token) > 4 and token.endswith("e"):
+                token = token[:-1]
+            tokens.append(token)
+        return tokens
+
+    def content_words(self, text: str) -> FrozenSet[str]:
+        """The normalized words that carry a text's meaning"""
+        return frozenset(self.tokenize(text))
+
+    def entities(self, text: str) -> FrozenSet[str]:
+        """The normalized names (capitalized past the first word, or mixed case) and numbers in a text"""
+        entities = set()
+        for position, word in enumerate(_WORD_PATTERN.findall(_POSSESSIVE_PATTERN.sub("", text))):
+            if any(c.isdigit() for c in word) or any(c.isupper() for c in word[1:]) or (position and word[0].isupper()):
+                entities.update(self.tokenize(word))
+        return frozenset(entities)
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a text into a unit vector"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in self.tokenize(text):
+            self._add(vector, f"w:{token}", 1.0)
+            padded = f"<{token}>"
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(len(padded) - n + 1):
+                    self._add(vector, padded[i:i + n], 0.5)
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _add(self, vector: np.ndarray, feature: str, weight: float) -> None:
+        """Hash a feature into the vector, using a second hash bit for the sign"""
+        digest = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % self.dim] += sign * weight
+
+class SemanticCache:
+    """
+    In-memory cache that matches keys by embedding similarity instead of equality.
+
+    Embeddings live in a preallocated matrix used as a ring buffer, so a lookup
+    is a single matrix-vector product over all stored entries. Embedding
+    similarity alone scores topics about different things that share most of
+    their characters too high ("GPT-4 costs" and "GPT-3 costs"), so an entry
+    above the threshold is only used if it also shares at least `min_overlap`
+    of its content words (Jaccard) with the query, and neither text names an
+    entity or number the other one doesn't mention.
+    """
+
+    def __init__(self,
+                 threshold: Optional[float] = None,
+                 min_overlap: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 embedder: Optional[HashingEmbedder] = None):
+        self.threshold = threshold if threshold is not None else settings.cache.semantic_cache_threshold
+        self.min_overlap = min_overlap if min_overlap is not None else settings.cache.semantic_cache_min_overlap
+        self.max_entries = max_entries or settings.cache.semantic_cache_max_entries
+        self.ttl = ttl if ttl is not None else settings.cache.semantic_cache_ttl
+        self.embedder = embedder or HashingEmbedder()
+
+        self._vectors = np.zeros((self.max_entries, self.embedder.dim), dtype=np.float32)
+        self._keys: List[Optional[str]] = [None] * self.max_entries
+        self._words: List[Optional[FrozenSet[str]]] = [None] * self.max_entries
+        self._entities: List[Optional[FrozenSet[str]]] = [None] * self.max_entries
+        self._namespaces: List[Optional[str]] = [None] * self.max_entries
+        self._values: List[Any] = [None] * self.max_entries
+        self._expires_at = np.zeros(self.max_entries, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str, namespace: str = "") -> Optional[Tuple[str, Any, float]]:
+        """
+        Find the most similar stored entry above the similarity threshold.
+
+        Args:
+            text: The text to match
+            namespace: Only entries stored under this namespace can match
+
+        Returns:
+            A tuple of (stored text, stored value, similarity), or None on a miss
+        """
+        vector = self.embedder.embed(text)
+        words = self.embedder.content_words(text)
+        entities = self.embedder.entities(text)
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ vector
+                similarities[self._expires_at[:self._size] < time.time()] = -1.0
+                for index in np.argsort(similarities)[::-1]:
+                    similarity = float(similarities[index])
+                    if similarity < self.threshold:
+                        break
+                    if self._namespaces[index] == namespace and self._compatible(index, words, entities):
+                        self.hits += 1
+                        return self._keys[index], self._values[index], similarity
+
+            self.misses += 1
+            return None
+
+    def _compatible(self, index: int, words: FrozenSet[str], entities: FrozenSet[str]) -> bool:
+        """Whether a stored entry's content words overlap enough with a query's, without conflicting entities"""
+        stored_words = self._words[index]
+        union = stored_words | words
+        if union and len(stored_words & words) / len(union) < self.min_overlap:
+            return False
+        return entities <= stored_words and self._entities[index] <= words
+
+    def add(self, text: str, value: Any, namespace: str = "") -> None:
+        """
+        Store a value under a text, replacing the oldest entry when full.
+
+        Args:
+            text: The text to store the value under
+            value: The value to store
+            namespace: The namespace to store the entry in
+        """
+        vector = self.embedder.embed(text)
+        words = self.embedder.content_words(text)
+        entities = self.embedder.entities(text)
+        with self._lock:
+            index = self._next
+            self._vectors[index] = vector
+            self._keys[index] = text
+            self._words[index] = words
+            self._entities[index] = entities
+            self._namespaces[index] = namespace
+            self._values[index] = value
+            self._expires_at[index] = time.time() + self.ttl if self.ttl else np.inf
+            self._next = (index + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._keys = [None] * self.max_entries
+            self._words = [None] * self.max_entries
+            self._entities = [None] * self.max_entries
+            self._namespaces = [None] * self.max_entries
+            self._values = [None] * self.max_entries
+            self._next = 0
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "min_overlap": self.min_overlap,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Get the process-wide semantic cache for research findings.
+
+    Returns:
+        The cache, or None if semantic caching is disabled
+    """
+    global _semantic_cache
+    if not settings.cache.semantic_cache_enabled:
+        return None
+
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+    return _semantic_cache
